@@ -2,11 +2,23 @@ from flask import Flask
 from flask_cors import CORS
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
+from sqlalchemy.exc import SQLAlchemyError
 from config import config
 from models import db, Admin
 from routes.user_routes import user_bp
 from routes.admin_routes import admin_bp
 from routes.api_routes import api
+from commands import register_commands
+from services import database, usage
+from services.audit import audit_writer
+from services.telemetry import telemetry_buffer
+from services.anomaly import anomaly_detector
+from services.live_state import latest_state
+from services.events import broadcaster
+from services.identity import identity_cache
+from services.auth import token_versions
+from services.passwords import password_hasher
+from services.settings import settings_store
 import os
 from werkzeug.security import generate_password_hash
 
@@ -19,8 +31,19 @@ def create_app(config_name=None):
     app.config.from_object(config[config_name])
 
     # Initialize extensions
+    database.init_app(app)
     db.init_app(app)
+    database.init_engine(app)
     migrate = Migrate(app, db)
+    audit_writer.init_app(app)
+    telemetry_buffer.init_app(app)
+    anomaly_detector.init_app(app)
+    broadcaster.init_app(app)
+    latest_state.init_app(app)
+    usage.init_app(app)
+    identity_cache.init_app(app)
+    password_hasher.init_app(app)
+    settings_store.init_app(app)
 
     # ✅ JWT setup (important fix for your error)
     app.config["JWT_SECRET_KEY"] = os.environ.get("JWT_SECRET_KEY", "super-secret-key")
@@ -29,6 +52,7 @@ def create_app(config_name=None):
     app.config["JWT_HEADER_TYPE"] = "Bearer"
 
     jwt = JWTManager(app)
+    token_versions.init_app(app)
 
     # ✅ CORS setup
     CORS(
@@ -42,10 +66,21 @@ def create_app(config_name=None):
     app.register_blueprint(admin_bp, url_prefix="/api/admin")
     app.register_blueprint(api, url_prefix="/api")
 
-    # Auto-create tables and create default admin user
+    # CLI commands (flask check-indexes, ...)
+    register_commands(app)
+
+    # Auto-create tables, create default admin user and load the monitoring store
     with app.app_context():
         db.create_all()
         create_default_admin()
+        try:
+            latest_state.warm()
+        except SQLAlchemyError:
+            # e.g. `flask db upgrade` run before new columns exist; the store
+            # loads on first use instead
+            db.session.rollback()
+            latest_state.invalidate()
+            app.logger.exception("Monitoring store not loaded at startup")
 
     return app
 
@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+
+import click
+from datetime import datetime, timedelta
+
+from models import db, User, WaterPoint, MaintenanceTask, QualityCheck, WaterUsage, Alert, DailyUsage
+from services.geo import within_bbox
+from services.passwords import password_hasher, PasswordHashingBusy
+from services.quality import RESCORE_CHUNK_SIZE, rescore_quality_checks
+from services.usage import rebuild_daily_usage
+
+
+def hot_queries():
+    """Representative queries issued by the hot routes in api_routes.py and admin_routes.py"""
+    now = datetime.utcnow()
+    yesterday = now - timedelta(days=1)
+
+    return {
+        'api.get_alerts': Alert.query.filter(
+            Alert.status == 'active', Alert.priority == 'high'
+        ).order_by(Alert.created_at.desc()),
+        'api.get_alerts (cursor)': Alert.query.filter(
+            Alert.status == 'active',
+            db.tuple_(Alert.created_at, Alert.id) < db.tuple_(now, 1000)
+        ).order_by(Alert.created_at.desc(), Alert.id.desc()).limit(11),
+        'api.get_active_alerts': Alert.query.filter(
+            Alert.status == 'active'
+        ).order_by(Alert.priority.desc(), Alert.created_at.desc()),
+        'api.get_water_point_metrics (quality)': QualityCheck.query.filter_by(
+            water_point_id=1
+        ).order_by(QualityCheck.checked_at.desc()).limit(1),
+        'api.get_water_point_metrics (usage)': WaterUsage.query.filter_by(
+            water_point_id=1
+        ).order_by(WaterUsage.timestamp.desc()).limit(1),
+        'api.get_water_point_metrics (alerts)': Alert.query.filter_by(
+            water_point_id=1, status='active'
+        ),
+        'api.get_water_points': WaterPoint.query.filter(
+            WaterPoint.status == 'active', WaterPoint.region == 'Garissa'
+        ),
+        'api.get_maintenance_tasks': MaintenanceTask.query.filter(
+            MaintenanceTask.status == 'pending'
+        ),
+        'api.get_maintenance_tasks (technician)': MaintenanceTask.query.filter(
+            MaintenanceTask.technician_id == 1, MaintenanceTask.status == 'pending'
+        ),
+        'api.get_system_health (overdue)': MaintenanceTask.query.filter(
+            MaintenanceTask.status.in_(['pending', 'in_progress']),
+            MaintenanceTask.scheduled_date < now
+        ),
+        'api.admin_get_water_point (tasks)': MaintenanceTask.query.filter_by(
+            water_point_id=1
+        ).order_by(MaintenanceTask.created_at.desc()).limit(5),
+        'api.admin_create_water_point (duplicate check)': WaterPoint.query.filter_by(
+            name='Borehole', region='Garissa'
+        ).limit(1),
+        'api.get_recent_notifications (alerts)': Alert.query.filter(
+            Alert.created_at >= yesterday
+        ).order_by(Alert.created_at.desc()).limit(50),
+        'api.get_recent_notifications (maintenance)': MaintenanceTask.query.filter(
+            MaintenanceTask.completed_date >= yesterday
+        ).order_by(MaintenanceTask.completed_date.desc()).limit(10),
+        'api.get_recent_notifications (quality)': QualityCheck.query.filter(
+            QualityCheck.checked_at >= yesterday
+        ).order_by(QualityCheck.checked_at.desc()).limit(10),
+        'admin.get_recent_activities (tasks)': MaintenanceTask.query.order_by(
+            MaintenanceTask.created_at.desc()
+        ).limit(5),
+        'admin.get_recent_activities (alerts)': Alert.query.order_by(
+            Alert.created_at.desc()
+        ).limit(5),
+        'admin.get_real_time_monitoring (usage)': WaterUsage.query.order_by(
+            WaterUsage.timestamp.desc()
+        ).limit(50),
+        'admin.get_real_time_monitoring (alerts)': Alert.query.filter_by(
+            priority='critical', status='active'
+        ),
+        'admin.update_user': User.query.filter_by(email='admin@watermanagement.com'),
+        'api.get_usage_trends': DailyUsage.query.filter(
+            DailyUsage.day >= yesterday.date()
+        ),
+        'api.get_water_points_in_bbox': within_bbox(
+            WaterPoint.query.filter(WaterPoint.status != 'archived'), -0.6, 39.5, -0.3, 39.8
+        ),
+    }
+
+
+def explain(query):
+    """Return the SQLite query plan rows for a query"""
+    compiled = query.statement.compile(
+        dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True}
+    )
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    connection = db.session.connection()
+    rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compiled), params).fetchall()
+    return [row[-1] for row in rows]
+
+
+def is_full_scan(detail):
+    """A plan step that walks a whole table without an index"""
+    return detail.startswith('SCAN ') and 'INDEX' not in detail
+
+
+def register_commands(app):
+    @app.cli.command('check-indexes')
+    def check_indexes():
+        """Fail if any hot route query plan falls back to a full table scan"""
+        if db.engine.dialect.name != 'sqlite':
+            raise click.ClickException('check-indexes uses EXPLAIN QUERY PLAN and requires SQLite')
+
+        failures = 0
+        for name, query in hot_queries().items():
+            plan = explain(query)
+            full_scans = [detail for detail in plan if is_full_scan(detail)]
+            status = 'FULL SCAN' if full_scans else 'ok'
+            click.echo(f'{status:9} {name}: {"; ".join(plan)}')
+            failures += bool(full_scans)
+
+        if failures:
+            raise click.ClickException(f'{failures} hot queries use a full table scan')
+        click.echo('All hot queries use an index')
+
+    @app.cli.command('rebuild-usage-rollup')
+    @click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='Only rebuild days on or after this date (YYYY-MM-DD)')
+    def rebuild_usage_rollup(since):
+        """Recompute the daily_usage rollup from water_usage history"""
+        rows = rebuild_daily_usage(since.date() if since else None)
+        click.echo(f'Wrote {rows} daily usage rows')
+
+    @app.cli.command('rescore-quality')
+    @click.option('--chunk-size', type=int, default=RESCORE_CHUNK_SIZE, help='Quality checks scored per batch')
+    def rescore_quality(chunk_size):
+        """Re-score every quality check with the current settings and refresh water point scores"""
+        started = time.perf_counter()
+        read, updated, water_points = rescore_quality_checks(chunk_size)
+        click.echo(f'Re-scored {read} quality checks in {time.perf_counter() - started:.1f}s: '
+                   f'{updated} changed, {water_points} water point scores updated')
+
+    @app.cli.command('bench-passwords')
+    @click.option('--seconds', type=float, default=5.0, help='How long to run')
+    @click.option('--clients', type=int, default=None,
+                  help='Concurrent logins (default: twice PASSWORD_HASH_WORKERS)')
+    def bench_passwords(seconds, clients):
+        """Measure password checks per second, and per core, through the hashing pool"""
+        clients = clients or 2 * password_hasher.workers
+        stored = password_hasher.hash('benchmark-password')
+        counts = {'checked': 0, 'rejected': 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+
+        def login():
+            checked = rejected = 0
+            while time.perf_counter() < deadline:
+                try:
+                    password_hasher.check(stored, 'benchmark-password')
+                    checked += 1
+                except PasswordHashingBusy:
+                    rejected += 1
+            with lock:
+                counts['checked'] += checked
+                counts['rejected'] += rejected
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=login) for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        cores = 1 if password_hasher.sync else min(password_hasher.workers, os.cpu_count() or 1)
+        rate = counts['checked'] / elapsed
+        click.echo(f'{password_hasher.prefix}: {counts["checked"]} logins in {elapsed:.1f}s '
+                   f'from {clients} clients, {rate:.1f}/s on {cores} cores, {rate / cores:.1f}/s per core')
+        if counts['rejected']:
+            click.echo(f'{counts["rejected"]} refused by the full hashing queue')
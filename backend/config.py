@@ -10,10 +10,81 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///aquasafi.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # SQLite connection tuning, applied to every pooled connection
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 268435456,  # 256 MB
+        'busy_timeout': 5000
+    }
+    SQLITE_STATEMENT_CACHE = 256
+    
     # JWT Configuration
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key-change-in-production'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     
+    # Audit log batching (AUDIT_SYNC writes each record immediately)
+    AUDIT_BATCH_SIZE = 200
+    AUDIT_FLUSH_INTERVAL = 2.0  # seconds
+    AUDIT_MAX_PENDING = 10000
+    AUDIT_SYNC = False
+    
+    # Rows validated and inserted per batch by the water point importer
+    IMPORT_CHUNK_SIZE = 5000
+    
+    # Sensor telemetry ingest buffer (TELEMETRY_SYNC writes each batch immediately)
+    TELEMETRY_MAX_BATCH = 10000  # readings per request
+    TELEMETRY_BATCH_SIZE = 5000
+    TELEMETRY_FLUSH_INTERVAL = 1.0  # seconds
+    TELEMETRY_MAX_PENDING = 100000
+    TELEMETRY_SYNC = False
+    
+    # Seconds between full reloads of the in-memory monitoring store (0 disables).
+    # LATEST_STATE_SYNC reloads only on read, without the background thread
+    LATEST_STATE_REFRESH_INTERVAL = 60
+    LATEST_STATE_SYNC = False
+    
+    # Deepest zoom level with precomputed map clusters; past it points are returned singly
+    CLUSTER_MAX_ZOOM = 16
+    
+    # Seconds within which an alert for the same water point and type is
+    # folded into the open one (0 disables coalescing)
+    ALERT_COALESCE_WINDOW = 3600
+    
+    # Streaming anomaly detection on telemetry
+    ANOMALY_WINDOW = 100  # readings in the rolling mean/variance
+    ANOMALY_Z_THRESHOLD = 4.0
+    ANOMALY_MIN_SAMPLES = 30  # readings before outliers are flagged
+    ANOMALY_ALERT_COOLDOWN = 1800  # seconds between alerts per sensor and kind
+    
+    # Server-Sent Events monitoring stream
+    SSE_HEARTBEAT = 15  # seconds between keepalive comments
+    SSE_HISTORY = 1000  # events kept for Last-Event-ID replay
+    SSE_TOKEN_MAX_AGE = 60  # seconds a stream token can be used to open the stream
+    
+    # Default start and end of technician routes (Garissa town), as (lat, lon)
+    ROUTE_DEPOT = (-0.4532, 39.6461)
+    
+    # Automatic task assignment: km of extra driving worth one hour less of
+    # queued work for a technician
+    ASSIGN_LOAD_WEIGHT = 25.0
+    
+    # Caller role/is_active cache used by get_current_user and is_admin
+    IDENTITY_CACHE_TTL = 60  # seconds
+    IDENTITY_CACHE_SIZE = 1024
+    
+    # How often each process reloads revoked token versions; see services/auth.py
+    AUTH_VERSION_REFRESH = 30  # seconds
+    
+    # Password hashing pool (PASSWORD_HASH_SYNC hashes on the request thread)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'scrypt'  # e.g. scrypt:32768:8:1, pbkdf2:sha256:600000
+    PASSWORD_HASH_WORKERS = None  # threads, defaults to the CPU count
+    PASSWORD_HASH_MAX_QUEUE = 64  # hash jobs running or waiting before logins get 503
+    PASSWORD_HASH_SYNC = False
+    
+    # How often each process checks settings_version for changed system settings
+    SETTINGS_POLL_INTERVAL = 5  # seconds
+    
     # CORS Configuration
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'http://localhost:3000').split(',')
     
@@ -34,6 +105,10 @@ class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    AUDIT_SYNC = True
+    TELEMETRY_SYNC = True
+    LATEST_STATE_SYNC = True
+    PASSWORD_HASH_SYNC = True
 
 config = {
     'development': DevelopmentConfig,
@@ -0,0 +1,28 @@
+"""add report cache lookup and maintenance scheduled_date indexes
+
+Revision ID: 3e9d7a41c5b2
+Revises: 8c1d52e07b4a
+Create Date: 2026-10-18 17:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e9d7a41c5b2'
+down_revision = '8c1d52e07b4a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_reports_type_period_end', 'reports', ['type', 'period_end'],
+                    unique=False, if_not_exists=True)
+    op.create_index('ix_maintenance_tasks_scheduled_date', 'maintenance_tasks', ['scheduled_date'],
+                    unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_maintenance_tasks_scheduled_date', table_name='maintenance_tasks', if_exists=True)
+    op.drop_index('ix_reports_type_period_end', table_name='reports', if_exists=True)
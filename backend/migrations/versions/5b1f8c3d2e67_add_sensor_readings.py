@@ -0,0 +1,37 @@
+"""add sensor readings table
+
+Revision ID: 5b1f8c3d2e67
+Revises: a7c4e2f9d013
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1f8c3d2e67'
+down_revision = 'a7c4e2f9d013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sensor_readings',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('water_point_id', sa.Integer(), nullable=False),
+    sa.Column('sensor_type', sa.String(length=20), nullable=False),
+    sa.Column('timestamp', sa.DateTime(), nullable=False),
+    sa.Column('value', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['water_point_id'], ['water_points.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    op.create_index('ix_sensor_readings_water_point_id_sensor_type_timestamp', 'sensor_readings',
+                    ['water_point_id', 'sensor_type', 'timestamp'], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_sensor_readings_water_point_id_sensor_type_timestamp',
+                  table_name='sensor_readings', if_exists=True)
+    op.drop_table('sensor_readings', if_exists=True)
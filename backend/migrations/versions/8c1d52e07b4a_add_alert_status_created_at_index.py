@@ -0,0 +1,25 @@
+"""add alerts(status, created_at) index for keyset pagination
+
+Revision ID: 8c1d52e07b4a
+Revises: f23abf46accf
+Create Date: 2026-10-18 15:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c1d52e07b4a'
+down_revision = 'f23abf46accf'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_alerts_status_created_at', 'alerts', ['status', 'created_at'],
+                    unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_alerts_status_created_at', table_name='alerts', if_exists=True)
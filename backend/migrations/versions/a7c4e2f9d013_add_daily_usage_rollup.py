@@ -0,0 +1,48 @@
+"""add daily usage rollup tables
+
+Revision ID: a7c4e2f9d013
+Revises: 3e9d7a41c5b2
+Create Date: 2026-10-18 18:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c4e2f9d013'
+down_revision = '3e9d7a41c5b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_usage',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('water_point_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('total_liters', sa.Float(), nullable=False),
+    sa.Column('total_cost', sa.Float(), nullable=False),
+    sa.Column('event_count', sa.Integer(), nullable=False),
+    sa.Column('distinct_users', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['water_point_id'], ['water_points.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('water_point_id', 'day', name='uq_daily_usage_water_point_id_day'),
+    if_not_exists=True
+    )
+    op.create_index('ix_daily_usage_day', 'daily_usage', ['day'], unique=False, if_not_exists=True)
+    op.create_table('daily_usage_users',
+    sa.Column('water_point_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['water_point_id'], ['water_points.id'], ),
+    sa.PrimaryKeyConstraint('water_point_id', 'day', 'user_id'),
+    if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_table('daily_usage_users', if_exists=True)
+    op.drop_index('ix_daily_usage_day', table_name='daily_usage', if_exists=True)
+    op.drop_table('daily_usage', if_exists=True)
@@ -0,0 +1,47 @@
+"""add alert occurrence counter and coalescing index
+
+Revision ID: c4d8e1a6f392
+Revises: 5b1f8c3d2e67
+Create Date: 2026-10-18 20:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d8e1a6f392'
+down_revision = '5b1f8c3d2e67'
+branch_labels = None
+depends_on = None
+
+
+def alert_columns():
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns('alerts')}
+
+
+def upgrade():
+    # Databases whose alerts table was first made by db.create_all() after
+    # the model gained these columns already have them
+    existing = alert_columns()
+    with op.batch_alter_table('alerts') as batch_op:
+        if 'occurrences' not in existing:
+            batch_op.add_column(sa.Column('occurrences', sa.Integer(), nullable=False, server_default='1'))
+        if 'last_seen_at' not in existing:
+            batch_op.add_column(sa.Column('last_seen_at', sa.DateTime(), nullable=True))
+
+    op.execute('UPDATE alerts SET last_seen_at = created_at WHERE last_seen_at IS NULL')
+    op.create_index('ix_alerts_active_water_point_id_type_last_seen_at', 'alerts',
+                    ['water_point_id', 'type', 'last_seen_at'], unique=False, if_not_exists=True,
+                    sqlite_where=sa.text("status = 'active'"),
+                    postgresql_where=sa.text("status = 'active'"))
+
+
+def downgrade():
+    op.drop_index('ix_alerts_active_water_point_id_type_last_seen_at', table_name='alerts', if_exists=True)
+    existing = alert_columns()
+    with op.batch_alter_table('alerts') as batch_op:
+        if 'last_seen_at' in existing:
+            batch_op.drop_column('last_seen_at')
+        if 'occurrences' in existing:
+            batch_op.drop_column('occurrences')
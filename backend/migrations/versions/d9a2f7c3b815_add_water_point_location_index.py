@@ -0,0 +1,25 @@
+"""add water_points(latitude, longitude) index for location queries
+
+Revision ID: d9a2f7c3b815
+Revises: c4d8e1a6f392
+Create Date: 2026-10-18 21:15:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9a2f7c3b815'
+down_revision = 'c4d8e1a6f392'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_water_points_latitude_longitude', 'water_points', ['latitude', 'longitude'],
+                    unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_water_points_latitude_longitude', table_name='water_points', if_exists=True)
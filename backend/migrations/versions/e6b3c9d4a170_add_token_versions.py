@@ -0,0 +1,40 @@
+"""add token_version to users and admins
+
+Revision ID: e6b3c9d4a170
+Revises: d9a2f7c3b815
+Create Date: 2026-10-18 23:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b3c9d4a170'
+down_revision = 'd9a2f7c3b815'
+branch_labels = None
+depends_on = None
+
+TABLES = ('users', 'admins')
+
+
+def has_token_version(table):
+    return 'token_version' in {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade():
+    for table in TABLES:
+        # Tables first made by db.create_all() after the model gained the
+        # column already have it
+        if has_token_version(table):
+            continue
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('token_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    for table in TABLES:
+        if not has_token_version(table):
+            continue
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('token_version')
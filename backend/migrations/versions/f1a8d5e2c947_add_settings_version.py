@@ -0,0 +1,29 @@
+"""add settings_version counter for the settings cache
+
+Revision ID: f1a8d5e2c947
+Revises: e6b3c9d4a170
+Create Date: 2026-10-18 23:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a8d5e2c947'
+down_revision = 'e6b3c9d4a170'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('settings_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_table('settings_version', if_exists=True)
@@ -0,0 +1,53 @@
+"""add indexes for hot filter and sort paths
+
+Tables are created by db.create_all() on startup, so this first revision only
+adds the indexes that existing databases are missing. if_not_exists keeps it
+safe to run against databases created after the indexes were declared.
+
+Revision ID: f23abf46accf
+Revises: 
+Create Date: 2026-10-18 15:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f23abf46accf'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    # (name, table, columns, partial WHERE clause)
+    ('ix_alerts_status_priority_created_at', 'alerts', ['status', 'priority', 'created_at'], None),
+    ('ix_alerts_water_point_id_status', 'alerts', ['water_point_id', 'status'], None),
+    ('ix_alerts_created_at', 'alerts', ['created_at'], None),
+    ('ix_quality_checks_water_point_id_checked_at', 'quality_checks', ['water_point_id', 'checked_at'], None),
+    ('ix_quality_checks_checked_at', 'quality_checks', ['checked_at'], None),
+    ('ix_water_usage_water_point_id_timestamp', 'water_usage', ['water_point_id', 'timestamp'], None),
+    ('ix_water_usage_timestamp', 'water_usage', ['timestamp'], None),
+    ('ix_maintenance_tasks_status_scheduled_date', 'maintenance_tasks', ['status', 'scheduled_date'], None),
+    ('ix_maintenance_tasks_water_point_id_created_at', 'maintenance_tasks', ['water_point_id', 'created_at'], None),
+    ('ix_maintenance_tasks_technician_id_status', 'maintenance_tasks', ['technician_id', 'status'], None),
+    ('ix_maintenance_tasks_completed_date', 'maintenance_tasks', ['completed_date'], None),
+    ('ix_maintenance_tasks_created_at', 'maintenance_tasks', ['created_at'], None),
+    ('ix_water_points_status_region', 'water_points', ['status', 'region'], None),
+    ('ix_water_points_name_region', 'water_points', ['name', 'region'], None),
+]
+
+
+def upgrade():
+    for name, table, columns, where in INDEXES:
+        kwargs = {}
+        if where:
+            kwargs['sqlite_where'] = sa.text(where)
+            kwargs['postgresql_where'] = sa.text(where)
+        op.create_index(name, table, columns, unique=False, if_not_exists=True, **kwargs)
+
+
+def downgrade():
+    for name, table, columns, where in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
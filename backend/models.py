@@ -1,6 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from services.passwords import password_hasher
 import jwt
 from time import time
 from flask import current_app
@@ -16,15 +16,21 @@ class Admin(db.Model):
     name = db.Column(db.String(100), default='Administrator')
     role = db.Column(db.String(50), default='super_admin')  # super_admin, regional_admin, etc.
     is_active = db.Column(db.Boolean, default=True)
+    # Bumped to revoke every token issued before; see services/auth.py
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     last_login = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """Check password, re-hashing it if it was stored with older parameters; the caller commits"""
+        matches, upgraded = password_hasher.verify(self.password_hash, password)
+        if upgraded:
+            self.password_hash = upgraded
+        return matches
     
     def get_reset_password_token(self, expires_in=600):
         return jwt.encode(
@@ -71,6 +77,8 @@ class User(db.Model):
     emergency_phone = db.Column(db.String(20), nullable=False)
     is_active = db.Column(db.Boolean, default=True)
     is_verified = db.Column(db.Boolean, default=False)
+    # Bumped to revoke every token issued before; see services/auth.py
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -82,10 +90,14 @@ class User(db.Model):
     acknowledged_alerts = db.relationship('Alert', backref='acknowledger', lazy=True)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """Check password, re-hashing it if it was stored with older parameters; the caller commits"""
+        matches, upgraded = password_hasher.verify(self.password_hash, password)
+        if upgraded:
+            self.password_hash = upgraded
+        return matches
     
     def get_reset_password_token(self, expires_in=600):
         return jwt.encode(
@@ -124,6 +136,12 @@ class User(db.Model):
 # Keep all your other existing models (WaterPoint, MaintenanceTask, QualityCheck, etc.)
 class WaterPoint(db.Model):
     __tablename__ = 'water_points'
+    __table_args__ = (
+        db.Index('ix_water_points_status_region', 'status', 'region'),
+        db.Index('ix_water_points_name_region', 'name', 'region'),
+        # Bounding-box and nearby lookups
+        db.Index('ix_water_points_latitude_longitude', 'latitude', 'longitude'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -176,6 +194,11 @@ class WaterPoint(db.Model):
 
 class MaintenanceTask(db.Model):
     __tablename__ = 'maintenance_tasks'
+    __table_args__ = (
+        db.Index('ix_maintenance_tasks_status_scheduled_date', 'status', 'scheduled_date'),
+        db.Index('ix_maintenance_tasks_water_point_id_created_at', 'water_point_id', 'created_at'),
+        db.Index('ix_maintenance_tasks_technician_id_status', 'technician_id', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     water_point_id = db.Column(db.Integer, db.ForeignKey('water_points.id'), nullable=False)
@@ -184,14 +207,14 @@ class MaintenanceTask(db.Model):
     description = db.Column(db.Text)
     priority = db.Column(db.String(20), default='medium')
     status = db.Column(db.String(20), default='pending')
-    scheduled_date = db.Column(db.DateTime, nullable=False)
-    completed_date = db.Column(db.DateTime)
+    scheduled_date = db.Column(db.DateTime, nullable=False, index=True)
+    completed_date = db.Column(db.DateTime, index=True)
     estimated_duration = db.Column(db.Integer)
     actual_duration = db.Column(db.Integer)
     cost = db.Column(db.Float)
     parts_used = db.Column(db.Text)
     notes = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def to_dict(self):
@@ -215,6 +238,9 @@ class MaintenanceTask(db.Model):
 
 class QualityCheck(db.Model):
     __tablename__ = 'quality_checks'
+    __table_args__ = (
+        db.Index('ix_quality_checks_water_point_id_checked_at', 'water_point_id', 'checked_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     water_point_id = db.Column(db.Integer, db.ForeignKey('water_points.id'), nullable=False)
@@ -228,7 +254,7 @@ class QualityCheck(db.Model):
     overall_score = db.Column(db.Float)
     is_safe = db.Column(db.Boolean)
     notes = db.Column(db.Text)
-    checked_at = db.Column(db.DateTime, default=datetime.utcnow)
+    checked_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def to_dict(self):
@@ -250,6 +276,9 @@ class QualityCheck(db.Model):
 
 class WaterUsage(db.Model):
     __tablename__ = 'water_usage'
+    __table_args__ = (
+        db.Index('ix_water_usage_water_point_id_timestamp', 'water_point_id', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     water_point_id = db.Column(db.Integer, db.ForeignKey('water_points.id'), nullable=False)
@@ -257,7 +286,7 @@ class WaterUsage(db.Model):
     amount = db.Column(db.Float, nullable=False)
     cost = db.Column(db.Float, nullable=False)
     usage_type = db.Column(db.String(50))
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     meter_reading = db.Column(db.Float)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -274,6 +303,63 @@ class WaterUsage(db.Model):
             'createdAt': self.created_at.isoformat() if self.created_at else None
         }
 
+class SensorReading(db.Model):
+    """One telemetry value pushed by a field gateway"""
+    __tablename__ = 'sensor_readings'
+    __table_args__ = (
+        db.Index('ix_sensor_readings_water_point_id_sensor_type_timestamp',
+                 'water_point_id', 'sensor_type', 'timestamp'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    water_point_id = db.Column(db.Integer, db.ForeignKey('water_points.id'), nullable=False)
+    sensor_type = db.Column(db.String(20), nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    value = db.Column(db.Float, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'waterPointId': self.water_point_id,
+            'sensorType': self.sensor_type,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'value': self.value
+        }
+
+class DailyUsage(db.Model):
+    """Per water point, per day rollup of WaterUsage maintained by services.usage"""
+    __tablename__ = 'daily_usage'
+    __table_args__ = (
+        db.UniqueConstraint('water_point_id', 'day', name='uq_daily_usage_water_point_id_day'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    water_point_id = db.Column(db.Integer, db.ForeignKey('water_points.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False, index=True)
+    total_liters = db.Column(db.Float, nullable=False, default=0)
+    total_cost = db.Column(db.Float, nullable=False, default=0)
+    event_count = db.Column(db.Integer, nullable=False, default=0)
+    distinct_users = db.Column(db.Integer, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'waterPointId': self.water_point_id,
+            'day': self.day.isoformat() if self.day else None,
+            'totalLiters': self.total_liters,
+            'totalCost': self.total_cost,
+            'eventCount': self.event_count,
+            'distinctUsers': self.distinct_users
+        }
+
+class DailyUsageUser(db.Model):
+    """Users seen per water point and day, used to keep DailyUsage.distinct_users exact"""
+    __tablename__ = 'daily_usage_users'
+    
+    water_point_id = db.Column(db.Integer, db.ForeignKey('water_points.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+
 class Payment(db.Model):
     __tablename__ = 'payments'
     
@@ -303,6 +389,16 @@ class Payment(db.Model):
 
 class Alert(db.Model):
     __tablename__ = 'alerts'
+    __table_args__ = (
+        db.Index('ix_alerts_status_priority_created_at', 'status', 'priority', 'created_at'),
+        db.Index('ix_alerts_water_point_id_status', 'water_point_id', 'status'),
+        # Keyset pagination of alerts filtered by status only
+        db.Index('ix_alerts_status_created_at', 'status', 'created_at'),
+        # Coalescing lookup of an open alert for the same point and type
+        db.Index('ix_alerts_active_water_point_id_type_last_seen_at', 'water_point_id', 'type', 'last_seen_at',
+                 sqlite_where=db.text("status = 'active'"),
+                 postgresql_where=db.text("status = 'active'")),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     type = db.Column(db.String(50), nullable=False)
@@ -314,7 +410,10 @@ class Alert(db.Model):
     acknowledged_by = db.Column(db.Integer, db.ForeignKey('users.id'))
     acknowledged_at = db.Column(db.DateTime)
     resolved_at = db.Column(db.DateTime)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # Repeats of the same alert folded into this row
+    occurrences = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    last_seen_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def to_dict(self):
         return {
@@ -328,11 +427,17 @@ class Alert(db.Model):
             'acknowledgedBy': self.acknowledged_by,
             'acknowledgedAt': self.acknowledged_at.isoformat() if self.acknowledged_at else None,
             'resolvedAt': self.resolved_at.isoformat() if self.resolved_at else None,
-            'createdAt': self.created_at.isoformat() if self.created_at else None
+            'createdAt': self.created_at.isoformat() if self.created_at else None,
+            'occurrences': self.occurrences,
+            'lastSeenAt': self.last_seen_at.isoformat() if self.last_seen_at else None
         }
 
 class Report(db.Model):
     __tablename__ = 'reports'
+    __table_args__ = (
+        # Cached report lookup for closed periods
+        db.Index('ix_reports_type_period_end', 'type', 'period_end'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -438,4 +543,11 @@ class SystemSetting(db.Model):
             'category': self.category,
             'updatedBy': self.updated_by,
             'updatedAt': self.updated_at.isoformat() if self.updated_at else None
-        }
\ No newline at end of file
+        }
+
+class SettingsVersion(db.Model):
+    """Single row counting changes to system_settings, polled by services.settings"""
+    __tablename__ = 'settings_version'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
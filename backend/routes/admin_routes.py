@@ -2,13 +2,24 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db, User, WaterPoint, MaintenanceTask, QualityCheck, WaterUsage, Payment, Alert, Report, Inventory, AuditLog, SystemSetting
 from datetime import datetime, timedelta
+import json
+from services.aggregates import aggregate, count_if, sum_if
+from services.export import parse_date
+from services.reports import REPORT_BUILDERS, build_report, cached_report
+from services.identity import identity_cache
+from services.auth import request_claims, token_versions
+from services.settings import settings_store
 
 admin_bp = Blueprint('admin', __name__)
 
 # Helper function to check if user is admin
 def is_admin(user_id):
-    user = User.query.get(user_id)
-    return user and user.role == 'admin'
+    claims = request_claims()
+    if 'ver' in claims and str(claims.get('sub')) == str(user_id):
+        # Answered from the token; admin-account tokens carry role admin too
+        return claims['role'] == 'admin'
+    identity = identity_cache.get(user_id)
+    return identity is not None and identity.role == 'admin'
 
 # Dashboard Overview
 @admin_bp.route('/dashboard/overview', methods=['GET'])
@@ -19,29 +30,49 @@ def get_dashboard_overview():
     if not is_admin(current_user_id):
         return jsonify({'error': 'Admin access required'}), 403
     
-    # Get system stats
-    total_water_points = WaterPoint.query.count()
-    active_points = WaterPoint.query.filter_by(status='active').count()
-    maintenance_points = WaterPoint.query.filter_by(status='maintenance').count()
-    offline_points = WaterPoint.query.filter_by(status='offline').count()
+    last_month = datetime.utcnow() - timedelta(days=30)
+    today = datetime.utcnow().date()
     
-    total_users = User.query.count()
-    active_users = User.query.filter_by(is_active=True).count()
-    administrative_staff = User.query.filter_by(role='admin').count()
-    field_technicians = User.query.filter_by(role='technician').count()
+    # Get system stats
+    point_counts = aggregate(
+        WaterPoint,
+        total=db.func.count(WaterPoint.id),
+        active=count_if(WaterPoint.status == 'active'),
+        maintenance=count_if(WaterPoint.status == 'maintenance'),
+        offline=count_if(WaterPoint.status == 'offline')
+    )
+    total_water_points = point_counts['total']
+    active_points = point_counts['active']
+    maintenance_points = point_counts['maintenance']
+    offline_points = point_counts['offline']
+    
+    user_counts = aggregate(
+        User,
+        total=db.func.count(User.id),
+        active=count_if(User.is_active == True),
+        admins=count_if(User.role == 'admin'),
+        technicians=count_if(User.role == 'technician'),
+        registered_today=count_if(db.func.date(User.created_at) == today)
+    )
+    total_users = user_counts['total']
+    active_users = user_counts['active']
+    administrative_staff = user_counts['admins']
+    field_technicians = user_counts['technicians']
     
     # Calculate monthly revenue (last 30 days)
-    last_month = datetime.utcnow() - timedelta(days=30)
     monthly_revenue = db.session.query(db.func.sum(Payment.amount)).filter(
         Payment.status == 'completed',
         Payment.payment_date >= last_month
     ).scalar() or 0
     
-    # Calculate operational costs (from maintenance tasks)
-    operational_costs = db.session.query(db.func.sum(MaintenanceTask.cost)).filter(
-        MaintenanceTask.status == 'completed',
-        MaintenanceTask.completed_date >= last_month
-    ).scalar() or 0
+    # Calculate operational costs and today's completions (from maintenance tasks)
+    completed = MaintenanceTask.status == 'completed'
+    task_stats = aggregate(
+        MaintenanceTask,
+        operational_costs=sum_if(completed & (MaintenanceTask.completed_date >= last_month), MaintenanceTask.cost),
+        completed_today=count_if(completed & (db.func.date(MaintenanceTask.completed_date) == today))
+    )
+    operational_costs = task_stats['operational_costs']
     
     # Calculate system efficiency (based on active points)
     system_efficiency = (active_points / total_water_points * 100) if total_water_points > 0 else 0
@@ -50,7 +81,6 @@ def get_dashboard_overview():
     customer_satisfaction = 94.2
     
     # Get today's stats
-    today = datetime.utcnow().date()
     alerts_today = Alert.query.filter(
         db.func.date(Alert.created_at) == today
     ).count()
@@ -59,15 +89,10 @@ def get_dashboard_overview():
         db.func.date(Report.created_at) == today
     ).count()
     
-    maintenance_completed = MaintenanceTask.query.filter(
-        MaintenanceTask.status == 'completed',
-        db.func.date(MaintenanceTask.completed_date) == today
-    ).count()
+    maintenance_completed = task_stats['completed_today']
     
     # New registrations today
-    new_registrations = User.query.filter(
-        db.func.date(User.created_at) == today
-    ).count()
+    new_registrations = user_counts['registered_today']
     
     return jsonify({
         'systemStats': {
@@ -270,8 +295,13 @@ def update_user(user_id):
         user.is_active = data['is_active']
     if 'role' in data:
         user.role = data['role']
+    if 'is_active' in data or 'role' in data:
+        # Tokens carry role and active flag, so the ones issued before are revoked
+        token_versions.revoke(user_id)
     
     db.session.commit()
+    identity_cache.invalidate(user_id)
+    token_versions.expire()
     return jsonify(user.to_dict())
 
 # Financial Management
@@ -347,27 +377,47 @@ def generate_report():
     if not is_admin(current_user_id):
         return jsonify({'error': 'Admin access required'}), 403
     
-    data = request.get_json()
+    data = request.get_json() or {}
     report_type = data.get('type', 'general')
-    period_start = data.get('period_start')
-    period_end = data.get('period_end')
+    if report_type not in REPORT_BUILDERS:
+        return jsonify({'error': 'Invalid report type'}), 400
+    
+    try:
+        period_start = parse_date(data.get('period_start'))
+        period_end = parse_date(data.get('period_end'))
+    except ValueError:
+        return jsonify({'error': 'Invalid period_start or period_end format'}), 400
+    
+    # Re-running a closed period reuses the stored result
+    report = None if data.get('refresh') else cached_report(report_type, period_start, period_end)
+    if report:
+        return jsonify({
+            'message': 'Report loaded from cache',
+            'reportId': report.id,
+            'data': json.loads(report.data),
+            'cached': True
+        })
+    
+    report_data = build_report(report_type, period_start, period_end)
     
     # Create report entry
     report = Report(
         title=f"{report_type.title()} Report - {datetime.utcnow().strftime('%Y-%m-%d')}",
         type=report_type,
         generated_by=current_user_id,
-        period_start=datetime.fromisoformat(period_start) if period_start else None,
-        period_end=datetime.fromisoformat(period_end) if period_end else None,
-        data=json.dumps({'status': 'generated'})  # In real app, this would contain report data
+        period_start=period_start,
+        period_end=period_end,
+        data=json.dumps(report_data)
     )
     
     db.session.add(report)
     db.session.commit()
     
     return jsonify({
-        'message': 'Report generation started',
-        'reportId': report.id
+        'message': 'Report generated successfully',
+        'reportId': report.id,
+        'data': report_data,
+        'cached': False
     })
 
 # System Administration
@@ -379,8 +429,7 @@ def get_system_settings():
     if not is_admin(current_user_id):
         return jsonify({'error': 'Admin access required'}), 403
     
-    settings = SystemSetting.query.all()
-    return jsonify([setting.to_dict() for setting in settings])
+    return jsonify(settings_store.rows())
 
 @admin_bp.route('/system/settings', methods=['POST'])
 @jwt_required()
@@ -405,6 +454,8 @@ def update_system_settings():
                 updated_by=current_user_id
             )
             db.session.add(setting)
+    settings_store.bump()
     
     db.session.commit()
+    settings_store.expire()
     return jsonify({'message': 'Settings updated successfully'})
\ No newline at end of file
@@ -1,22 +1,48 @@
-from flask import Blueprint, request, jsonify, current_app, send_file
-from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token, create_refresh_token
+from flask import Blueprint, request, jsonify, current_app, send_file, Response, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
 import jwt
 import time
 import json
-from io import BytesIO
-import pandas as pd
 
-from models import db, User, WaterPoint, MaintenanceTask, QualityCheck, WaterUsage, Payment, Alert, Report, Inventory, AuditLog, SystemSetting
+from models import db, User, WaterPoint, MaintenanceTask, QualityCheck, WaterUsage, Payment, Alert, Report, Inventory, AuditLog, SystemSetting, DailyUsage
+from services.aggregates import aggregate, count_if
+from services.pagination import paginate, InvalidCursor
+from services.audit import audit_writer
+from services.bulk import existing_ids, bulk_update_by_ids, bulk_update_rows
+from services.importer import WaterPointImporter, read_chunks
+from services.export import (EXPORT_RESOURCES, EXPORT_FORMATS, export_query, iter_batches, stream_csv,
+                             stream_ndjson, stream_parquet, parquet_available, build_xlsx, parse_date)
+from services.reports import REPORT_BUILDERS, build_report, cached_report
+from services.telemetry import telemetry_buffer, validate_readings, TelemetryBackpressure
+from services.anomaly import anomaly_detector
+from services.live_state import latest_state
+from services.events import broadcaster
+from services.geo import nearest, within_bbox
+from services.routing import plan_route, plan_legs
+from services.assignment import active_technicians, plan_assignments, suggest_technician
+from services.identity import identity_cache
+from services.auth import (identity_for, issue_access_token, issue_refresh_token, issue_stream_token,
+                           stream_token_identity)
+from services.passwords import PasswordHashingBusy
+from services.settings import settings_store
+from services.quality import quality_scores
+from utils import hashing_busy
 
 # Create blueprint
 api = Blueprint('api', __name__)
 
 # Helper functions
-def log_audit(user_id, action, resource, resource_id=None, details=None):
-    """Log user actions for audit trail"""
-    audit_log = AuditLog(
+def log_audit(user_id, action, resource, resource_id=None, details=None, durable=False):
+    """
+    Log user actions for audit trail.
+
+    Records are batched and written in the background; pass durable=True for
+    actions that must be persisted before the response is sent.
+    """
+    audit_writer.record(
+        durable=durable,
         user_id=user_id,
         action=action,
         resource=resource,
@@ -25,16 +51,20 @@ def log_audit(user_id, action, resource, resource_id=None, details=None):
         ip_address=request.remote_addr,
         user_agent=request.headers.get('User-Agent')
     )
-    db.session.add(audit_log)
-    db.session.commit()
 
 def get_current_user():
-    """Get current user from JWT token with proper error handling"""
+    """
+    Get current user from JWT token with proper error handling.
+
+    Returns a CachedIdentity: id and role come from the token claims (or the
+    identity cache for older tokens), and other attributes load the User row
+    on first use.
+    """
     try:
         user_id = get_jwt_identity()
         if not user_id:
             return None
-        return User.query.get(user_id)
+        return identity_for(user_id)
     except Exception as e:
         current_app.logger.error(f"Error getting current user: {str(e)}")
         return None
@@ -98,6 +128,9 @@ def register():
             'user': user.to_dict()
         }), 201
         
+    except PasswordHashingBusy as e:
+        db.session.rollback()
+        return hashing_busy({'error': str(e)})
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Registration error: {str(e)}")
@@ -125,9 +158,12 @@ def login():
         if not user.is_active:
             return jsonify({'error': 'Account is deactivated'}), 401
         
+        # Saves the password hash when check_password upgraded it
+        db.session.commit()
+        
         # Create tokens
-        access_token = create_access_token(identity=user.id)
-        refresh_token = create_refresh_token(identity=user.id)
+        access_token = issue_access_token(user.id, user.role, user.is_active, user.token_version)
+        refresh_token = issue_refresh_token(user.id, user.role, user.is_active, user.token_version)
         
         # Log the action
         log_audit(user.id, 'LOGIN', 'AUTH', user.id, 'User logged in')
@@ -139,6 +175,8 @@ def login():
             'message': 'Login successful'
         }), 200
         
+    except PasswordHashingBusy as e:
+        return hashing_busy({'error': str(e)})
     except Exception as e:
         current_app.logger.error(f"Login error: {str(e)}")
         return jsonify({'error': 'Login failed: ' + str(e)}), 500
@@ -151,7 +189,8 @@ def refresh():
         if not current_user:
             return jsonify({'error': 'Invalid token'}), 401
             
-        new_token = create_access_token(identity=current_user.id)
+        new_token = issue_access_token(current_user.id, current_user.role, current_user.is_active,
+                                       current_user.token_version)
         
         return jsonify({
             'access_token': new_token
@@ -180,10 +219,13 @@ def change_password():
         current_user.set_password(data.get('new_password'))
         db.session.commit()
         
-        log_audit(current_user.id, 'CHANGE_PASSWORD', 'AUTH', current_user.id, 'Password changed')
+        log_audit(current_user.id, 'CHANGE_PASSWORD', 'AUTH', current_user.id, 'Password changed', durable=True)
         
         return jsonify({'message': 'Password updated successfully'}), 200
         
+    except PasswordHashingBusy as e:
+        db.session.rollback()
+        return hashing_busy({'error': str(e)})
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Password change error: {str(e)}")
@@ -227,6 +269,7 @@ def update_profile():
         
         current_user.updated_at = datetime.utcnow()
         db.session.commit()
+        identity_cache.invalidate(current_user.id)
         
         log_audit(current_user.id, 'UPDATE_PROFILE', 'USER', current_user.id, 'Profile updated')
         
@@ -271,8 +314,6 @@ def get_water_points():
             return jsonify({'error': 'Invalid token'}), 401
         
         # Basic filtering and pagination
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
         status = request.args.get('status')
         region = request.args.get('region')
         
@@ -283,21 +324,136 @@ def get_water_points():
         if region:
             query = query.filter(WaterPoint.region == region)
         
-        water_points = query.paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        return jsonify(paginate(query, 'water_points', [WaterPoint.id], descending=False)), 200
+        
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Get water points error: {str(e)}")
+        return jsonify({'error': 'Failed to get water points'}), 500
+
+@api.route('/water-points/nearby', methods=['GET'])
+@jwt_required()
+def get_nearby_water_points():
+    """
+    Water points closest to a location.
+
+    Query: lat, lon, radius (km, default 10, max 500), limit (default 10,
+    max 100), optional status and type. Archived points are left out.
+    """
+    try:
+        current_user = get_current_user()
+        if not current_user:
+            return jsonify({'error': 'Invalid token'}), 401
+        
+        lat = request.args.get('lat', type=float)
+        lon = request.args.get('lon', type=float)
+        radius = request.args.get('radius', 10.0, type=float)
+        limit = request.args.get('limit', 10, type=int)
+        if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            return jsonify({'error': 'lat and lon are required coordinates'}), 400
+        if not 0 < radius <= 500:
+            return jsonify({'error': 'radius must be between 0 and 500 km'}), 400
+        limit = min(max(limit, 1), 100)
+        
+        query = WaterPoint.query.filter(WaterPoint.status != 'archived')
+        if request.args.get('status'):
+            query = query.filter(WaterPoint.status == request.args.get('status'))
+        if request.args.get('type'):
+            query = query.filter(WaterPoint.type == request.args.get('type'))
+        
+        water_points = []
+        for water_point, distance in nearest(query, lat, lon, radius, limit):
+            data = water_point.to_dict()
+            data['distance_km'] = round(distance, 3)
+            water_points.append(data)
+        
+        return jsonify({'water_points': water_points, 'count': len(water_points)}), 200
+        
+    except Exception as e:
+        current_app.logger.error(f"Get nearby water points error: {str(e)}")
+        return jsonify({'error': 'Failed to get nearby water points'}), 500
+
+@api.route('/water-points/bbox', methods=['GET'])
+@jwt_required()
+def get_water_points_in_bbox():
+    """
+    Water points inside a map view.
+
+    Query: bbox=west,south,east,north in degrees (as Leaflet's
+    toBBoxString() gives), limit (default 1000, max 5000), optional status
+    and type. Archived points are left out; 'truncated' is set when more
+    points are in view than limit.
+    """
+    try:
+        current_user = get_current_user()
+        if not current_user:
+            return jsonify({'error': 'Invalid token'}), 401
+        
+        try:
+            west, south, east, north = (float(item) for item in request.args.get('bbox', '').split(','))
+        except ValueError:
+            return jsonify({'error': 'bbox must be west,south,east,north'}), 400
+        if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+            return jsonify({'error': 'bbox is out of range'}), 400
+        limit = min(max(request.args.get('limit', 1000, type=int), 1), 5000)
+        
+        query = WaterPoint.query.filter(WaterPoint.status != 'archived')
+        if request.args.get('status'):
+            query = query.filter(WaterPoint.status == request.args.get('status'))
+        if request.args.get('type'):
+            query = query.filter(WaterPoint.type == request.args.get('type'))
+        
+        water_points = within_bbox(query, south, west, north, east).order_by(WaterPoint.id).limit(limit + 1).all()
         
         return jsonify({
-            'water_points': [wp.to_dict() for wp in water_points.items],
-            'total': water_points.total,
-            'pages': water_points.pages,
-            'current_page': page
+            'water_points': [water_point.to_dict() for water_point in water_points[:limit]],
+            'count': min(len(water_points), limit),
+            'truncated': len(water_points) > limit
         }), 200
         
     except Exception as e:
-        current_app.logger.error(f"Get water points error: {str(e)}")
+        current_app.logger.error(f"Get water points in bbox error: {str(e)}")
         return jsonify({'error': 'Failed to get water points'}), 500
 
+@api.route('/water-points/clusters', methods=['GET'])
+@jwt_required()
+def get_water_point_clusters():
+    """
+    Map clusters of water points in view.
+
+    Query: bbox=west,south,east,north and zoom (0-22). Each cluster has its
+    centre, point count, counts by status and average quality score; a
+    cluster of one point also carries the water point. Archived points are
+    left out.
+    """
+    try:
+        current_user = get_current_user()
+        if not current_user:
+            return jsonify({'error': 'Invalid token'}), 401
+        
+        try:
+            west, south, east, north = (float(item) for item in request.args.get('bbox', '').split(','))
+        except ValueError:
+            return jsonify({'error': 'bbox must be west,south,east,north'}), 400
+        if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+            return jsonify({'error': 'bbox is out of range'}), 400
+        zoom = request.args.get('zoom', type=int)
+        if zoom is None or not 0 <= zoom <= 22:
+            return jsonify({'error': 'zoom must be an integer between 0 and 22'}), 400
+        
+        clusters = latest_state.clusters(zoom, south, west, north, east)
+        
+        return jsonify({
+            'clusters': clusters,
+            'count': len(clusters),
+            'zoom': zoom
+        }), 200
+        
+    except Exception as e:
+        current_app.logger.error(f"Get water point clusters error: {str(e)}")
+        return jsonify({'error': 'Failed to get water point clusters'}), 500
+
 @api.route('/water-points/<int:water_point_id>', methods=['GET'])
 @jwt_required()
 def get_water_point(water_point_id):
@@ -464,8 +620,6 @@ def get_maintenance_tasks():
         if not current_user:
             return jsonify({'error': 'Invalid token'}), 401
         
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
         status = request.args.get('status')
         priority = request.args.get('priority')
         
@@ -480,15 +634,10 @@ def get_maintenance_tasks():
         if current_user.role == 'technician':
             query = query.filter(MaintenanceTask.technician_id == current_user.id)
         
-        tasks = query.paginate(page=page, per_page=per_page, error_out=False)
-        
-        return jsonify({
-            'tasks': [task.to_dict() for task in tasks.items],
-            'total': tasks.total,
-            'pages': tasks.pages,
-            'current_page': page
-        }), 200
+        return jsonify(paginate(query, 'tasks', [MaintenanceTask.id])), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Get maintenance tasks error: {str(e)}")
         return jsonify({'error': 'Failed to get maintenance tasks'}), 500
@@ -509,14 +658,37 @@ def create_maintenance_task():
         if not data:
             return jsonify({'error': 'No JSON data provided'}), 400
         
+        estimated_duration = data.get('estimated_duration')
+        if estimated_duration is not None:
+            try:
+                estimated_duration = int(estimated_duration)
+            except (TypeError, ValueError):
+                return jsonify({'error': 'estimated_duration must be a whole number of minutes'}), 400
+            if estimated_duration < 0:
+                return jsonify({'error': 'estimated_duration must be a whole number of minutes'}), 400
+        
+        technician_id = data.get('technician_id')
+        if not technician_id:
+            # Left to the assignment engine
+            water_point = WaterPoint.query.get(data.get('water_point_id')) if data.get('water_point_id') else None
+            if not water_point:
+                return jsonify({'error': 'water_point_id is required'}), 400
+            technician_id = suggest_technician(
+                water_point.latitude, water_point.longitude, data.get('priority', 'medium'),
+                estimated_duration, current_app.config.get('ROUTE_DEPOT', (-0.4532, 39.6461)),
+                current_app.config.get('ASSIGN_LOAD_WEIGHT', 25.0)
+            )
+            if technician_id is None:
+                return jsonify({'error': 'No active technician to assign'}), 400
+        
         task = MaintenanceTask(
             water_point_id=data.get('water_point_id'),
-            technician_id=data.get('technician_id'),
+            technician_id=technician_id,
             title=data.get('title'),
             description=data.get('description'),
             priority=data.get('priority', 'medium'),
             scheduled_date=datetime.fromisoformat(data.get('scheduled_date')) if data.get('scheduled_date') else None,
-            estimated_duration=data.get('estimated_duration')
+            estimated_duration=estimated_duration
         )
         
         db.session.add(task)
@@ -579,6 +751,196 @@ def update_maintenance_task(task_id):
         current_app.logger.error(f"Update maintenance task error: {str(e)}")
         return jsonify({'error': 'Failed to update maintenance task'}), 500
 
+# String spellings of dry_run accepted alongside JSON booleans
+DRY_RUN_VALUES = {'true': True, '1': True, 'yes': True, 'false': False, '0': False, 'no': False}
+
+@api.route('/maintenance-tasks/auto-assign', methods=['POST'])
+@jwt_required()
+def auto_assign_maintenance_tasks():
+    """
+    Rebalance pending maintenance tasks across active technicians.
+
+    Body (all optional): {"region", "date_from", "date_to", "dry_run"}.
+    Each task goes to the technician with the best mix of distance (weighted
+    by priority) and queued work; changes are written in one bulk update.
+    """
+    try:
+        current_user = get_current_user()
+        if not current_user:
+            return jsonify({'error': 'Invalid token'}), 401
+        
+        if current_user.role not in ['admin', 'supervisor']:
+            return jsonify({'error': 'Insufficient permissions'}), 403
+        
+        data = request.get_json(silent=True) or {}
+        dry_run = data.get('dry_run', False)
+        if isinstance(dry_run, str):
+            dry_run = DRY_RUN_VALUES.get(dry_run.strip().lower(), dry_run)
+        if not isinstance(dry_run, bool):
+            return jsonify({'error': 'dry_run must be true or false'}), 400
+        try:
+            date_from = parse_date(data.get('date_from'))
+            date_to = parse_date(data.get('date_to'))
+        except (AttributeError, TypeError, ValueError):
+            return jsonify({'error': 'Invalid date'}), 400
+        
+        technicians = active_technicians()
+        if not technicians:
+            return jsonify({'error': 'No active technicians'}), 400
+        
+        query = db.session.query(
+            MaintenanceTask.id, MaintenanceTask.technician_id, MaintenanceTask.water_point_id,
+            MaintenanceTask.status, MaintenanceTask.priority, MaintenanceTask.estimated_duration,
+            WaterPoint.latitude, WaterPoint.longitude
+        ).join(WaterPoint, MaintenanceTask.water_point_id == WaterPoint.id).filter(
+            MaintenanceTask.status == 'pending'
+        )
+        if data.get('region'):
+            query = query.filter(WaterPoint.region == data['region'])
+        if date_from:
+            query = query.filter(MaintenanceTask.scheduled_date >= date_from)
+        if date_to:
+            query = query.filter(MaintenanceTask.scheduled_date <= date_to)
+        rows = query.order_by(MaintenanceTask.scheduled_date, MaintenanceTask.id).all()
+        
+        assignments, load = plan_assignments(
+            rows, technicians, current_app.config.get('ROUTE_DEPOT', (-0.4532, 39.6461)),
+            current_app.config.get('ASSIGN_LOAD_WEIGHT', 25.0)
+        )
+        changed = [(row, technician_id, distance) for row, technician_id, distance in assignments
+                   if technician_id != row.technician_id]
+        
+        if changed and not dry_run:
+            bulk_update_rows(
+                MaintenanceTask, [{'id': row.id, 'technician_id': technician_id} for row, technician_id, _ in changed],
+                extra_values={'updated_at': datetime.utcnow()}
+            )
+            db.session.commit()
+            # Core UPDATEs bypass the session events that keep the monitoring store current
+            latest_state.invalidate({row.water_point_id for row, _, _ in changed})
+            log_audit(current_user.id, 'BULK_UPDATE', 'MAINTENANCE_TASK', None,
+                      f'Auto-assigned {len(changed)} of {len(rows)} pending maintenance tasks')
+        
+        assigned_counts = {}
+        for _, technician_id, _ in assignments:
+            assigned_counts[technician_id] = assigned_counts.get(technician_id, 0) + 1
+        
+        return jsonify({
+            'dry_run': dry_run,
+            'tasks_considered': len(rows),
+            'reassigned': len(changed),
+            'technicians': [{
+                'id': technician.id,
+                'full_name': technician.full_name,
+                'assigned_tasks': assigned_counts.get(technician.id, 0),
+                'queued_minutes': round(load[technician.id])
+            } for technician in technicians],
+            'assignments': [{
+                'task_id': row.id,
+                'water_point_id': row.water_point_id,
+                'from_technician_id': row.technician_id,
+                'to_technician_id': technician_id,
+                'distance_km': round(distance, 2)
+            } for row, technician_id, distance in changed]
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Auto assign maintenance tasks error: {str(e)}")
+        return jsonify({'error': 'Failed to assign maintenance tasks'}), 500
+
+@api.route('/maintenance-tasks/plan-route', methods=['POST'])
+@jwt_required()
+def plan_maintenance_route():
+    """
+    Order a technician's open tasks for one day into a short driving route.
+
+    Body: {"technician_id"?, "date"? (YYYY-MM-DD, default today),
+    "start"? {"latitude", "longitude"} (default ROUTE_DEPOT),
+    "return_to_start"? bool}. Technicians plan their own route. Tasks at the
+    same water point share a stop. The order is not saved.
+    """
+    try:
+        current_user = get_current_user()
+        if not current_user:
+            return jsonify({'error': 'Invalid token'}), 401
+        
+        data = request.get_json(silent=True) or {}
+        
+        try:
+            technician_id = int(data.get('technician_id', current_user.id))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid technician_id'}), 400
+        if current_user.role not in ['admin', 'supervisor'] and technician_id != current_user.id:
+            return jsonify({'error': 'Insufficient permissions'}), 403
+        
+        try:
+            day = parse_date(data.get('date')) or datetime.utcnow()
+            day = day.replace(hour=0, minute=0, second=0, microsecond=0)
+            start = data.get('start') or {}
+            latitude, longitude = current_app.config.get('ROUTE_DEPOT', (-0.4532, 39.6461))
+            start = (float(start.get('latitude', latitude)), float(start.get('longitude', longitude)))
+        except (AttributeError, TypeError, ValueError):
+            return jsonify({'error': 'Invalid date or start location'}), 400
+        if not (-90 <= start[0] <= 90 and -180 <= start[1] <= 180):
+            return jsonify({'error': 'Invalid date or start location'}), 400
+        return_to_start = bool(data.get('return_to_start', False))
+        
+        rows = db.session.query(MaintenanceTask, WaterPoint).join(
+            WaterPoint, MaintenanceTask.water_point_id == WaterPoint.id
+        ).filter(
+            MaintenanceTask.technician_id == technician_id,
+            MaintenanceTask.status.in_(['pending', 'in_progress']),
+            MaintenanceTask.scheduled_date >= day,
+            MaintenanceTask.scheduled_date < day + timedelta(days=1)
+        ).order_by(MaintenanceTask.scheduled_date, MaintenanceTask.id).all()
+        
+        # One stop per water point, in scheduled order for the comparison below
+        stops = {}
+        for task, water_point in rows:
+            stop = stops.setdefault(water_point.id, {'water_point': water_point, 'tasks': []})
+            stop['tasks'].append(task.to_dict())
+        stops = list(stops.values())
+        coordinates = [(stop['water_point'].latitude, stop['water_point'].longitude) for stop in stops]
+        
+        order, legs = plan_route(start, coordinates, return_to_start)
+        scheduled_km = sum(plan_legs(start, coordinates, return_to_start))
+        
+        route = []
+        driven = 0.0
+        for position, (index, leg) in enumerate(zip(order, legs), start=1):
+            stop = stops[index]
+            water_point = stop['water_point']
+            driven += leg
+            route.append({
+                'order': position,
+                'water_point': {
+                    'id': water_point.id,
+                    'name': water_point.name,
+                    'latitude': water_point.latitude,
+                    'longitude': water_point.longitude
+                },
+                'tasks': stop['tasks'],
+                'leg_km': round(leg, 2),
+                'cumulative_km': round(driven, 2)
+            })
+        total_km = sum(legs)
+        
+        return jsonify({
+            'technician_id': technician_id,
+            'date': day.date().isoformat(),
+            'start': {'latitude': start[0], 'longitude': start[1]},
+            'return_to_start': return_to_start,
+            'stops': route,
+            'return_leg_km': round(legs[-1], 2) if return_to_start and legs else None,
+            'total_km': round(total_km, 2),
+            'scheduled_order_km': round(scheduled_km, 2)
+        }), 200
+        
+    except Exception as e:
+        current_app.logger.error(f"Plan maintenance route error: {str(e)}")
+        return jsonify({'error': 'Failed to plan route'}), 500
+
 # Quality Checks Routes
 @api.route('/quality-checks', methods=['POST'])
 @jwt_required()
@@ -607,7 +969,7 @@ def create_quality_check():
         
         # Calculate overall score (simplified)
         quality_check.overall_score = calculate_quality_score(quality_check)
-        quality_check.is_safe = quality_check.overall_score >= 70  # Example threshold
+        quality_check.is_safe = quality_check.overall_score >= settings_store.number('quality_safe_score')
         
         db.session.add(quality_check)
         
@@ -632,26 +994,9 @@ def create_quality_check():
         return jsonify({'error': 'Failed to create quality check'}), 500
 
 def calculate_quality_score(quality_check):
-    """Calculate overall water quality score"""
-    score = 100
-    
-    # pH penalty (ideal range 6.5-8.5)
-    if quality_check.ph_level and (quality_check.ph_level < 6.5 or quality_check.ph_level > 8.5):
-        score -= 20
-    
-    # Turbidity penalty
-    if quality_check.turbidity and quality_check.turbidity > 5:
-        score -= 15
-    
-    # Chlorine penalty
-    if quality_check.chlorine_level and (quality_check.chlorine_level < 0.2 or quality_check.chlorine_level > 4):
-        score -= 10
-    
-    # E.coli penalty
-    if quality_check.e_coli_presence:
-        score -= 30
-    
-    return max(score, 0)
+    """Calculate overall water quality score with the same rules as the batch re-scoring job"""
+    return float(quality_scores([quality_check.ph_level], [quality_check.turbidity],
+                                [quality_check.chlorine_level], [quality_check.e_coli_presence])[0])
 
 # Alerts Routes
 @api.route('/alerts', methods=['GET'])
@@ -662,8 +1007,6 @@ def get_alerts():
         if not current_user:
             return jsonify({'error': 'Invalid token'}), 401
             
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
         status = request.args.get('status', 'active')
         priority = request.args.get('priority')
         
@@ -674,17 +1017,10 @@ def get_alerts():
         if priority:
             query = query.filter(Alert.priority == priority)
         
-        alerts = query.order_by(Alert.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
-        
-        return jsonify({
-            'alerts': [alert.to_dict() for alert in alerts.items],
-            'total': alerts.total,
-            'pages': alerts.pages,
-            'current_page': page
-        }), 200
+        return jsonify(paginate(query, 'alerts', [Alert.created_at, Alert.id])), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Get alerts error: {str(e)}")
         return jsonify({'error': 'Failed to get alerts'}), 500
@@ -753,17 +1089,23 @@ def get_dashboard_stats():
         if not current_user:
             return jsonify({'error': 'Invalid token'}), 401
         
-        total_water_points = WaterPoint.query.count()
-        active_water_points = WaterPoint.query.filter_by(status='active').count()
+        last_week = datetime.utcnow() - timedelta(days=7)
+        
+        # One scan for the water point counters; single counters stay filtered
+        point_counts = aggregate(
+            WaterPoint,
+            total=db.func.count(WaterPoint.id),
+            active=count_if(WaterPoint.status == 'active'),
+            new_this_week=count_if(WaterPoint.created_at >= last_week)
+        )
         quality_alerts = Alert.query.filter_by(type='quality', status='active').count()
         community_reports = Report.query.filter_by(type='community').count()
         
-        # Calculate weekly trend (simplified)
-        last_week = datetime.utcnow() - timedelta(days=7)
-        new_points_this_week = WaterPoint.query.filter(
-            WaterPoint.created_at >= last_week
-        ).count()
+        total_water_points = point_counts['total']
+        active_water_points = point_counts['active']
+        new_points_this_week = point_counts['new_this_week']
         
+        # Calculate weekly trend (simplified)
         weekly_trend = '+0%'
         if total_water_points > 0:
             trend_percentage = (new_points_this_week / total_water_points) * 100
@@ -800,28 +1142,37 @@ def generate_report():
             return jsonify({'error': 'No JSON data provided'}), 400
         
         report_type = data.get('type')
-        period_start = data.get('period_start')
-        period_end = data.get('period_end')
-        
-        # Generate report based on type
-        if report_type == 'water_quality':
-            report_data = generate_water_quality_report(period_start, period_end)
-        elif report_type == 'maintenance':
-            report_data = generate_maintenance_report(period_start, period_end)
-        elif report_type == 'usage':
-            report_data = generate_usage_report(period_start, period_end)
-        else:
+        if report_type not in REPORT_BUILDERS:
             return jsonify({'error': 'Invalid report type'}), 400
         
+        try:
+            period_start = parse_date(data.get('period_start'))
+            period_end = parse_date(data.get('period_end'))
+        except ValueError:
+            return jsonify({'error': 'Invalid period_start or period_end format'}), 400
+        
+        # Closed periods don't change, so an earlier run is served as-is
+        if not data.get('refresh'):
+            cached = cached_report(report_type, period_start, period_end)
+            if cached:
+                return jsonify({
+                    'message': 'Report loaded from cache',
+                    'report': cached.to_dict(),
+                    'data': json.loads(cached.data),
+                    'cached': True
+                }), 200
+        
+        report_data = build_report(report_type, period_start, period_end)
+        
         # Save report to database
         report = Report(
             title=f"{report_type.replace('_', ' ').title()} Report",
             type=report_type,
-            description=f"Report generated for period {period_start} to {period_end}",
+            description=f"Report generated for period {data.get('period_start')} to {data.get('period_end')}",
             generated_by=current_user.id,
             data=json.dumps(report_data),
-            period_start=datetime.fromisoformat(period_start) if period_start else None,
-            period_end=datetime.fromisoformat(period_end) if period_end else None
+            period_start=period_start,
+            period_end=period_end
         )
         
         db.session.add(report)
@@ -832,7 +1183,8 @@ def generate_report():
         return jsonify({
             'message': 'Report generated successfully',
             'report': report.to_dict(),
-            'data': report_data
+            'data': report_data,
+            'cached': False
         }), 201
         
     except Exception as e:
@@ -840,41 +1192,6 @@ def generate_report():
         current_app.logger.error(f"Generate report error: {str(e)}")
         return jsonify({'error': 'Failed to generate report'}), 500
 
-def generate_water_quality_report(period_start, period_end):
-    """Generate water quality report"""
-    # This would query the database and generate actual report data
-    return {
-        'summary': {
-            'total_checks': 150,
-            'safe_percentage': 92.5,
-            'average_score': 88.2
-        },
-        'details': []  # Would contain detailed quality data
-    }
-
-def generate_maintenance_report(period_start, period_end):
-    """Generate maintenance report"""
-    return {
-        'summary': {
-            'total_tasks': 45,
-            'completed': 38,
-            'pending': 7,
-            'total_cost': 12500.00
-        },
-        'details': []  # Would contain detailed maintenance data
-    }
-
-def generate_usage_report(period_start, period_end):
-    """Generate water usage report"""
-    return {
-        'summary': {
-            'total_usage': 2400000,  # liters
-            'average_daily': 80000,
-            'peak_usage': 120000
-        },
-        'details': []  # Would contain detailed usage data
-    }
-
 # Inventory Routes
 @api.route('/inventory', methods=['GET'])
 @jwt_required()
@@ -884,8 +1201,6 @@ def get_inventory():
         if not current_user:
             return jsonify({'error': 'Invalid token'}), 401
             
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
         category = request.args.get('category')
         
         query = Inventory.query
@@ -893,15 +1208,10 @@ def get_inventory():
         if category:
             query = query.filter(Inventory.category == category)
         
-        inventory = query.paginate(page=page, per_page=per_page, error_out=False)
-        
-        return jsonify({
-            'inventory': [item.to_dict() for item in inventory.items],
-            'total': inventory.total,
-            'pages': inventory.pages,
-            'current_page': page
-        }), 200
+        return jsonify(paginate(query, 'inventory', [Inventory.id], descending=False)), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Get inventory error: {str(e)}")
         return jsonify({'error': 'Failed to get inventory'}), 500
@@ -938,10 +1248,8 @@ def get_settings():
         if current_user.role not in ['admin', 'supervisor']:
             return jsonify({'error': 'Insufficient permissions'}), 403
         
-        settings = SystemSetting.query.all()
-        
         return jsonify({
-            'settings': {setting.key: setting.value for setting in settings}
+            'settings': settings_store.values()
         }), 200
         
     except Exception as e:
@@ -971,8 +1279,10 @@ def update_setting(key):
         setting.value = data.get('value')
         setting.updated_by = current_user.id
         setting.updated_at = datetime.utcnow()
+        settings_store.bump()
         
         db.session.commit()
+        settings_store.expire()
         
         log_audit(current_user.id, 'UPDATE', 'SETTING', setting.id, f'Updated setting: {key}')
         
@@ -995,32 +1305,46 @@ def export_data(resource):
         if not current_user:
             return jsonify({'error': 'Invalid token'}), 401
         
-        if resource == 'water_points':
-            data = WaterPoint.query.all()
-            df = pd.DataFrame([item.to_dict() for item in data])
-        elif resource == 'quality_checks':
-            data = QualityCheck.query.all()
-            df = pd.DataFrame([item.to_dict() for item in data])
-        elif resource == 'maintenance_tasks':
-            data = MaintenanceTask.query.all()
-            df = pd.DataFrame([item.to_dict() for item in data])
-        else:
+        if resource not in EXPORT_RESOURCES:
             return jsonify({'error': 'Invalid resource type'}), 400
         
-        # Create Excel file in memory
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, sheet_name=resource, index=False)
-        
-        output.seek(0)
-        
-        log_audit(current_user.id, 'EXPORT', resource.upper(), None, f'Exported {resource} data')
+        export_format = request.args.get('format', 'xlsx')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'error': f'Invalid format, expected one of {sorted(EXPORT_FORMATS)}'}), 400
+        if export_format == 'parquet' and not parquet_available():
+            return jsonify({'error': 'Parquet export requires pyarrow to be installed'}), 400
+        
+        # Filters are applied in SQL so only matching rows are read
+        try:
+            start = parse_date(request.args.get('start'))
+            end = parse_date(request.args.get('end'))
+        except ValueError:
+            return jsonify({'error': 'Invalid start or end date format'}), 400
+        
+        query = export_query(resource, start, end, request.args.get('region'))
+        mimetype, extension = EXPORT_FORMATS[export_format]
+        download_name = f'{resource}_export_{datetime.utcnow().date()}.{extension}'
+        
+        log_audit(current_user.id, 'EXPORT', resource.upper(), None, f'Exported {resource} data as {export_format}')
+        
+        if export_format == 'xlsx':
+            return send_file(
+                build_xlsx(iter_batches(query), resource),
+                mimetype=mimetype,
+                as_attachment=True,
+                download_name=download_name
+            )
+        
+        if export_format == 'parquet':
+            body = stream_parquet(iter_batches(query), EXPORT_RESOURCES[resource][0])
+        else:
+            writers = {'csv': stream_csv, 'ndjson': stream_ndjson}
+            body = writers[export_format](iter_batches(query))
         
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=f'{resource}_export_{datetime.utcnow().date()}.xlsx'
+        return Response(
+            stream_with_context(body),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename={download_name}'}
         )
         
     except Exception as e:
@@ -1028,6 +1352,10 @@ def export_data(resource):
         return jsonify({'error': 'Failed to export data'}), 500
 
 # Admin Water Points CRUD Routes
+
+# Columns that are always populated, so they are safe keyset sort keys
+ADMIN_WATER_POINT_SORT_FIELDS = ['id', 'name', 'type', 'region', 'location', 'status', 'created_at']
+
 @api.route('/admin/water-points', methods=['GET'])
 @jwt_required()
 def admin_get_water_points():
@@ -1044,8 +1372,6 @@ def admin_get_water_points():
             return jsonify({'error': 'Admin access required'}), 403
         
         # Advanced filtering and pagination
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
         status = request.args.get('status')
         region = request.args.get('region')
         type_filter = request.args.get('type')
@@ -1063,27 +1389,24 @@ def admin_get_water_points():
         if manager_id:
             query = query.filter(WaterPoint.manager_id == manager_id)
         
-        # Sorting
+        # Sorting (the id tie-breaker keeps pages stable and cursors unique)
         sort_by = request.args.get('sort_by', 'created_at')
         sort_order = request.args.get('sort_order', 'desc')
         
-        if sort_order == 'desc':
-            query = query.order_by(getattr(WaterPoint, sort_by).desc())
-        else:
-            query = query.order_by(getattr(WaterPoint, sort_by).asc())
+        if sort_by not in ADMIN_WATER_POINT_SORT_FIELDS:
+            return jsonify({'error': f'Cannot sort by {sort_by}'}), 400
         
-        water_points = query.paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        order_columns = [getattr(WaterPoint, sort_by), WaterPoint.id]
+        if sort_by == 'id':
+            order_columns = [WaterPoint.id]
         
-        return jsonify({
-            'water_points': [wp.to_dict() for wp in water_points.items],
-            'total': water_points.total,
-            'pages': water_points.pages,
-            'current_page': page,
-            'per_page': per_page
-        }), 200
+        return jsonify(paginate(
+            query, 'water_points', order_columns,
+            default_per_page=20, descending=sort_order == 'desc'
+        )), 200
         
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Admin get water points error: {str(e)}")
         return jsonify({'error': 'Failed to get water points'}), 500
@@ -1315,7 +1638,7 @@ def admin_delete_water_point(water_point_id):
         
         # Log before deletion
         log_audit(current_user.id, 'DELETE', 'WATER_POINT', water_point_id, 
-                 f'Admin deleted water point: {water_point.name}')
+                 f'Admin deleted water point: {water_point.name}', durable=True)
         
         db.session.delete(water_point)
         db.session.commit()
@@ -1417,40 +1740,73 @@ def admin_bulk_update_water_points():
         if not data:
             return jsonify({'error': 'No JSON data provided'}), 400
         
-        water_point_ids = data.get('water_point_ids', [])
-        updates = data.get('updates', {})
-        
-        if not water_point_ids:
-            return jsonify({'error': 'No water point IDs provided'}), 400
-        
-        if not updates:
-            return jsonify({'error': 'No updates provided'}), 400
-        
         # Valid fields for bulk update
         allowed_fields = ['status', 'region', 'manager_id']
         
-        for field in updates.keys():
-            if field not in allowed_fields:
-                return jsonify({'error': f'Field {field} is not allowed for bulk update'}), 400
-        
-        # Update water points
-        updated_count = 0
-        for water_point_id in water_point_ids:
-            water_point = WaterPoint.query.get(water_point_id)
-            if water_point:
-                for field, value in updates.items():
-                    setattr(water_point, field, value)
-                water_point.updated_at = datetime.utcnow()
-                updated_count += 1
+        # Either the same updates for every id in water_point_ids, or per-row
+        # values as a list of {"id": ..., <field>: <value>} objects in "rows"
+        water_point_ids = data.get('water_point_ids', [])
+        updates = data.get('updates', {})
+        rows = data.get('rows', [])
+        
+        if rows:
+            for row in rows:
+                if not isinstance(row, dict) or not isinstance(row.get('id'), int):
+                    return jsonify({'error': 'Each row must be an object with an integer id'}), 400
+                fields = [field for field in row if field != 'id']
+                if not fields:
+                    return jsonify({'error': f'No updates provided for water point {row["id"]}'}), 400
+                for field in fields:
+                    if field not in allowed_fields:
+                        return jsonify({'error': f'Field {field} is not allowed for bulk update'}), 400
+            
+            # Last row wins when an id appears more than once
+            rows = list({row['id']: row for row in rows}.values())
+            water_point_ids = [row['id'] for row in rows]
+        else:
+            if not water_point_ids:
+                return jsonify({'error': 'No water point IDs provided'}), 400
+            
+            if not updates:
+                return jsonify({'error': 'No updates provided'}), 400
+            
+            if not all(isinstance(water_point_id, int) for water_point_id in water_point_ids):
+                return jsonify({'error': 'Water point IDs must be integers'}), 400
+            
+            for field in updates.keys():
+                if field not in allowed_fields:
+                    return jsonify({'error': f'Field {field} is not allowed for bulk update'}), 400
+            
+            water_point_ids = list(dict.fromkeys(water_point_ids))
+        
+        # One SELECT per chunk tells us which ids exist
+        found_ids = existing_ids(WaterPoint, water_point_ids)
+        missing_ids = [water_point_id for water_point_id in water_point_ids if water_point_id not in found_ids]
+        
+        now = datetime.utcnow()
+        if rows:
+            updated_count = bulk_update_rows(
+                WaterPoint, [row for row in rows if row['id'] in found_ids],
+                extra_values={'updated_at': now}
+            )
+        else:
+            updated_count = bulk_update_by_ids(
+                WaterPoint, [water_point_id for water_point_id in water_point_ids if water_point_id in found_ids],
+                dict(updates, updated_at=now)
+            )
         
         db.session.commit()
+        # Core UPDATEs bypass the session events that keep the monitoring store current
+        latest_state.invalidate(found_ids)
         
         log_audit(current_user.id, 'BULK_UPDATE', 'WATER_POINT', None, 
                  f'Admin bulk updated {updated_count} water points')
         
         return jsonify({
             'message': f'Successfully updated {updated_count} water points',
-            'updated_count': updated_count
+            'matched_count': len(found_ids),
+            'updated_count': updated_count,
+            'missing_ids': missing_ids
         }), 200
         
     except Exception as e:
@@ -1483,59 +1839,20 @@ def admin_import_water_points():
         if not (file.filename.endswith('.csv') or file.filename.endswith('.xlsx')):
             return jsonify({'error': 'File must be CSV or Excel format'}), 400
         
-        # Read file
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(file)
-        else:
-            df = pd.read_excel(file)
-        
-        required_columns = ['name', 'type', 'region', 'location']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        
-        if missing_columns:
-            return jsonify({'error': f'Missing required columns: {missing_columns}'}), 400
+        importer = WaterPointImporter()
+        chunk_size = current_app.config.get('IMPORT_CHUNK_SIZE', 5000)
         
-        imported_count = 0
-        errors = []
-        
-        for index, row in df.iterrows():
-            try:
-                # Check for duplicates
-                existing = WaterPoint.query.filter_by(
-                    name=row['name'],
-                    region=row['region']
-                ).first()
-                
-                if existing:
-                    errors.append(f"Row {index + 1}: Water point '{row['name']}' already exists in {row['region']}")
-                    continue
-                
-                water_point = WaterPoint(
-                    name=row['name'],
-                    type=row['type'],
-                    region=row['region'],
-                    location=row['location'],
-                    latitude=row.get('latitude'),
-                    longitude=row.get('longitude'),
-                    capacity=row.get('capacity'),
-                    current_level=row.get('current_level', 0),
-                    quality_score=row.get('quality_score', 0),
-                    coverage=row.get('coverage', 0),
-                    population_served=row.get('population_served', 0),
-                    status=row.get('status', 'active'),
-                    infrastructure_type=row.get('infrastructure_type'),
-                    water_source=row.get('water_source'),
-                    treatment_method=row.get('treatment_method')
-                )
-                
-                db.session.add(water_point)
-                imported_count += 1
-                
-            except Exception as e:
-                errors.append(f"Row {index + 1}: {str(e)}")
-                continue
+        for chunk in read_chunks(file, file.filename, chunk_size):
+            missing_columns = importer.missing_columns(chunk.columns)
+            if missing_columns:
+                return jsonify({'error': f'Missing required columns: {missing_columns}'}), 400
+            
+            importer.import_chunk(chunk)
         
-        db.session.commit()
+        imported_count = importer.imported_count
+        errors = importer.errors
+        if imported_count:
+            latest_state.invalidate()
         
         log_audit(current_user.id, 'IMPORT', 'WATER_POINT', None, 
                  f'Admin imported {imported_count} water points')
@@ -1543,7 +1860,8 @@ def admin_import_water_points():
         return jsonify({
             'message': f'Successfully imported {imported_count} water points',
             'imported_count': imported_count,
-            'errors': errors
+            'errors': errors,
+            'ignored_columns': sorted(importer.ignored_columns)
         }), 201
         
     except Exception as e:
@@ -1563,7 +1881,64 @@ def internal_error(error):
 # Health check
 @api.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy', 'timestamp': datetime.utcnow().isoformat()})
+    return jsonify({
+        'status': 'healthy',
+        'timestamp': datetime.utcnow().isoformat(),
+        'audit_queue_depth': audit_writer.queue_depth,
+        'telemetry_queue_depth': telemetry_buffer.queue_depth
+    })
+
+
+# Telemetry Routes
+@api.route('/telemetry/batch', methods=['POST'])
+@jwt_required()
+def ingest_telemetry():
+    """
+    Accept a batch of sensor readings from a field gateway.
+
+    Body: {"readings": [{"water_point_id", "sensor_type", "value", "timestamp"?}]}.
+    Valid readings are buffered and bulk-inserted in the background; a full
+    buffer answers 503 with Retry-After so the gateway resends later.
+    Readings are checked for anomalies, which are raised as alerts.
+    """
+    try:
+        current_user = get_current_user()
+        if not current_user:
+            return jsonify({'error': 'Invalid token'}), 401
+        
+        data = request.get_json(silent=True)
+        readings = data.get('readings') if isinstance(data, dict) else None
+        if not isinstance(readings, list) or not readings:
+            return jsonify({'error': 'readings must be a non-empty list'}), 400
+        
+        max_batch = current_app.config.get('TELEMETRY_MAX_BATCH', 10000)
+        if len(readings) > max_batch:
+            return jsonify({'error': f'At most {max_batch} readings per batch'}), 413
+        
+        rows, errors = validate_readings(readings)
+        
+        try:
+            accepted = telemetry_buffer.add(rows)
+        except TelemetryBackpressure as e:
+            response = jsonify({'error': str(e), 'queue_depth': telemetry_buffer.queue_depth})
+            response.headers['Retry-After'] = '1'
+            return response, 503
+        
+        latest_state.apply_readings(rows)
+        alerts_raised = anomaly_detector.process(rows)
+        
+        return jsonify({
+            'accepted': accepted,
+            'rejected': len(errors),
+            'errors': errors[:100],
+            'alerts_raised': alerts_raised,
+            'queue_depth': telemetry_buffer.queue_depth
+        }), 202
+        
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Ingest telemetry error: {str(e)}")
+        return jsonify({'error': 'Failed to ingest telemetry'}), 500
 
 
 # Monitoring and Real-time Data Routes
@@ -1578,23 +1953,45 @@ def get_monitoring_dashboard():
         if not current_user:
             return jsonify({'error': 'Invalid token'}), 401
 
-        # Get system overview statistics
-        total_water_points = WaterPoint.query.count()
-        active_water_points = WaterPoint.query.filter_by(status='active').count()
-        offline_water_points = WaterPoint.query.filter_by(status='offline').count()
+        today = datetime.utcnow().date()
+        
+        # Get system overview and water quality statistics
+        point_counts = aggregate(
+            WaterPoint,
+            total=db.func.count(WaterPoint.id),
+            active=count_if(WaterPoint.status == 'active'),
+            offline=count_if(WaterPoint.status == 'offline'),
+            safe=count_if(WaterPoint.quality_score >= settings_store.number('quality_safe_score')),
+            needs_attention=count_if(WaterPoint.quality_score < settings_store.number('quality_safe_score'))
+        )
+        total_water_points = point_counts['total']
+        active_water_points = point_counts['active']
+        offline_water_points = point_counts['offline']
         
         # Get active alerts count by priority
-        critical_alerts = Alert.query.filter_by(status='active', priority='critical').count()
-        high_alerts = Alert.query.filter_by(status='active', priority='high').count()
-        medium_alerts = Alert.query.filter_by(status='active', priority='medium').count()
+        active = Alert.status == 'active'
+        alert_counts = aggregate(
+            Alert,
+            critical=count_if(active & (Alert.priority == 'critical')),
+            high=count_if(active & (Alert.priority == 'high')),
+            medium=count_if(active & (Alert.priority == 'medium'))
+        )
+        critical_alerts = alert_counts['critical']
+        high_alerts = alert_counts['high']
+        medium_alerts = alert_counts['medium']
         
         # Get maintenance statistics
-        pending_maintenance = MaintenanceTask.query.filter_by(status='pending').count()
-        in_progress_maintenance = MaintenanceTask.query.filter_by(status='in_progress').count()
+        task_counts = aggregate(
+            MaintenanceTask,
+            pending=count_if(MaintenanceTask.status == 'pending'),
+            in_progress=count_if(MaintenanceTask.status == 'in_progress'),
+            completed_today=count_if(MaintenanceTask.completed_date >= today)
+        )
+        pending_maintenance = task_counts['pending']
+        in_progress_maintenance = task_counts['in_progress']
         
-        # Get water quality statistics
         quality_checks_today = QualityCheck.query.filter(
-            QualityCheck.checked_at >= datetime.utcnow().date()
+            QualityCheck.checked_at >= today
         ).count()
         
         # Calculate system health score (simplified)
@@ -1622,14 +2019,12 @@ def get_monitoring_dashboard():
             'maintenance_summary': {
                 'pending': pending_maintenance,
                 'in_progress': in_progress_maintenance,
-                'completed_today': MaintenanceTask.query.filter(
-                    MaintenanceTask.completed_date >= datetime.utcnow().date()
-                ).count()
+                'completed_today': task_counts['completed_today']
             },
             'quality_summary': {
                 'checks_today': quality_checks_today,
-                'safe_water_points': WaterPoint.query.filter(WaterPoint.quality_score >= 70).count(),
-                'needs_attention': WaterPoint.query.filter(WaterPoint.quality_score < 70).count()
+                'safe_water_points': point_counts['safe'],
+                'needs_attention': point_counts['needs_attention']
             }
         }
         
@@ -1639,6 +2034,71 @@ def get_monitoring_dashboard():
         current_app.logger.error(f"Get monitoring dashboard error: {str(e)}")
         return jsonify({'error': 'Failed to get monitoring dashboard'}), 500
 
+@api.route('/monitoring/stream-token', methods=['POST'])
+@jwt_required()
+def create_stream_token():
+    """Short-lived token for opening /monitoring/stream with ?token="""
+    try:
+        current_user = get_current_user()
+        if not current_user:
+            return jsonify({'error': 'Invalid token'}), 401
+        
+        return jsonify({
+            'token': issue_stream_token(current_user.id),
+            'expires_in': current_app.config.get('SSE_TOKEN_MAX_AGE', 60)
+        }), 200
+        
+    except Exception as e:
+        current_app.logger.error(f"Create stream token error: {str(e)}")
+        return jsonify({'error': 'Failed to create stream token'}), 500
+
+@api.route('/monitoring/stream', methods=['GET'])
+@jwt_required(optional=True)
+def stream_monitoring_events():
+    """
+    Server-Sent Events stream of monitoring deltas: sensor, status, alert,
+    alert_update and quality_check events.
+
+    Optional filters: region, water_point_id and type (comma separated).
+    EventSource cannot send headers, so it authenticates with ?token=, a
+    token from POST /monitoring/stream-token. Those expire within a minute
+    and only open this stream, so one written to an access log is of little
+    use. Reconnecting clients resume from Last-Event-ID (or ?last_event_id=).
+    """
+    try:
+        current_user = get_current_user()
+        if not current_user and request.args.get('token'):
+            current_user = stream_token_identity(request.args['token'])
+        if not current_user:
+            return jsonify({'error': 'Invalid token'}), 401
+        
+        def csv_arg(name):
+            value = request.args.get(name)
+            return {item.strip() for item in value.split(',') if item.strip()} if value else None
+        
+        regions = csv_arg('region')
+        types = csv_arg('type')
+        try:
+            water_point_ids = csv_arg('water_point_id')
+            if water_point_ids:
+                water_point_ids = {int(item) for item in water_point_ids}
+            last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            return jsonify({'error': 'water_point_id and Last-Event-ID must be integers'}), 400
+        
+        # Not wrapped in stream_with_context: the stream must not hold the
+        # request's database session open for as long as the client listens
+        return Response(
+            broadcaster.stream(last_event_id, regions, water_point_ids, types),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        
+    except Exception as e:
+        current_app.logger.error(f"Monitoring stream error: {str(e)}")
+        return jsonify({'error': 'Failed to open monitoring stream'}), 500
+
 @api.route('/monitoring/water-points/status', methods=['GET'])
 @jwt_required()
 def get_water_points_status():
@@ -1650,40 +2110,30 @@ def get_water_points_status():
         if not current_user:
             return jsonify({'error': 'Invalid token'}), 401
         
-        water_points = WaterPoint.query.all()
+        # Answered from the in-memory store; no database queries per poll
+        now = time.time()
         status_data = []
         
-        for wp in water_points:
-            # Get recent quality check for sensor data
-            recent_quality = QualityCheck.query.filter_by(
-                water_point_id=wp.id
-            ).order_by(QualityCheck.checked_at.desc()).first()
-            
-            # Get active alerts for this water point
-            active_alerts = Alert.query.filter_by(
-                water_point_id=wp.id,
-                status='active'
-            ).all()
-            
-            # Simulate sensor data based on recent quality check and alerts
-            sensor_data = simulate_sensor_data(wp, recent_quality, active_alerts)
+        for state in latest_state.snapshot():
+            wp = state.point
+            sensor_data = state.sensors(now)
             
             # Calculate overall status
-            overall_status = calculate_water_point_status(wp, sensor_data, active_alerts)
+            overall_status = state.overall_status(sensor_data)
             
             status_data.append({
-                'id': wp.id,
-                'name': wp.name,
-                'location': wp.location,
-                'region': wp.region,
-                'status': wp.status,
+                'id': wp['id'],
+                'name': wp['name'],
+                'location': wp['location'],
+                'region': wp['region'],
+                'status': wp['status'],
                 'overall_status': overall_status,
                 'sensors': sensor_data,
-                'alerts': [alert.to_dict() for alert in active_alerts],
+                'alerts': state.alerts,
                 'last_updated': datetime.utcnow().isoformat(),
                 'connectivity': {
                     'signal_strength': 85,  # Mock data
-                    'status': 'excellent' if wp.status == 'active' else 'offline',
+                    'status': 'excellent' if wp['status'] == 'active' else 'offline',
                     'protocol': '4G'
                 },
                 'power_status': {
@@ -1699,83 +2149,6 @@ def get_water_points_status():
         current_app.logger.error(f"Get water points status error: {str(e)}")
         return jsonify({'error': 'Failed to get water points status'}), 500
 
-def simulate_sensor_data(water_point, recent_quality, active_alerts):
-    """
-    Simulate real-time sensor data based on water point status and recent quality checks
-    """
-    base_values = {
-        'flow': {'value': 45.2, 'unit': 'L/min', 'normal_range': [20, 80]},
-        'temperature': {'value': 24.5, 'unit': '°C', 'normal_range': [15, 30]},
-        'ph': {'value': 7.2, 'unit': 'pH', 'normal_range': [6.5, 8.5]},
-        'pressure': {'value': 2.8, 'unit': 'bar', 'normal_range': [1.5, 4.0]},
-        'turbidity': {'value': 2.1, 'unit': 'NTU', 'normal_range': [0, 5]},
-        'chlorine': {'value': 0.8, 'unit': 'ppm', 'normal_range': [0.2, 4.0]}
-    }
-    
-    # Update base values with recent quality data if available
-    if recent_quality:
-        base_values['temperature']['value'] = recent_quality.temperature or base_values['temperature']['value']
-        base_values['ph']['value'] = recent_quality.ph_level or base_values['ph']['value']
-        base_values['turbidity']['value'] = recent_quality.turbidity or base_values['turbidity']['value']
-        base_values['chlorine']['value'] = recent_quality.chlorine_level or base_values['chlorine']['value']
-    
-    # Add some random variation to simulate real-time data
-    import random
-    sensor_data = {}
-    
-    for sensor_type, config in base_values.items():
-        # Add small random variation (±10%)
-        variation = random.uniform(-0.1, 0.1)
-        current_value = config['value'] * (1 + variation)
-        
-        # Determine status based on normal range
-        normal_min, normal_max = config['normal_range']
-        if current_value < normal_min * 0.8:
-            status = 'low'
-        elif current_value > normal_max * 1.2:
-            status = 'high'
-        elif current_value < normal_min or current_value > normal_max:
-            status = 'warning'
-        else:
-            status = 'normal'
-        
-        # If water point is offline, mark all sensors as offline
-        if water_point.status == 'offline':
-            status = 'offline'
-            current_value = 0
-        
-        sensor_data[sensor_type] = {
-            'value': round(current_value, 2),
-            'unit': config['unit'],
-            'status': status,
-            'last_update': f"{random.randint(1, 10)}s ago"
-        }
-    
-    return sensor_data
-
-def calculate_water_point_status(water_point, sensor_data, active_alerts):
-    """
-    Calculate overall water point status based on sensor data and alerts
-    """
-    if water_point.status == 'offline':
-        return 'offline'
-    
-    # Check for critical sensor readings
-    critical_sensors = [sensor for sensor, data in sensor_data.items() 
-                       if data['status'] in ['high', 'low']]
-    
-    if critical_sensors:
-        return 'critical'
-    
-    # Check for warning sensor readings
-    warning_sensors = [sensor for sensor, data in sensor_data.items() 
-                      if data['status'] == 'warning']
-    
-    if warning_sensors or active_alerts:
-        return 'warning'
-    
-    return 'normal'
-
 @api.route('/monitoring/alerts/active', methods=['GET'])
 @jwt_required()
 def get_active_alerts():
@@ -1835,34 +2208,16 @@ def get_water_point_realtime(water_point_id):
         if not current_user:
             return jsonify({'error': 'Invalid token'}), 401
         
-        water_point = WaterPoint.query.get_or_404(water_point_id)
-        
-        # Get recent quality checks for historical data
-        recent_checks = QualityCheck.query.filter_by(
-            water_point_id=water_point_id
-        ).order_by(QualityCheck.checked_at.desc()).limit(10).all()
-        
-        # Get active alerts
-        active_alerts = Alert.query.filter_by(
-            water_point_id=water_point_id,
-            status='active'
-        ).all()
-        
-        # Get maintenance history
-        maintenance_tasks = MaintenanceTask.query.filter_by(
-            water_point_id=water_point_id
-        ).order_by(MaintenanceTask.created_at.desc()).limit(5).all()
-        
-        # Simulate current sensor data
-        recent_quality = recent_checks[0] if recent_checks else None
-        sensor_data = simulate_sensor_data(water_point, recent_quality, active_alerts)
+        state = latest_state.snapshot(water_point_id)
+        if state is None:
+            return jsonify({'error': 'Water point not found'}), 404
         
         realtime_data = {
-            'water_point': water_point.to_dict(),
-            'sensor_data': sensor_data,
-            'active_alerts': [alert.to_dict() for alert in active_alerts],
-            'recent_quality_checks': [check.to_dict() for check in recent_checks],
-            'maintenance_history': [task.to_dict() for task in maintenance_tasks],
+            'water_point': state.point,
+            'sensor_data': state.sensors(time.time()),
+            'active_alerts': state.alerts,
+            'recent_quality_checks': state.quality_checks,
+            'maintenance_history': state.maintenance,
             'last_updated': datetime.utcnow().isoformat(),
             'system_metrics': {
                 'uptime': '99.8%',  # Mock data
@@ -1917,6 +2272,7 @@ def get_recent_notifications():
                 'title': alert.title,
                 'message': alert.description + location_info,
                 'timestamp': alert.created_at.isoformat(),
+                'occurrences': alert.occurrences,
                 'read': False,
                 'action_required': alert.status == 'active'
             })
@@ -1939,7 +2295,7 @@ def get_recent_notifications():
         
         # Add quality check notifications for poor quality
         for check in recent_quality_checks:
-            if check.overall_score < 70:  # Poor quality threshold
+            if check.overall_score < settings_store.number('quality_safe_score'):  # Poor quality threshold
                 water_point = WaterPoint.query.get(check.water_point_id)
                 location_info = f" at {water_point.name}" if water_point else ""
                 
@@ -1974,13 +2330,16 @@ def get_system_health():
         if not current_user:
             return jsonify({'error': 'Invalid token'}), 401
         
-        # Calculate various health metrics
-        total_water_points = WaterPoint.query.count()
-        active_water_points = WaterPoint.query.filter_by(status='active').count()
-        
-        # Water quality health
-        quality_scores = [wp.quality_score for wp in WaterPoint.query.filter(WaterPoint.quality_score.isnot(None)).all()]
-        avg_quality_score = sum(quality_scores) / len(quality_scores) if quality_scores else 0
+        # Availability and water quality health
+        point_stats = aggregate(
+            WaterPoint,
+            total=db.func.count(WaterPoint.id),
+            active=count_if(WaterPoint.status == 'active'),
+            avg_quality=db.func.avg(WaterPoint.quality_score)
+        )
+        total_water_points = point_stats['total']
+        active_water_points = point_stats['active']
+        avg_quality_score = point_stats['avg_quality'] or 0
         
         # Maintenance health
         overdue_maintenance = MaintenanceTask.query.filter(
@@ -1991,33 +2350,37 @@ def get_system_health():
         # Alert health
         critical_alerts = Alert.query.filter_by(status='active', priority='critical').count()
         
-        # Calculate overall system health (0-100)
+        # Calculate overall system health (0-100); penalties and cut-offs are system settings
+        setting = settings_store.number
         availability_score = (active_water_points / max(total_water_points, 1)) * 100
         quality_score = avg_quality_score
-        maintenance_score = max(100 - (overdue_maintenance * 10), 0)  # Penalty for overdue maintenance
-        alert_score = max(100 - (critical_alerts * 20), 0)  # Heavy penalty for critical alerts
+        maintenance_score = max(100 - (overdue_maintenance * setting('health_overdue_task_penalty')), 0)  # Penalty for overdue maintenance
+        alert_score = max(100 - (critical_alerts * setting('health_critical_alert_penalty')), 0)  # Heavy penalty for critical alerts
         
         overall_health = (availability_score * 0.3 + quality_score * 0.3 + 
                          maintenance_score * 0.2 + alert_score * 0.2)
         
+        def health_status(score, excellent='health_score_excellent', good='health_score_good'):
+            return 'excellent' if score >= setting(excellent) else 'good' if score >= setting(good) else 'warning'
+        
         health_data = {
             'overall_health': round(overall_health, 1),
             'components': {
                 'availability': {
                     'score': round(availability_score, 1),
-                    'status': 'excellent' if availability_score >= 95 else 'good' if availability_score >= 85 else 'warning'
+                    'status': health_status(availability_score, 'health_availability_excellent', 'health_availability_good')
                 },
                 'quality': {
                     'score': round(quality_score, 1),
-                    'status': 'excellent' if quality_score >= 90 else 'good' if quality_score >= 70 else 'warning'
+                    'status': health_status(quality_score)
                 },
                 'maintenance': {
                     'score': round(maintenance_score, 1),
-                    'status': 'excellent' if maintenance_score >= 90 else 'good' if maintenance_score >= 70 else 'warning'
+                    'status': health_status(maintenance_score)
                 },
                 'alerts': {
                     'score': round(alert_score, 1),
-                    'status': 'excellent' if alert_score >= 90 else 'good' if alert_score >= 70 else 'warning'
+                    'status': health_status(alert_score)
                 }
             },
             'metrics': {
@@ -2049,55 +2412,76 @@ def get_usage_trends():
         if not current_user:
             return jsonify({'error': 'Invalid token'}), 401
         
-        # Get usage data for the last 30 days
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+        # Reads one rollup row per day, however many usage events there were
+        days = max(1, min(request.args.get('days', 30, type=int), 365))
+        today = datetime.utcnow().date()
+        start = today - timedelta(days=days - 1)
+        # The week-over-week trend always needs the last 14 days
+        window_start = min(start, today - timedelta(days=13))
+        
+        rows = db.session.query(
+            DailyUsage.day,
+            db.func.sum(DailyUsage.total_liters).label('usage'),
+            db.func.sum(DailyUsage.total_cost).label('cost'),
+            db.func.sum(DailyUsage.event_count).label('events')
+        ).filter(DailyUsage.day >= window_start).group_by(DailyUsage.day).all()
+        by_day = {row.day: row for row in rows}
+        
+        def usage_on(day):
+            row = by_day.get(day)
+            return row.usage if row else 0
         
-        # Mock usage data - in a real system, this would come from WaterUsage records
         daily_usage = []
-        total_usage = 0
-        
-        for i in range(30):
-            date = thirty_days_ago + timedelta(days=i)
-            # Simulate daily usage with some variation
-            base_usage = 2500  # liters
-            variation = (i % 7) * 500  # Higher usage on weekends
-            daily_total = base_usage + variation + (i * 10)  # Slight upward trend
-            
+        for offset in range(days):
+            date = start + timedelta(days=offset)
+            row = by_day.get(date)
             daily_usage.append({
-                'date': date.date().isoformat(),
-                'usage': daily_total,
+                'date': date.isoformat(),
+                'usage': round(row.usage, 2) if row else 0,
+                'cost': round(row.cost, 2) if row else 0,
+                'events': row.events if row else 0,
                 'units': 'liters'
             })
-            total_usage += daily_total
+        total_usage = sum(day['usage'] for day in daily_usage)
         
         # Calculate trends
-        if len(daily_usage) >= 7:
-            last_week_avg = sum(day['usage'] for day in daily_usage[-7:]) / 7
-            previous_week_avg = sum(day['usage'] for day in daily_usage[-14:-7]) / 7
+        last_week_avg = sum(usage_on(today - timedelta(days=i)) for i in range(7)) / 7
+        previous_week_avg = sum(usage_on(today - timedelta(days=i)) for i in range(7, 14)) / 7
+        if previous_week_avg:
             trend_percentage = ((last_week_avg - previous_week_avg) / previous_week_avg) * 100
         else:
             trend_percentage = 0
+        direction = 'up' if trend_percentage > 0 else 'down' if trend_percentage < 0 else 'flat'
+        
+        regions = db.session.query(
+            WaterPoint.region,
+            db.func.sum(DailyUsage.total_liters).label('usage')
+        ).join(WaterPoint, DailyUsage.water_point_id == WaterPoint.id).filter(
+            DailyUsage.day >= start
+        ).group_by(WaterPoint.region).order_by(db.func.sum(DailyUsage.total_liters).desc()).all()
+        
+        peak_day = max(daily_usage, key=lambda x: x['usage'])
         
         trends_data = {
-            'period': '30 days',
-            'total_usage': total_usage,
-            'average_daily_usage': round(total_usage / 30, 2),
+            'period': f'{days} days',
+            'total_usage': round(total_usage, 2),
+            'average_daily_usage': round(total_usage / days, 2),
             'trend': {
-                'direction': 'up' if trend_percentage > 0 else 'down',
+                'direction': direction,
                 'percentage': abs(round(trend_percentage, 1)),
                 'description': f"{'Increase' if trend_percentage > 0 else 'Decrease'} of {abs(round(trend_percentage, 1))}% compared to previous week"
+                if trend_percentage else 'No change compared to previous week'
             },
             'daily_breakdown': daily_usage,
             'peak_usage': {
-                'value': max(day['usage'] for day in daily_usage),
-                'date': max(daily_usage, key=lambda x: x['usage'])['date']
+                'value': peak_day['usage'],
+                'date': peak_day['date']
             },
-            'regions_breakdown': [
-                {'region': 'Garissa', 'usage': total_usage * 0.4, 'percentage': 40},
-                {'region': 'Dadaab', 'usage': total_usage * 0.3, 'percentage': 30},
-                {'region': 'Ijara', 'usage': total_usage * 0.2, 'percentage': 20},
-                {'region': 'Sankuri', 'usage': total_usage * 0.1, 'percentage': 10}
-            ]
+            'regions_breakdown': [{
+                'region': region.region,
+                'usage': round(region.usage, 2),
+                'percentage': round(region.usage / total_usage * 100, 1) if total_usage else 0
+            } for region in regions]
         }
         
         return jsonify(trends_data), 200
@@ -1,8 +1,11 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_cors import cross_origin
-from utils import PasswordUtils, JWTUtils, ValidationUtils
+from utils import PasswordUtils, JWTUtils, ValidationUtils, hashing_busy
 from functools import wraps
-import sqlite3
+from services.database import get_db_connection
+from services.identity import identity_cache
+from services.auth import token_versions
+from services.passwords import PasswordHashingBusy
 from datetime import datetime
 import re
 
@@ -81,65 +84,6 @@ def admin_token_required(f):
     
     return decorated
 
-def init_db():
-    """Initialize SQLite database"""
-    conn = sqlite3.connect('aquasafi.db')
-    cursor = conn.cursor()
-    
-    # Create users table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            full_name TEXT NOT NULL,
-            phone_number TEXT NOT NULL,
-            location TEXT NOT NULL,
-            community TEXT NOT NULL,
-            role TEXT NOT NULL,
-            organization TEXT,
-            national_id TEXT UNIQUE NOT NULL,
-            emergency_contact TEXT NOT NULL,
-            emergency_phone TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            is_active BOOLEAN DEFAULT TRUE
-        )
-    ''')
-    
-    # Create admins table (simple email + password only)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS admins (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            name TEXT DEFAULT 'Administrator',
-            role TEXT DEFAULT 'super_admin',
-            is_active BOOLEAN DEFAULT TRUE,
-            last_login TIMESTAMP,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create default admin if not exists
-    cursor.execute('SELECT id FROM admins WHERE email = ?', ('admin@watermanagement.com',))
-    admin_exists = cursor.fetchone()
-    
-    if not admin_exists:
-        hashed_password = PasswordUtils.hash_password('admin123')
-        cursor.execute('''
-            INSERT INTO admins (email, password_hash, name, role, is_active)
-            VALUES (?, ?, ?, ?, ?)
-        ''', ('admin@watermanagement.com', hashed_password, 'System Administrator', 'super_admin', True))
-        print("✅ Default admin created: admin@watermanagement.com")
-    
-    conn.commit()
-    conn.close()
-
-# Initialize database when module is imported
-init_db()
-
 class ValidationUtils:
     """Validation utilities for user data"""
     
@@ -199,51 +143,51 @@ def admin_login():
             }), 400
         
         # Find admin
-        conn = sqlite3.connect('aquasafi.db')
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
-            SELECT id, email, password_hash, name, role, is_active 
+            SELECT id, email, password_hash, name, role, is_active, token_version 
             FROM admins 
             WHERE email = ?
         ''', (data['email'],))
         
         admin = cursor.fetchone()
+        conn.close()
         
         if not admin:
-            conn.close()
             return jsonify({
                 'message': 'Invalid email or password',
                 'success': False
             }), 401
         
-        admin_id, email, password_hash, name, role, is_active = admin
+        admin_id, email, password_hash, name, role, is_active, token_version = admin
         
         if not is_active:
-            conn.close()
             return jsonify({
                 'message': 'Admin account is deactivated',
                 'success': False
             }), 401
         
         # Verify password
-        if not PasswordUtils.verify_password(password_hash, data['password']):
-            conn.close()
+        matches, new_hash = PasswordUtils.verify_and_upgrade(password_hash, data['password'])
+        if not matches:
             return jsonify({
                 'message': 'Invalid email or password',
                 'success': False
             }), 401
         
-        # Update last login
-        cursor.execute(
-            'UPDATE admins SET last_login = ?, updated_at = ? WHERE id = ?',
-            (datetime.now(), datetime.now(), admin_id)
+        # Update last login, and the hash when it used older parameters
+        conn = get_db_connection()
+        conn.execute(
+            'UPDATE admins SET last_login = ?, updated_at = ?, password_hash = ? WHERE id = ?',
+            (datetime.now(), datetime.now(), new_hash or password_hash, admin_id)
         )
         conn.commit()
         conn.close()
         
         # Generate JWT token with admin role
-        token = JWTUtils.encode_auth_token(str(admin_id), 'admin')
+        token = JWTUtils.encode_auth_token(str(admin_id), 'admin', is_active, token_version, kind='admin')
         
         return jsonify({
             'message': 'Admin login successful',
@@ -257,6 +201,8 @@ def admin_login():
             'token': token
         }), 200
         
+    except PasswordHashingBusy as e:
+        return hashing_busy({'message': str(e), 'success': False})
     except Exception as e:
         current_app.logger.error(f'Admin login error: {str(e)}')
         return jsonify({
@@ -270,7 +216,7 @@ def admin_login():
 def get_admin_profile(current_user):
     """Get admin profile"""
     try:
-        conn = sqlite3.connect('aquasafi.db')
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -316,7 +262,7 @@ def get_admin_profile(current_user):
 def admin_get_users(current_user):
     """Get all users (admin only)"""
     try:
-        conn = sqlite3.connect('aquasafi.db')
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -364,7 +310,7 @@ def admin_get_users(current_user):
 def toggle_user_active(current_user, user_id):
     """Toggle user active status (admin only)"""
     try:
-        conn = sqlite3.connect('aquasafi.db')
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Get current status
@@ -378,15 +324,17 @@ def toggle_user_active(current_user, user_id):
                 'success': False
             }), 404
         
-        # Toggle status
+        # Toggle status; the version bump revokes tokens carrying the old flag
         new_status = not bool(user[0])
         cursor.execute(
-            'UPDATE users SET is_active = ?, updated_at = ? WHERE id = ?',
+            'UPDATE users SET is_active = ?, token_version = token_version + 1, updated_at = ? WHERE id = ?',
             (new_status, datetime.now(), user_id)
         )
         
         conn.commit()
         conn.close()
+        identity_cache.invalidate(user_id)
+        token_versions.expire()
         
         action = "activated" if new_status else "deactivated"
         return jsonify({
@@ -408,7 +356,7 @@ def toggle_user_active(current_user, user_id):
 def get_admin_stats(current_user):
     """Get admin dashboard statistics"""
     try:
-        conn = sqlite3.connect('aquasafi.db')
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Get total users count
@@ -514,15 +462,15 @@ def register():
             }), 400
         
         # Check if user already exists
-        conn = sqlite3.connect('aquasafi.db')
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         cursor.execute('SELECT id FROM users WHERE email = ? OR national_id = ?', 
                       (data['email'], data['nationalId']))
         existing_user = cursor.fetchone()
+        conn.close()
         
         if existing_user:
-            conn.close()
             return jsonify({
                 'message': 'User with this email or national ID already exists',
                 'success': False
@@ -532,11 +480,17 @@ def register():
         hashed_password = PasswordUtils.hash_password(data['password'])
         
         # Insert new user with cleaned phone numbers
+        # The users table is created from the SQLAlchemy model, whose defaults
+        # are applied client-side, so set them explicitly here
+        now = datetime.now()
+        conn = get_db_connection()
+        cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO users (
                 email, password_hash, full_name, phone_number, location, 
-                community, role, organization, national_id, emergency_contact, emergency_phone
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                community, role, organization, national_id, emergency_contact, emergency_phone,
+                is_active, is_verified, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             data['email'],
             hashed_password,
@@ -548,7 +502,11 @@ def register():
             data.get('organization', ''),
             data['nationalId'],
             data['emergencyContact'],
-            emergency_phone  # Use cleaned emergency phone
+            emergency_phone,  # Use cleaned emergency phone
+            True,
+            False,
+            now,
+            now
         ))
         
         user_id = cursor.lastrowid
@@ -570,6 +528,8 @@ def register():
             'token': token
         }), 201
         
+    except PasswordHashingBusy as e:
+        return hashing_busy({'message': str(e), 'success': False})
     except Exception as e:
         current_app.logger.error(f'Registration error: {str(e)}')
         return jsonify({
@@ -597,11 +557,11 @@ def login():
             }), 400
         
         # Find user
-        conn = sqlite3.connect('aquasafi.db')
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
-            SELECT id, email, password_hash, full_name, role, is_active 
+            SELECT id, email, password_hash, full_name, role, is_active, token_version 
             FROM users 
             WHERE email = ?
         ''', (data['email'],))
@@ -615,7 +575,7 @@ def login():
                 'success': False
             }), 401
         
-        user_id, email, password_hash, full_name, role, is_active = user
+        user_id, email, password_hash, full_name, role, is_active, token_version = user
         
         if not is_active:
             return jsonify({
@@ -624,14 +584,22 @@ def login():
             }), 401
         
         # Verify password
-        if not PasswordUtils.verify_password(password_hash, data['password']):
+        matches, new_hash = PasswordUtils.verify_and_upgrade(password_hash, data['password'])
+        if not matches:
             return jsonify({
                 'message': 'Invalid email or password',
                 'success': False
             }), 401
         
+        if new_hash:
+            # Stored with older hash parameters
+            conn = get_db_connection()
+            conn.execute('UPDATE users SET password_hash = ? WHERE id = ?', (new_hash, user_id))
+            conn.commit()
+            conn.close()
+        
         # Generate JWT token
-        token = JWTUtils.encode_auth_token(str(user_id), role)
+        token = JWTUtils.encode_auth_token(str(user_id), role, is_active, token_version)
         
         return jsonify({
             'message': 'Login successful',
@@ -645,6 +613,8 @@ def login():
             'token': token
         }), 200
         
+    except PasswordHashingBusy as e:
+        return hashing_busy({'message': str(e), 'success': False})
     except Exception as e:
         current_app.logger.error(f'Login error: {str(e)}')
         return jsonify({
@@ -658,7 +628,7 @@ def login():
 def get_profile(current_user):
     """Get user profile"""
     try:
-        conn = sqlite3.connect('aquasafi.db')
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -719,7 +689,7 @@ def get_users(current_user):
                 'success': False
             }), 403
         
-        conn = sqlite3.connect('aquasafi.db')
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -769,7 +739,7 @@ def update_profile(current_user):
     try:
         data = request.get_json()
         
-        conn = sqlite3.connect('aquasafi.db')
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Build update query dynamically based on provided fields
@@ -861,15 +831,15 @@ def change_password(current_user):
                 'success': False
             }), 400
         
-        conn = sqlite3.connect('aquasafi.db')
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Get current password hash
         cursor.execute('SELECT password_hash FROM users WHERE id = ?', (current_user['user_id'],))
         user = cursor.fetchone()
+        conn.close()
         
         if not user:
-            conn.close()
             return jsonify({
                 'message': 'User not found',
                 'success': False
@@ -877,7 +847,6 @@ def change_password(current_user):
         
         # Verify current password
         if not PasswordUtils.verify_password(user[0], data['currentPassword']):
-            conn.close()
             return jsonify({
                 'message': 'Current password is incorrect',
                 'success': False
@@ -885,7 +854,8 @@ def change_password(current_user):
         
         # Hash new password and update
         new_hashed_password = PasswordUtils.hash_password(data['newPassword'])
-        cursor.execute(
+        conn = get_db_connection()
+        conn.execute(
             'UPDATE users SET password_hash = ?, updated_at = ? WHERE id = ?',
             (new_hashed_password, datetime.now(), current_user['user_id'])
         )
@@ -898,6 +868,8 @@ def change_password(current_user):
             'success': True
         }), 200
         
+    except PasswordHashingBusy as e:
+        return hashing_busy({'message': str(e), 'success': False})
     except Exception as e:
         current_app.logger.error(f'Change password error: {str(e)}')
         return jsonify({
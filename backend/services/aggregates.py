@@ -0,0 +1,25 @@
+from models import db
+
+
+def count_if(condition):
+    """COUNT of rows matching condition, expressed as SUM(CASE WHEN ...)"""
+    return db.func.coalesce(db.func.sum(db.case((condition, 1), else_=0)), 0)
+
+
+def sum_if(condition, column):
+    """SUM of column over rows matching condition"""
+    return db.func.coalesce(db.func.sum(db.case((condition, column), else_=0)), 0)
+
+
+def aggregate(model, filters=(), **columns):
+    """
+    Compute several aggregates over one table in a single scan.
+
+    Each keyword maps a result name to an aggregate expression, typically built
+    with count_if/sum_if or db.func.count/avg. filters restricts the rows
+    scanned. Returns a dict of name -> value.
+    """
+    row = db.session.query(
+        *[expression.label(name) for name, expression in columns.items()]
+    ).select_from(model).filter(*filters).one()
+    return row._asdict()
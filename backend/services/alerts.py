@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from models import db, Alert
+
+PRIORITY_RANK = {'low': 0, 'medium': 1, 'high': 2, 'critical': 3}
+
+
+def raise_alerts(alerts, now=None):
+    """
+    Create alerts from field dicts (type, title, description, water_point_id,
+    priority), folding repeats into an open alert instead of adding rows.
+
+    An alert is a repeat when an active alert for the same (water_point_id,
+    type) was last seen within ALERT_COALESCE_WINDOW seconds. The existing
+    alert's occurrences counter and last_seen_at are bumped and its priority
+    raised if the repeat is more severe. Alerts without a water point are
+    never coalesced. Returns (created, coalesced) counts; the caller commits.
+    """
+    if not alerts:
+        return 0, 0
+
+    now = now or datetime.utcnow()
+    window = current_app.config.get('ALERT_COALESCE_WINDOW', 3600)
+
+    # Fold repeats within the batch first, keeping the first alert's text
+    grouped = {}
+    unkeyed = []
+    for fields in alerts:
+        if fields.get('water_point_id') is None:
+            unkeyed.append((fields, 1))
+            continue
+        key = (fields['water_point_id'], fields['type'])
+        if key in grouped:
+            first, count = grouped[key]
+            grouped[key] = (_more_severe(first, fields), count + 1)
+        else:
+            grouped[key] = (fields, 1)
+
+    open_alerts = {}
+    if grouped and window:
+        candidates = Alert.query.filter(
+            Alert.status == 'active',
+            Alert.water_point_id.in_({water_point_id for water_point_id, _ in grouped}),
+            Alert.type.in_({alert_type for _, alert_type in grouped}),
+            Alert.last_seen_at >= now - timedelta(seconds=window)
+        ).order_by(Alert.last_seen_at)
+        for alert in candidates:
+            # Newest last, so it wins
+            open_alerts[(alert.water_point_id, alert.type)] = alert
+
+    created = coalesced = 0
+    for key, (fields, count) in grouped.items():
+        alert = open_alerts.get(key)
+        if alert is None:
+            unkeyed.append((fields, count))
+            continue
+        alert.occurrences = (alert.occurrences or 1) + count
+        alert.last_seen_at = now
+        if PRIORITY_RANK.get(fields.get('priority'), 1) > PRIORITY_RANK.get(alert.priority, 1):
+            alert.priority = fields['priority']
+        coalesced += count
+
+    for fields, count in unkeyed:
+        db.session.add(Alert(occurrences=count, created_at=now, last_seen_at=now, **fields))
+        created += 1
+        coalesced += count - 1
+
+    return created, coalesced
+
+
+def _more_severe(first, repeat):
+    """first's fields with repeat's priority when that is higher"""
+    if PRIORITY_RANK.get(repeat.get('priority'), 1) > PRIORITY_RANK.get(first.get('priority'), 1):
+        return dict(first, priority=repeat['priority'])
+    return first
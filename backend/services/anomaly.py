@@ -0,0 +1,187 @@
+import threading
+import time
+
+import numpy as np
+
+from models import db
+from services.alerts import raise_alerts
+from services.live_state import SENSOR_CONFIG, SENSOR_SLOTS
+from services.telemetry import SENSOR_TYPES
+
+# Readings beyond these are critical, as in live_state.sensor_status
+LOW_LIMITS = np.array([SENSOR_CONFIG[sensor_type]['normal_range'][0] * 0.8 for sensor_type in SENSOR_TYPES])
+HIGH_LIMITS = np.array([SENSOR_CONFIG[sensor_type]['normal_range'][1] * 1.2 for sensor_type in SENSOR_TYPES])
+
+# Floor for the standard deviation so a sensor that has been perfectly
+# steady does not flag every small change: 1% of its normal range
+MIN_STD = np.array([(SENSOR_CONFIG[sensor_type]['normal_range'][1] -
+                     SENSOR_CONFIG[sensor_type]['normal_range'][0]) * 0.01 for sensor_type in SENSOR_TYPES])
+
+# Alert.type per sensor; quality sensors count towards quality alerts
+ALERT_TYPES = {
+    'flow': 'infrastructure',
+    'pressure': 'infrastructure',
+    'ph': 'quality',
+    'turbidity': 'quality',
+    'chlorine': 'quality',
+    'temperature': 'quality'
+}
+
+
+class AnomalyDetector:
+    """
+    Online anomaly detection over incoming sensor telemetry.
+
+    Keeps a rolling mean and variance per (water point, sensor) in numpy
+    arrays. Each batch is scored against the statistics from before it and
+    then merged in with the parallel variance formula, so the work per
+    reading is constant and vectorised. The sample weight is capped at
+    ANOMALY_WINDOW, which makes older readings decay.
+
+    Readings past the critical limits raise a threshold alert, and readings
+    more than ANOMALY_Z_THRESHOLD standard deviations from the mean raise an
+    outlier alert once ANOMALY_MIN_SAMPLES readings have been seen. At most
+    one alert per (water point, sensor, kind) is raised every
+    ANOMALY_ALERT_COOLDOWN seconds, and repeats are coalesced into an open
+    alert by services.alerts.
+
+    Statistics are held per process and start empty after a restart.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._slots = {}
+        self._count = np.zeros(0)
+        self._mean = np.zeros(0)
+        self._m2 = np.zeros(0)
+        self._alerted_at = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.window = app.config.get('ANOMALY_WINDOW', 100)
+        self.z_threshold = app.config.get('ANOMALY_Z_THRESHOLD', 4.0)
+        self.min_samples = app.config.get('ANOMALY_MIN_SAMPLES', 30)
+        self.cooldown = app.config.get('ANOMALY_ALERT_COOLDOWN', 1800)
+        # Statistics are keyed by this app's water point ids
+        with self._lock:
+            self._slots = {}
+            self._count = np.zeros(0)
+            self._mean = np.zeros(0)
+            self._m2 = np.zeros(0)
+            self._alerted_at = {}
+        app.extensions['anomaly_detector'] = self
+
+    def process(self, rows):
+        """Score validated telemetry rows and raise alerts for new anomalies; returns alerts created"""
+        anomalies = self.observe(rows)
+        if not anomalies:
+            return 0
+        created, _ = raise_alerts(anomalies)
+        db.session.commit()
+        return created
+
+    def observe(self, rows):
+        """Update the statistics with rows and return field dicts for the alerts to raise"""
+        if not rows:
+            return []
+
+        size = len(rows)
+        water_point_ids = np.fromiter((row['water_point_id'] for row in rows), np.int64, size)
+        sensors = np.fromiter((SENSOR_SLOTS[row['sensor_type']] for row in rows), np.int64, size)
+        values = np.fromiter((row['value'] for row in rows), np.float64, size)
+
+        keys, inverse = np.unique(water_point_ids * len(SENSOR_TYPES) + sensors, return_inverse=True)
+
+        with self._lock:
+            slots = self._slots_for(keys)
+            count = self._count[slots]
+            mean = self._mean[slots]
+            m2 = self._m2[slots]
+
+            # Score against the statistics from before this batch
+            with np.errstate(divide='ignore', invalid='ignore'):
+                std = np.maximum(np.sqrt(m2 / count), MIN_STD[keys % len(SENSOR_TYPES)])
+            deviation = np.abs(values - mean[inverse]) / std[inverse]
+            outlier = (count[inverse] >= self.min_samples) & (deviation > self.z_threshold)
+            breach = (values < LOW_LIMITS[sensors]) | (values > HIGH_LIMITS[sensors])
+
+            # Merge the batch into the rolling statistics
+            batch_count = np.bincount(inverse, minlength=len(keys)).astype(np.float64)
+            batch_mean = np.bincount(inverse, values, len(keys)) / batch_count
+            batch_m2 = np.bincount(inverse, (values - batch_mean[inverse]) ** 2, len(keys))
+
+            total = count + batch_count
+            delta = batch_mean - mean
+            merged_mean = mean + delta * batch_count / total
+            merged_m2 = m2 + batch_m2 + delta ** 2 * count * batch_count / total
+
+            scale = np.minimum(1.0, self.window / total)
+            self._count[slots] = total * scale
+            self._mean[slots] = merged_mean
+            self._m2[slots] = merged_m2 * scale
+
+            flagged = np.flatnonzero(breach | outlier)
+            if not len(flagged):
+                return []
+
+            return self._throttled_alerts(rows, flagged, breach, mean[inverse], std[inverse])
+
+    def _slots_for(self, keys):
+        """Array positions for keys, allocating zeroed statistics for new ones"""
+        slots = np.fromiter((self._slots.setdefault(key, len(self._slots)) for key in keys.tolist()),
+                            np.int64, len(keys))
+
+        grow = len(self._slots) - len(self._count)
+        if grow:
+            self._count = np.concatenate([self._count, np.zeros(grow)])
+            self._mean = np.concatenate([self._mean, np.zeros(grow)])
+            self._m2 = np.concatenate([self._m2, np.zeros(grow)])
+        return slots
+
+    def _throttled_alerts(self, rows, flagged, breach, expected, spread):
+        now = time.time()
+        alerts = []
+        for index in flagged.tolist():
+            row = rows[index]
+            kind = 'threshold' if breach[index] else 'outlier'
+            key = (row['water_point_id'], row['sensor_type'], kind)
+            if now - self._alerted_at.get(key, -self.cooldown) < self.cooldown:
+                continue
+            self._alerted_at[key] = now
+            alerts.append(self._alert_fields(row, kind, expected[index], spread[index]))
+        return alerts
+
+    def _alert_fields(self, row, kind, expected, spread):
+        sensor_type = row['sensor_type']
+        config = SENSOR_CONFIG[sensor_type]
+        label, unit = config['label'], config['unit']
+        value = row['value']
+        location = f"water point {row['water_point_id']}"
+
+        if kind == 'threshold':
+            high = value > HIGH_LIMITS[SENSOR_SLOTS[sensor_type]]
+            normal_min, normal_max = config['normal_range']
+            return {
+                'type': ALERT_TYPES[sensor_type],
+                'title': f"{'High' if high else 'Low'} {label} reading at {location}",
+                'description': (f"{label} read {value:g} {unit} at {row['timestamp']:%Y-%m-%d %H:%M:%S} UTC, "
+                                f"outside the safe range of {normal_min:g}-{normal_max:g} {unit}."),
+                'water_point_id': row['water_point_id'],
+                'priority': 'critical' if ALERT_TYPES[sensor_type] == 'quality' else 'high'
+            }
+
+        return {
+            'type': ALERT_TYPES[sensor_type],
+            'title': f"Unusual {label} reading at {location}",
+            'description': (f"{label} read {value:g} {unit} at {row['timestamp']:%Y-%m-%d %H:%M:%S} UTC, "
+                            f"against a recent average of {expected:.2f} {unit} "
+                            f"(± {spread:.2f}, {self.z_threshold:g} standard deviations allowed)."),
+            'water_point_id': row['water_point_id'],
+            'priority': 'medium'
+        }
+
+
+anomaly_detector = AnomalyDetector()
@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from models import db, User, WaterPoint, MaintenanceTask
+from services.geo import haversine_matrix
+
+OPEN_STATUSES = ('pending', 'in_progress')
+
+# Priorities are assigned in this order, and distance counts more for the urgent ones
+PRIORITY_ORDER = {'critical': 0, 'high': 1, 'medium': 2, 'low': 3}
+PRIORITY_DISTANCE_WEIGHT = {'critical': 3.0, 'high': 2.0, 'medium': 1.0, 'low': 0.5}
+
+DEFAULT_DURATION = 120  # minutes, for tasks without estimated_duration
+
+
+def active_technicians():
+    return User.query.filter(User.role == 'technician', User.is_active.is_(True)).order_by(User.id).all()
+
+
+def technician_bases(technician_ids, depot, days=90):
+    """
+    (lat, lon) each technician works from: the centre of the water points of
+    the tasks they took on in the last days, or depot for technicians without
+    any. Pending tasks are left out so a rebalance does not reinforce itself.
+    """
+    since = datetime.utcnow() - timedelta(days=days)
+    rows = db.session.query(
+        MaintenanceTask.technician_id,
+        db.func.avg(WaterPoint.latitude),
+        db.func.avg(WaterPoint.longitude)
+    ).join(WaterPoint, MaintenanceTask.water_point_id == WaterPoint.id).filter(
+        MaintenanceTask.technician_id.in_(technician_ids),
+        MaintenanceTask.status != 'pending',
+        MaintenanceTask.scheduled_date >= since
+    ).group_by(MaintenanceTask.technician_id).all()
+
+    found = {technician_id: (lat, lon) for technician_id, lat, lon in rows}
+    return [found.get(technician_id, depot) for technician_id in technician_ids]
+
+
+def open_load(technician_ids):
+    """Minutes of open work queued per technician"""
+    rows = db.session.query(
+        MaintenanceTask.technician_id,
+        db.func.sum(db.func.coalesce(MaintenanceTask.estimated_duration, DEFAULT_DURATION))
+    ).filter(
+        MaintenanceTask.technician_id.in_(technician_ids),
+        MaintenanceTask.status.in_(OPEN_STATUSES)
+    ).group_by(MaintenanceTask.technician_id).all()
+    found = dict(rows)
+    return np.array([float(found.get(technician_id) or 0) for technician_id in technician_ids])
+
+
+def assign(tasks, bases, load, load_weight):
+    """
+    Greedy balanced assignment.
+
+    tasks are (task_id, lat, lon, priority, minutes); bases and load (queued
+    minutes) are per technician. Every task/technician
+    distance is computed up front as one matrix. Tasks are then taken most
+    urgent first and given to the technician with the lowest
+    distance * priority weight + load_weight * queued hours, whose load then
+    grows by the task's minutes. Returns a technician index per task and the
+    distance in km to that technician's base.
+    """
+    if not tasks or not bases:
+        return [], []
+
+    lats = np.array([task[1] for task in tasks], dtype=np.float64)
+    lons = np.array([task[2] for task in tasks], dtype=np.float64)
+    distances = haversine_matrix(lats, lons,
+                                 np.array([base[0] for base in bases], dtype=np.float64),
+                                 np.array([base[1] for base in bases], dtype=np.float64))
+    weights = np.array([PRIORITY_DISTANCE_WEIGHT.get(task[3], 1.0) for task in tasks])
+    costs = distances * weights[:, None]
+
+    load = np.array(load, dtype=np.float64) / 60.0
+    chosen = [0] * len(tasks)
+    urgency = sorted(range(len(tasks)), key=lambda index: (PRIORITY_ORDER.get(tasks[index][3], 2), index))
+    for index in urgency:
+        technician = int((costs[index] + load_weight * load).argmin())
+        chosen[index] = technician
+        load[technician] += tasks[index][4] / 60.0
+
+    return chosen, [float(distances[index, technician]) for index, technician in enumerate(chosen)]
+
+
+def plan_assignments(rows, technicians, depot, load_weight):
+    """
+    Balance task rows (with id, technician_id, latitude, longitude, priority
+    and estimated_duration) across technicians. The rows' own minutes are
+    taken off their current technician's load first, so every row is placed
+    afresh. Returns ([(row, technician_id, distance_km)], {technician_id: queued minutes}).
+    """
+    technician_ids = [technician.id for technician in technicians]
+    position = {technician_id: index for index, technician_id in enumerate(technician_ids)}
+    load = open_load(technician_ids)
+
+    tasks = []
+    for row in rows:
+        minutes = row.estimated_duration or DEFAULT_DURATION
+        if row.technician_id in position and row.status in OPEN_STATUSES:
+            load[position[row.technician_id]] -= minutes
+        tasks.append((row.id, row.latitude, row.longitude, row.priority, minutes))
+
+    chosen, distances = assign(tasks, technician_bases(technician_ids, depot), load, load_weight)
+
+    for task, technician in zip(tasks, chosen):
+        load[technician] += task[4]
+    return ([(row, technician_ids[technician], distance)
+             for row, technician, distance in zip(rows, chosen, distances)],
+            dict(zip(technician_ids, load.tolist())))
+
+
+def suggest_technician(latitude, longitude, priority, minutes, depot, load_weight):
+    """Active technician id best placed to take one new task, or None when there is none"""
+    technician_ids = [technician.id for technician in active_technicians()]
+    if not technician_ids:
+        return None
+    chosen, _ = assign([(None, latitude, longitude, priority, minutes or DEFAULT_DURATION)],
+                       technician_bases(technician_ids, depot), open_load(technician_ids), load_weight)
+    return technician_ids[chosen[0]]
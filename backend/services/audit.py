@@ -0,0 +1,48 @@
+from datetime import datetime
+
+from models import db, AuditLog
+from services.buffered import BufferedWriter
+
+
+class AuditWriter(BufferedWriter):
+    """
+    Buffers AuditLog rows in memory and writes them with bulk INSERTs.
+
+    A background thread flushes the buffer once it holds AUDIT_BATCH_SIZE rows
+    or every AUDIT_FLUSH_INTERVAL seconds, and the buffer is flushed again at
+    interpreter shutdown. Set AUDIT_SYNC to write every record immediately.
+    """
+
+    def __init__(self, app=None):
+        super().__init__(AuditLog, 'audit-writer', 'AUDIT', batch_size=200, flush_interval=2.0,
+                         max_pending=10000, app=app)
+
+    def init_app(self, app):
+        super().init_app(app)
+        app.extensions['audit_writer'] = self
+
+    def record(self, durable=False, **fields):
+        """
+        Queue one audit record. With durable=True (or AUDIT_SYNC) the record is
+        committed before returning, inside the caller's session.
+        """
+        fields.setdefault('timestamp', datetime.utcnow())
+
+        if durable or self.sync:
+            db.session.add(AuditLog(**fields))
+            db.session.commit()
+            return
+
+        with self._lock:
+            self._pending.append(fields)
+            depth = len(self._pending)
+
+        if depth >= self.max_pending:
+            # Writer can't keep up; make the caller pay for the flush
+            self.flush()
+        elif depth >= self.batch_size:
+            self._wakeup.set()
+        self._ensure_worker()
+
+
+audit_writer = AuditWriter()
@@ -0,0 +1,180 @@
+import threading
+import time
+
+from flask import current_app
+from flask_jwt_extended import create_access_token, create_refresh_token, decode_token, get_jwt
+from itsdangerous import BadData, URLSafeTimedSerializer
+
+from models import db, Admin, User
+from services.identity import CachedIdentity, identity_cache
+
+# Token kinds and the table each one's subject lives in
+ACCOUNT_MODELS = {'user': User, 'admin': Admin}
+
+
+class RevokedTokenError(Exception):
+    pass
+
+
+def token_claims(role, is_active, version, kind='user'):
+    """Claims every token carries so routes can authorise without reading the account row"""
+    return {'role': role, 'active': bool(is_active), 'ver': version or 0, 'kind': kind}
+
+
+def issue_access_token(account_id, role, is_active=True, version=0, kind='user'):
+    return create_access_token(identity=str(account_id),
+                               additional_claims=token_claims(role, is_active, version, kind))
+
+
+def issue_refresh_token(account_id, role, is_active=True, version=0, kind='user'):
+    return create_refresh_token(identity=str(account_id),
+                                additional_claims=token_claims(role, is_active, version, kind))
+
+
+def decode_access_token(token):
+    """Verified, unrevoked payload of token; raises like flask_jwt_extended.decode_token"""
+    payload = decode_token(token)
+    if token_versions.is_revoked(payload):
+        raise RevokedTokenError('Token has been revoked. Please log in again.')
+    return payload
+
+
+def request_claims():
+    """Claims of the token verified for this request, or {} when there is none"""
+    try:
+        return get_jwt()
+    except RuntimeError:
+        return {}
+
+
+def identity_for(user_id):
+    """
+    CachedIdentity for user_id. When user_id is the subject of this request's
+    token, id, role and is_active come from its claims and nothing is read;
+    tokens issued before the claims existed go through the identity cache.
+    Admin-account tokens have no users row, so they give None.
+    """
+    claims = request_claims()
+    if 'ver' in claims and str(claims.get('sub')) == str(user_id):
+        if claims.get('kind', 'user') != 'user':
+            return None
+        return CachedIdentity(int(user_id), claims['role'], claims['active'])
+    return identity_cache.get(user_id)
+
+
+def _stream_serializer():
+    return URLSafeTimedSerializer(current_app.config['JWT_SECRET_KEY'], salt='monitoring-stream')
+
+
+def issue_stream_token(user_id):
+    """
+    Token for opening the SSE stream, which EventSource can only authenticate
+    through the URL. It is not a JWT, so a copy left in an access log can't
+    be used on any other route, and it expires after SSE_TOKEN_MAX_AGE
+    seconds.
+    """
+    return _stream_serializer().dumps(str(user_id))
+
+
+def stream_token_identity(token):
+    """CachedIdentity for a stream token, or None when it is invalid, expired or the account is inactive"""
+    try:
+        user_id = _stream_serializer().loads(token, max_age=current_app.config.get('SSE_TOKEN_MAX_AGE', 60))
+    except BadData:
+        return None
+    identity = identity_cache.get(user_id)
+    if identity is None or not identity.is_active:
+        return None
+    return identity
+
+
+class TokenVersions:
+    """
+    In-memory copy of the accounts whose tokens need checking: those with a
+    bumped token_version and those that are deactivated. Everybody else is on
+    version 0 and active, so checking a token is a dict lookup.
+
+    The table is reloaded with one query every AUTH_VERSION_REFRESH seconds,
+    so revocations made by other worker processes apply within that time;
+    revoke() in this process applies on the next request.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.refresh_interval = 30
+        self._versions = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Register as the JWT revocation check; call after JWTManager(app)"""
+        self.app = app
+        self.refresh_interval = app.config.get('AUTH_VERSION_REFRESH', 30)
+        # Load from this app's database on the first check
+        self._versions = {}
+        self._loaded_at = None
+        app.extensions['flask-jwt-extended'].token_in_blocklist_loader(
+            lambda jwt_header, jwt_payload: self.is_revoked(jwt_payload))
+        app.extensions['token_versions'] = self
+
+    def is_revoked(self, payload):
+        # Tokens issued before the claims existed carry no version
+        if 'ver' not in payload:
+            return False
+        try:
+            key = (payload.get('kind', 'user'), int(payload['sub']))
+        except (KeyError, TypeError, ValueError):
+            return True
+        entry = self.current().get(key)
+        if entry is None:
+            return False
+        version, is_active = entry
+        return payload['ver'] < version or not is_active
+
+    def current(self):
+        """{(kind, account_id): (token_version, is_active)}, reloaded when stale"""
+        if self._stale():
+            # One request reloads; the rest keep using the table they have,
+            # unless it was expired and must not be used any more
+            if self._lock.acquire(blocking=self._loaded_at is None):
+                try:
+                    if self._stale():
+                        self._load()
+                finally:
+                    self._lock.release()
+        return self._versions
+
+    def _stale(self):
+        loaded_at = self._loaded_at
+        return loaded_at is None or time.monotonic() - loaded_at >= self.refresh_interval
+
+    def _load(self):
+        versions = {}
+        for kind, model in ACCOUNT_MODELS.items():
+            rows = db.session.query(model.id, model.token_version, model.is_active).filter(
+                (model.token_version > 0) | model.is_active.is_(False)
+            ).all()
+            for account_id, version, is_active in rows:
+                versions[(kind, account_id)] = (version, is_active is not False)
+        self._versions = versions
+        self._loaded_at = time.monotonic()
+
+    def revoke(self, account_id, kind='user'):
+        """
+        Add a token_version bump for the account to the session. Call when a
+        role or active flag changes, since tokens carry both, then expire()
+        after the commit so tokens issued before it are refused from the next
+        request on.
+        """
+        model = ACCOUNT_MODELS[kind]
+        db.session.execute(db.update(model).where(model.id == account_id)
+                           .values(token_version=model.token_version + 1))
+
+    def expire(self):
+        """Reload the table on the next check"""
+        self._loaded_at = None
+
+
+token_versions = TokenVersions()
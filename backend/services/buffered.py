@@ -0,0 +1,118 @@
+import atexit
+import threading
+
+from sqlalchemy.exc import OperationalError
+
+from models import db
+
+
+class BufferedWriter:
+    """
+    Buffers rows for one model in memory and writes them with bulk INSERTs.
+
+    A background thread named thread_name flushes once batch_size rows are
+    pending or every flush_interval seconds, and the buffer is flushed again
+    at interpreter shutdown. init_app reads <config_prefix>_BATCH_SIZE,
+    _FLUSH_INTERVAL, _MAX_PENDING and _SYNC. Subclasses decide how rows are
+    queued and what happens when max_pending is reached.
+    """
+
+    def __init__(self, model, thread_name, config_prefix, batch_size, flush_interval, max_pending, app=None):
+        self.model = model
+        self.thread_name = thread_name
+        self.config_prefix = config_prefix
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.sync = False
+        self.app = None
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+        self.flushed_total = 0
+        self.failed_flushes = 0
+        self.dropped_total = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        prefix = self.config_prefix
+        self.batch_size = app.config.get(f'{prefix}_BATCH_SIZE', self.batch_size)
+        self.flush_interval = app.config.get(f'{prefix}_FLUSH_INTERVAL', self.flush_interval)
+        self.max_pending = app.config.get(f'{prefix}_MAX_PENDING', self.max_pending)
+        self.sync = app.config.get(f'{prefix}_SYNC', False)
+        atexit.register(self.flush)
+
+    @property
+    def queue_depth(self):
+        return len(self._pending)
+
+    def insert(self, rows):
+        """Add rows to the session, batch_size rows per INSERT; the caller commits"""
+        for start in range(0, len(rows), self.batch_size):
+            db.session.execute(db.insert(self.model), rows[start:start + self.batch_size])
+
+    def flush(self):
+        """Write every pending row"""
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if not rows or self.app is None:
+            return 0
+
+        with self.app.app_context():
+            written = self._write(rows)
+        self.flushed_total += written
+        return written
+
+    def _write(self, rows):
+        """
+        Insert rows, splitting a batch in halves when it fails so one bad row
+        can't sink the rest. A row that fails on its own is logged and dropped.
+        OperationalError (database locked or unreachable) is not the rows'
+        fault, so whatever is unwritten goes back on the queue instead.
+        """
+        groups = [rows]
+        written = 0
+        while groups:
+            group = groups.pop()
+            try:
+                self.insert(group)
+                db.session.commit()
+            except OperationalError as e:
+                db.session.rollback()
+                self.failed_flushes += 1
+                self.app.logger.error(f"{self.thread_name} flush failed: {str(e)}")
+                unwritten = group + [row for rest in reversed(groups) for row in rest]
+                with self._lock:
+                    # Keep the rows for the next attempt, within the cap
+                    self._pending = (unwritten + self._pending)[-self.max_pending:]
+                return written
+            except Exception as e:
+                db.session.rollback()
+                if len(group) == 1:
+                    self.dropped_total += 1
+                    self.app.logger.error(f"{self.thread_name} dropped row {group[0]!r}: {str(e)}")
+                else:
+                    middle = len(group) // 2
+                    # Second half first, so the first half is popped next
+                    groups += [group[middle:], group[:middle]]
+                continue
+            written += len(group)
+        return written
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
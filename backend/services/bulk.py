@@ -0,0 +1,66 @@
+from models import db
+
+# Keeps every IN (...) list well below SQLite's bound-parameter limit
+CHUNK_SIZE = 500
+
+
+def chunked(items, size=CHUNK_SIZE):
+    """Yield successive slices of items holding at most size elements"""
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def existing_ids(model, ids):
+    """Return the subset of ids present in model's table, one SELECT per chunk"""
+    found = set()
+    for chunk in chunked(ids):
+        rows = db.session.query(model.id).filter(model.id.in_(chunk)).all()
+        found.update(row.id for row in rows)
+    return found
+
+
+def bulk_update_by_ids(model, ids, values):
+    """
+    Apply the same column values to every row in ids with
+    UPDATE ... WHERE id IN (...), one statement per chunk.
+    Returns the number of rows updated. The caller commits.
+    """
+    updated = 0
+    for chunk in chunked(ids):
+        result = db.session.execute(
+            db.update(model)
+            .where(model.id.in_(chunk))
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        updated += result.rowcount
+    return updated
+
+
+def bulk_update_rows(model, rows, extra_values=None):
+    """
+    Apply per-row values given as dicts holding 'id' plus the columns to set.
+    Rows sharing the same set of columns are sent as one executemany UPDATE.
+    Returns the number of rows updated. The caller commits.
+    """
+    table = model.__table__
+    extra_values = extra_values or {}
+
+    groups = {}
+    for row in rows:
+        columns = tuple(sorted(key for key in row if key != 'id'))
+        groups.setdefault(columns, []).append(row)
+
+    updated = 0
+    for columns, group in groups.items():
+        values = {column: db.bindparam(column) for column in columns}
+        values.update(extra_values)
+        statement = table.update().where(table.c.id == db.bindparam('_id')).values(values)
+        for chunk in chunked(group):
+            params = [
+                dict({column: row[column] for column in columns}, _id=row['id'])
+                for row in chunk
+            ]
+            updated += db.session.execute(statement, params).rowcount
+    return updated
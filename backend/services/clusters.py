@@ -0,0 +1,146 @@
+import math
+
+# Cells are a quarter of a 256px map tile wide, so clusters sit about 64px apart
+CELL_BITS = 2
+MAX_LATITUDE = 85.05112878
+
+
+def project(lat, lon):
+    """Web Mercator position of lat, lon scaled to the unit square"""
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    sin_lat = math.sin(math.radians(lat))
+    x = (lon + 180.0) / 360.0
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return min(max(x, 0.0), 1.0 - 1e-12), min(max(y, 0.0), 1.0 - 1e-12)
+
+
+class Cluster:
+    """Running totals for the water points in one grid cell"""
+
+    __slots__ = ('count', 'lat_sum', 'lon_sum', 'quality_sum', 'quality_count', 'id_sum', 'statuses')
+
+    def __init__(self):
+        self.count = 0
+        self.lat_sum = 0.0
+        self.lon_sum = 0.0
+        self.quality_sum = 0.0
+        self.quality_count = 0
+        # Equals the id of the only member when count is 1
+        self.id_sum = 0
+        self.statuses = {}
+
+    def add(self, water_point_id, lat, lon, status, quality_score, sign):
+        self.count += sign
+        self.lat_sum += sign * lat
+        self.lon_sum += sign * lon
+        self.id_sum += sign * water_point_id
+        if quality_score is not None:
+            self.quality_sum += sign * quality_score
+            self.quality_count += sign
+        remaining = self.statuses.get(status, 0) + sign
+        if remaining:
+            self.statuses[status] = remaining
+        else:
+            self.statuses.pop(status, None)
+
+    def to_dict(self):
+        return {
+            'latitude': round(self.lat_sum / self.count, 6),
+            'longitude': round(self.lon_sum / self.count, 6),
+            'count': self.count,
+            'statuses': dict(self.statuses),
+            'avg_quality_score': (round(self.quality_sum / self.quality_count, 1)
+                                  if self.quality_count else None)
+        }
+
+
+class ClusterIndex:
+    """
+    Grid clusters of water points for every zoom level from 0 to max_zoom.
+
+    Level z splits the Web Mercator square into 2^(z + CELL_BITS) cells a side.
+    Each point contributes to one cell per level, so adding, moving or
+    removing a point touches max_zoom + 1 cells and nothing is rebuilt.
+    """
+
+    def __init__(self, max_zoom=16):
+        self.max_zoom = max_zoom
+        self._levels = [{} for _ in range(max_zoom + 1)]
+        # water_point_id -> (id, lat, lon, status, quality_score, x, y)
+        self._members = {}
+
+    def __len__(self):
+        return len(self._members)
+
+    def update(self, water_point_id, point):
+        """Apply the current point dict for water_point_id, or None when it is gone"""
+        member = None
+        if point is not None and point['status'] != 'archived' and \
+                point['latitude'] is not None and point['longitude'] is not None:
+            member = (water_point_id, point['latitude'], point['longitude'],
+                      point['status'], point['qualityScore'])
+
+        old = self._members.get(water_point_id)
+        if old is not None and old[:5] == member:
+            return
+        if old is not None:
+            self._apply(old, -1)
+            del self._members[water_point_id]
+        if member is not None:
+            member = member + project(member[1], member[2])
+            self._apply(member, 1)
+            self._members[water_point_id] = member
+
+    def sync(self, points):
+        """Match the index to {water_point_id: point dict}, touching changed points only"""
+        for water_point_id in [key for key in self._members if key not in points]:
+            self.update(water_point_id, None)
+        for water_point_id, point in points.items():
+            self.update(water_point_id, point)
+
+    def clusters(self, zoom, south, west, north, east):
+        """
+        Clusters in the box at zoom, as (Cluster, None) pairs, or (None, member)
+        for single points past max_zoom where every point is returned on its own
+        """
+        if zoom > self.max_zoom:
+            return [(None, member) for member in self._members.values()
+                    if south <= member[1] <= north and _in_lon_range(member[2], west, east)]
+
+        cells = self._levels[zoom]
+        scale = 1 << (zoom + CELL_BITS)
+        x_min, y_max = project(south, west)
+        x_max, y_min = project(north, east)
+        rows = range(int(y_min * scale), int(y_max * scale) + 1)
+        if west <= east:
+            columns = [range(int(x_min * scale), int(x_max * scale) + 1)]
+        else:
+            columns = [range(int(x_min * scale), scale), range(0, int(x_max * scale) + 1)]
+
+        area = len(rows) * sum(len(span) for span in columns)
+        if area <= len(cells):
+            keys = ((x, y) for span in columns for x in span for y in rows)
+            found = [cells[key] for key in keys if key in cells]
+        else:
+            found = [cluster for (x, y), cluster in cells.items()
+                     if y in rows and any(x in span for span in columns)]
+        return [(cluster, None) for cluster in found]
+
+    def _apply(self, member, sign):
+        water_point_id, lat, lon, status, quality_score, x, y = member
+        # Cell coordinates at max_zoom; each level up drops one bit
+        top = self.max_zoom + CELL_BITS
+        x, y = int(x * (1 << top)), int(y * (1 << top))
+        for zoom, cells in enumerate(self._levels):
+            shift = self.max_zoom - zoom
+            key = (x >> shift, y >> shift)
+            cluster = cells.get(key)
+            if cluster is None:
+                cluster = cells[key] = Cluster()
+            cluster.add(water_point_id, lat, lon, status, quality_score, sign)
+            if not cluster.count:
+                del cells[key]
+
+
+def _in_lon_range(lon, west, east):
+    return west <= lon <= east if west <= east else lon >= west or lon <= east
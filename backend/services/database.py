@@ -0,0 +1,42 @@
+import sqlite3
+
+from sqlalchemy import event
+
+from models import db
+
+
+def init_app(app):
+    """Configure the shared SQLAlchemy connection pool; call before db.init_app"""
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return
+
+    # sqlite3 keeps this many prepared statements per connection
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    connect_args = options.setdefault('connect_args', {})
+    connect_args.setdefault('cached_statements', app.config.get('SQLITE_STATEMENT_CACHE', 256))
+
+
+def init_engine(app):
+    """Apply SQLITE_PRAGMAS to every new pooled connection; call after db.init_app"""
+    pragmas = app.config.get('SQLITE_PRAGMAS', {})
+
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+    with app.app_context():
+        event.listen(db.engine, 'connect', set_sqlite_pragmas)
+
+
+def get_db_connection():
+    """
+    Borrow a raw DB-API connection from the shared SQLAlchemy pool.
+
+    Calling close() on it returns the connection to the pool instead of
+    closing the underlying sqlite3 handle.
+    """
+    return db.engine.raw_connection()
@@ -0,0 +1,117 @@
+import json
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+
+class Event:
+    __slots__ = ('id', 'type', 'region', 'water_point_id', 'payload')
+
+    def __init__(self, event_id, event_type, data, region, water_point_id):
+        self.id = event_id
+        self.type = event_type
+        self.region = region
+        self.water_point_id = water_point_id
+        # Serialised once, however many clients receive it
+        self.payload = f'id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n'
+
+
+class EventBroadcaster:
+    """
+    In-process fan-out of monitoring deltas to Server-Sent Events clients.
+
+    Each published event gets an increasing id and is kept in a ring buffer
+    of SSE_HISTORY events, so a reconnecting client that sends Last-Event-ID
+    is replayed what it missed. Clients that fall further behind than the
+    buffer get a 'reset' event telling them to reload the full picture.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._history = deque(maxlen=1000)
+        self._condition = threading.Condition()
+        # Millisecond start keeps ids increasing across restarts
+        self._last_id = int(time.time() * 1000)
+        self.subscribers = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.heartbeat = app.config.get('SSE_HEARTBEAT', 15)
+        history = app.config.get('SSE_HISTORY', 1000)
+        if history != self._history.maxlen:
+            self._history = deque(self._history, maxlen=history)
+        app.extensions['event_broadcaster'] = self
+
+    @property
+    def last_event_id(self):
+        return self._last_id
+
+    def publish(self, event_type, data, region=None, water_point_id=None):
+        with self._condition:
+            self._last_id += 1
+            self._history.append(Event(self._last_id, event_type, data, region, water_point_id))
+            self._condition.notify_all()
+        return self._last_id
+
+    def _events_after(self, cursor):
+        """Buffered events newer than cursor, or None when cursor has fallen out of the buffer"""
+        if cursor == self._last_id:
+            return []
+        if not self._history or cursor < self._history[0].id - 1 or cursor > self._last_id:
+            return None
+        return list(islice(self._history, cursor - self._history[0].id + 1, None))
+
+    def stream(self, last_event_id=None, regions=None, water_point_ids=None, types=None):
+        """
+        Generator of SSE text for one client. Filters are sets; None means no
+        filter. Events are matched against them as they are read.
+        """
+        # Taken here, outside the generator, so events published before the
+        # response starts iterating are not missed
+        cursor = self._last_id if last_event_id is None else last_event_id
+        return self._stream(cursor, regions, water_point_ids, types)
+
+    def _stream(self, cursor, regions, water_point_ids, types):
+        def wanted(item):
+            if types and item.type not in types:
+                return False
+            if water_point_ids and item.water_point_id not in water_point_ids:
+                return False
+            if regions and item.region not in regions:
+                return False
+            return True
+
+        with self._condition:
+            self.subscribers += 1
+        try:
+            yield 'retry: 3000\n\n'
+
+            while True:
+                with self._condition:
+                    if cursor == self._last_id:
+                        self._condition.wait(self.heartbeat)
+                    events = self._events_after(cursor)
+
+                if events is None:
+                    cursor = self._last_id
+                    yield (f'id: {cursor}\nevent: reset\n'
+                           f'data: {json.dumps({"reason": "missed events, reload full state"})}\n\n')
+                    continue
+                if not events:
+                    yield ': keepalive\n\n'
+                    continue
+
+                for item in events:
+                    cursor = item.id
+                    if wanted(item):
+                        yield item.payload
+        finally:
+            with self._condition:
+                self.subscribers -= 1
+
+
+broadcaster = EventBroadcaster()
+
@@ -0,0 +1,172 @@
+import csv
+import io
+import json
+import re
+from datetime import datetime, timezone
+
+from sqlalchemy import Boolean, Float, Integer, Numeric
+
+from models import WaterPoint, QualityCheck, MaintenanceTask, WaterUsage
+
+# resource -> (model, column used by the start/end date filters)
+EXPORT_RESOURCES = {
+    'water_points': (WaterPoint, 'created_at'),
+    'quality_checks': (QualityCheck, 'checked_at'),
+    'maintenance_tasks': (MaintenanceTask, 'scheduled_date'),
+    'water_usage': (WaterUsage, 'timestamp')
+}
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx')
+}
+
+# Rows fetched from the database and written per output chunk
+BATCH_SIZE = 1000
+
+
+def export_query(resource, start=None, end=None, region=None):
+    """Build the filtered, id-ordered query for an export resource"""
+    model, date_column = EXPORT_RESOURCES[resource]
+    query = model.query
+
+    if start:
+        query = query.filter(getattr(model, date_column) >= start)
+    if end:
+        query = query.filter(getattr(model, date_column) < end)
+    if region:
+        if model is WaterPoint:
+            query = query.filter(WaterPoint.region == region)
+        else:
+            query = query.join(WaterPoint, model.water_point_id == WaterPoint.id).filter(
+                WaterPoint.region == region
+            )
+
+    return query.order_by(model.id)
+
+
+def iter_batches(query, batch_size=BATCH_SIZE):
+    """Yield lists of to_dict() rows, holding at most batch_size ORM objects at once"""
+    batch = []
+    for item in query.yield_per(batch_size):
+        batch.append(item.to_dict())
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_csv(batches):
+    buffer = io.StringIO()
+    writer = None
+    for batch in batches:
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(batch[0].keys()))
+            writer.writeheader()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def stream_ndjson(batches):
+    for batch in batches:
+        yield ''.join(json.dumps(row) + '\n' for row in batch)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back in pieces"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_type(pa, column):
+    if column is None:
+        return pa.string()
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, (Float, Numeric)):
+        return pa.float64()
+    # Strings, and dates, which to_dict() writes as ISO strings
+    return pa.string()
+
+
+def _parquet_schema(pa, model):
+    """
+    Schema of model.to_dict() rows, typed from the model's columns rather than
+    the data, so a NULL in the first batch can't fix a column's type. Every
+    field is nullable.
+    """
+    columns = model.__table__.columns
+    fields = []
+    for key in model().to_dict():
+        name = re.sub(r'(?<!^)(?=[A-Z])', '_', key).lower()
+        fields.append(pa.field(key, _parquet_type(pa, columns.get(name)), nullable=True))
+    return pa.schema(fields)
+
+
+def stream_parquet(batches, model):
+    """Write one Parquet row group per batch and yield the bytes as they are produced"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, _parquet_schema(pa, model))
+    for batch in batches:
+        writer.write_table(pa.Table.from_pylist(batch, schema=writer.schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def build_xlsx(batches, sheet_name):
+    """XLSX cannot be streamed; the workbook is built in memory"""
+    import pandas as pd
+
+    rows = [row for batch in batches for row in batch]
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        pd.DataFrame(rows).to_excel(writer, sheet_name=sheet_name, index=False)
+    output.seek(0)
+    return output
+
+
+def parse_date(value):
+    """Parse an ISO date/datetime argument into a naive UTC datetime"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
@@ -0,0 +1,68 @@
+import math
+
+import numpy as np
+
+from models import WaterPoint
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in kilometres"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2 +
+         math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_matrix(lats_a, lons_a, lats_b, lons_b):
+    """km between every point in a (rows) and every point in b (columns)"""
+    lat_a, lon_a = np.radians(lats_a)[:, None], np.radians(lons_a)[:, None]
+    lat_b, lon_b = np.radians(lats_b)[None, :], np.radians(lons_b)[None, :]
+    a = (np.sin((lat_b - lat_a) / 2) ** 2 +
+         np.cos(lat_a) * np.cos(lat_b) * np.sin((lon_b - lon_a) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def bounding_box(lat, lon, radius_km):
+    """(south, west, north, east) enclosing the circle of radius_km around lat, lon"""
+    lat_delta = radius_km / KM_PER_DEGREE_LAT
+    south, north = max(-90.0, lat - lat_delta), min(90.0, lat + lat_delta)
+    # Longitude degrees shrink towards the poles; use the widest latitude in the box
+    widest = max(abs(south), abs(north))
+    if widest >= 90.0:
+        return south, -180.0, north, 180.0
+    lon_delta = lat_delta / math.cos(math.radians(widest))
+    if lon_delta >= 180.0:
+        return south, -180.0, north, 180.0
+    return south, lon - lon_delta, north, lon + lon_delta
+
+
+def within_bbox(query, south, west, north, east):
+    """Filter a WaterPoint query to a box; read through ix_water_points_latitude_longitude"""
+    query = query.filter(WaterPoint.latitude.between(south, north))
+    if west <= east:
+        return query.filter(WaterPoint.longitude.between(west, east))
+    # Box crossing the antimeridian
+    return query.filter((WaterPoint.longitude >= west) | (WaterPoint.longitude <= east))
+
+
+def nearest(query, lat, lon, radius_km, limit):
+    """
+    The limit water points from query closest to lat, lon within radius_km,
+    as (WaterPoint, distance_km) pairs ordered by distance. The bounding box
+    narrows the candidates in SQL; exact distances are computed for those only.
+    """
+    south, west, north, east = bounding_box(lat, lon, radius_km)
+    if west < -180.0 or east > 180.0:
+        west, east = (west + 540.0) % 360.0 - 180.0, (east + 540.0) % 360.0 - 180.0
+    candidates = within_bbox(query, south, west, north, east).all()
+
+    ranked = []
+    for water_point in candidates:
+        distance = haversine_km(lat, lon, water_point.latitude, water_point.longitude)
+        if distance <= radius_km:
+            ranked.append((distance, water_point.id, water_point))
+    ranked.sort(key=lambda item: item[:2])
+    return [(water_point, distance) for distance, _, water_point in ranked[:limit]]
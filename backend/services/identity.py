@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g
+
+from models import db, User
+
+
+class CachedIdentity:
+    """
+    The caller's id, role and is_active, answered from the identity cache.
+
+    Any other attribute, and any assignment, goes to the full User row,
+    which is loaded on first use. Routes that only check id or role never
+    query the users table.
+    """
+
+    def __init__(self, user_id, role, is_active):
+        object.__setattr__(self, 'id', user_id)
+        object.__setattr__(self, 'role', role)
+        object.__setattr__(self, 'is_active', is_active)
+        object.__setattr__(self, '_user', None)
+
+    @property
+    def user(self):
+        if self._user is None:
+            object.__setattr__(self, '_user', User.query.get(self.id))
+        return self._user
+
+    def __getattr__(self, name):
+        return getattr(self.user, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.user, name, value)
+        if name in ('role', 'is_active'):
+            object.__setattr__(self, name, value)
+
+
+class IdentityCache:
+    """
+    Process-wide LRU of user id -> (role, is_active) with a TTL, plus
+    memoisation for the rest of the request.
+
+    Routes that change a user's role or active flag call invalidate(); other
+    worker processes pick the change up within IDENTITY_CACHE_TTL seconds.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.ttl = 60
+        self.max_size = 1024
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.ttl = app.config.get('IDENTITY_CACHE_TTL', 60)
+        self.max_size = app.config.get('IDENTITY_CACHE_SIZE', 1024)
+        app.extensions['identity_cache'] = self
+
+    def get(self, user_id):
+        """CachedIdentity for user_id, or None when there is no such user"""
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+
+        identities = g.setdefault('identities', {})
+        if user_id in identities:
+            return identities[user_id]
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                cached = entry[1]
+            else:
+                cached = None
+
+        if cached is None:
+            self.misses += 1
+            row = db.session.query(User.role, User.is_active).filter(User.id == user_id).first()
+            if row is None:
+                return None
+            cached = (row.role, row.is_active)
+            with self._lock:
+                self._entries[user_id] = (now + self.ttl, cached)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+
+        identity = identities[user_id] = CachedIdentity(user_id, *cached)
+        return identity
+
+    def invalidate(self, user_id=None):
+        """Forget user_id, or every cached identity when no id is given"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(int(user_id), None)
+        identities = g.get('identities')
+        if identities:
+            if user_id is None:
+                identities.clear()
+            else:
+                identities.pop(int(user_id), None)
+
+
+identity_cache = IdentityCache()
@@ -0,0 +1,122 @@
+import pandas as pd
+
+from models import db, WaterPoint
+
+REQUIRED_COLUMNS = ['name', 'type', 'region', 'location', 'latitude', 'longitude']
+NUMERIC_COLUMNS = ['latitude', 'longitude', 'capacity', 'current_level', 'quality_score',
+                   'coverage', 'population_served']
+TEXT_COLUMNS = ['name', 'type', 'region', 'location', 'status']
+DEFAULTS = {
+    'current_level': 0,
+    'quality_score': 0,
+    'coverage': 0,
+    'population_served': 0,
+    'status': 'active'
+}
+IMPORT_COLUMNS = TEXT_COLUMNS + [column for column in NUMERIC_COLUMNS if column not in TEXT_COLUMNS]
+
+
+def read_chunks(file, filename, chunk_size):
+    """Yield DataFrame chunks from a CSV or Excel upload"""
+    if filename.endswith('.csv'):
+        yield from pd.read_csv(file, chunksize=chunk_size, dtype={'name': str, 'region': str})
+        return
+
+    # openpyxl has no streaming reader through pandas; slice the sheet instead
+    sheet = pd.read_excel(file, dtype={'name': str, 'region': str})
+    for start in range(0, len(sheet), chunk_size):
+        yield sheet.iloc[start:start + chunk_size]
+
+
+class WaterPointImporter:
+    """
+    Validates and inserts water point rows chunk by chunk.
+
+    Validation is done with column-wise pandas operations, duplicates are
+    checked against a (name, region) key set loaded once from the database,
+    and each chunk is written with a single bulk INSERT.
+    """
+
+    def __init__(self):
+        self.existing_keys = set(db.session.query(WaterPoint.name, WaterPoint.region).all())
+        self.imported_count = 0
+        self.errors = []
+        self.ignored_columns = set()
+        # Row index -> error messages for the chunk being validated
+        self._row_errors = {}
+
+    def missing_columns(self, columns):
+        return [column for column in REQUIRED_COLUMNS if column not in columns]
+
+    def import_chunk(self, chunk):
+        """Validate one chunk, insert its valid rows and commit. Returns rows inserted."""
+        self.ignored_columns.update(column for column in chunk.columns if column not in IMPORT_COLUMNS)
+        frame = pd.DataFrame(index=chunk.index)
+
+        for column in TEXT_COLUMNS:
+            if column in chunk.columns:
+                frame[column] = chunk[column].astype('string').str.strip().replace('', pd.NA)
+            else:
+                frame[column] = pd.Series(pd.NA, index=chunk.index, dtype='string')
+
+        for column in NUMERIC_COLUMNS:
+            if column in chunk.columns:
+                frame[column] = pd.to_numeric(chunk[column], errors='coerce')
+                invalid = chunk[column].notna() & frame[column].isna()
+                self._reject(invalid, f'{column} must be a number')
+            else:
+                frame[column] = float('nan')
+
+        for column, default in DEFAULTS.items():
+            frame[column] = frame[column].fillna(default)
+
+        for column in REQUIRED_COLUMNS:
+            # Unparseable numbers were already reported above
+            missing = chunk[column].isna() if column in NUMERIC_COLUMNS else frame[column].isna()
+            self._reject(missing, f'{column} is required')
+        self._reject(frame['latitude'].notna() & ~frame['latitude'].between(-90, 90),
+                     'latitude must be between -90 and 90')
+        self._reject(frame['longitude'].notna() & ~frame['longitude'].between(-180, 180),
+                     'longitude must be between -180 and 180')
+
+        valid = ~frame.index.isin(list(self._row_errors))
+
+        keys = pd.MultiIndex.from_arrays([frame['name'], frame['region']])
+        exists = valid & keys.isin(self.existing_keys)
+        for index in frame.index[exists]:
+            self._add_error(index, f"Water point '{frame.at[index, 'name']}' already exists in {frame.at[index, 'region']}")
+
+        # Repeats within the upload; the first valid occurrence is kept
+        candidates = valid & ~exists
+        repeated = pd.Series(False, index=frame.index)
+        repeated[candidates] = frame.loc[candidates, ['name', 'region']].duplicated().to_numpy()
+        repeated = repeated.to_numpy()
+        for index in frame.index[repeated]:
+            self._add_error(index, f"Water point '{frame.at[index, 'name']}' appears more than once in {frame.at[index, 'region']}")
+
+        insert = frame[valid & ~exists & ~repeated]
+        self._flush_errors()
+        if insert.empty:
+            return 0
+
+        insert = insert.astype({'population_served': 'int64'})
+        records = insert.astype(object).where(insert.notna(), None).to_dict('records')
+        db.session.execute(db.insert(WaterPoint), records)
+        db.session.commit()
+
+        self.existing_keys.update(zip(insert['name'], insert['region']))
+        self.imported_count += len(records)
+        return len(records)
+
+    def _reject(self, mask, message):
+        # Only rows failing the check are visited
+        for index in mask.index[mask.to_numpy(dtype=bool)]:
+            self._add_error(index, message)
+
+    def _add_error(self, index, message):
+        self._row_errors.setdefault(index, []).append(message)
+
+    def _flush_errors(self):
+        for index, messages in sorted(self._row_errors.items()):
+            self.errors.append(f"Row {index + 1}: {'; '.join(messages)}")
+        self._row_errors = {}
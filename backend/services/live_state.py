@@ -0,0 +1,415 @@
+import math
+import threading
+import time
+from array import array
+from datetime import datetime
+from itertools import chain
+
+from sqlalchemy import event
+
+from models import db, WaterPoint, QualityCheck, MaintenanceTask, Alert, SensorReading
+from services.clusters import ClusterIndex
+from services.events import broadcaster
+from services.monitoring import recent_by_point, active_alerts_by_point
+from services.telemetry import SENSOR_TYPES
+
+SENSOR_CONFIG = {
+    'flow': {'label': 'Flow', 'unit': 'L/min', 'normal_range': [20, 80]},
+    'temperature': {'label': 'Temperature', 'unit': '°C', 'normal_range': [15, 30]},
+    'ph': {'label': 'pH', 'unit': 'pH', 'normal_range': [6.5, 8.5]},
+    'pressure': {'label': 'Pressure', 'unit': 'bar', 'normal_range': [1.5, 4.0]},
+    'turbidity': {'label': 'Turbidity', 'unit': 'NTU', 'normal_range': [0, 5]},
+    'chlorine': {'label': 'Chlorine', 'unit': 'ppm', 'normal_range': [0.2, 4.0]}
+}
+
+# Position of each sensor in PointState.values / read_at
+SENSOR_SLOTS = {sensor_type: index for index, sensor_type in enumerate(SENSOR_TYPES)}
+
+# Sensors a manual quality check also measures
+QUALITY_FIELDS = {
+    'temperature': 'temperature',
+    'ph': 'ph_level',
+    'turbidity': 'turbidity',
+    'chlorine': 'chlorine_level'
+}
+
+RECENT_CHECKS = 10
+RECENT_TASKS = 5
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _epoch(timestamp):
+    return (timestamp - EPOCH).total_seconds() if timestamp else 0.0
+
+
+def sensor_status(value, normal_range):
+    normal_min, normal_max = normal_range
+    if value < normal_min * 0.8:
+        return 'low'
+    if value > normal_max * 1.2:
+        return 'high'
+    if value < normal_min or value > normal_max:
+        return 'warning'
+    return 'normal'
+
+
+class PointState:
+    """Current picture of one water point: metadata, latest sensor values and recent activity"""
+
+    __slots__ = ('point', 'values', 'read_at', 'quality_checks', 'alerts', 'maintenance')
+
+    def __init__(self, point):
+        self.point = point
+        self.values = array('d', [math.nan] * len(SENSOR_TYPES))
+        self.read_at = array('d', [0.0] * len(SENSOR_TYPES))
+        self.quality_checks = []
+        self.alerts = []
+        self.maintenance = []
+
+    def record(self, sensor_type, value, read_at):
+        """Keep value if it is at least as new as the one held for sensor_type"""
+        slot = SENSOR_SLOTS[sensor_type]
+        if read_at >= self.read_at[slot]:
+            self.values[slot] = value
+            self.read_at[slot] = read_at
+
+    def sensors(self, now):
+        offline = self.point['status'] == 'offline'
+        sensor_data = {}
+        for sensor_type, config in SENSOR_CONFIG.items():
+            slot = SENSOR_SLOTS[sensor_type]
+            value = self.values[slot]
+
+            if offline:
+                value, status = 0, 'offline'
+            elif math.isnan(value):
+                value, status = None, 'no_data'
+            else:
+                status = sensor_status(value, config['normal_range'])
+
+            read_at = self.read_at[slot]
+            sensor_data[sensor_type] = {
+                'value': round(value, 2) if value is not None else None,
+                'unit': config['unit'],
+                'status': status,
+                'last_update': f'{int(now - read_at)}s ago' if read_at else None
+            }
+        return sensor_data
+
+    def overall_status(self, sensor_data=None):
+        """offline, critical, warning or normal from the point status, sensors and alerts"""
+        if self.point['status'] == 'offline':
+            return 'offline'
+
+        sensor_data = sensor_data or self.sensors(time.time())
+        statuses = {data['status'] for data in sensor_data.values()}
+        if statuses & {'high', 'low'}:
+            return 'critical'
+        if 'warning' in statuses or self.alerts:
+            return 'warning'
+        return 'normal'
+
+
+class LatestStateStore:
+    """
+    Process-local view of every water point used by the real-time monitoring
+    endpoints, so polling them does not query the database.
+
+    Telemetry ingest writes sensor values straight in. Commits touching water
+    points, alerts, quality checks or maintenance tasks mark those points
+    stale, and they are reloaded on the next read. The whole store is reloaded
+    every LATEST_STATE_REFRESH_INTERVAL seconds so changes made by other
+    worker processes show up too.
+
+    Changes are also published to the SSE broadcaster as deltas: sensor
+    updates, overall status changes, new alerts, alert updates and new
+    quality checks. The map cluster hierarchy is kept in step with the
+    points held here.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._points = {}
+        self._stale = set()
+        self._reload_all = True
+        self._refreshed_at = 0.0
+        # Last overall status per point, to publish only changes
+        self._statuses = {}
+        self._last_reading_id = 0
+        self.cluster_index = ClusterIndex()
+        self._lock = threading.RLock()
+        self._wakeup = threading.Event()
+        self._worker = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.refresh_interval = app.config.get('LATEST_STATE_REFRESH_INTERVAL', 60)
+        self.sync_only = app.config.get('LATEST_STATE_SYNC', False)
+        # Nothing held so far belongs to this app's database
+        with self._lock:
+            self._points = {}
+            self._stale = set()
+            self._reload_all = True
+            self._statuses = {}
+            self._last_reading_id = 0
+            self.cluster_index = ClusterIndex(app.config.get('CLUSTER_MAX_ZOOM', 16))
+        app.extensions['latest_state'] = self
+        for name, listener in (('after_flush', _track_changes),
+                               ('after_commit', _invalidate_committed),
+                               ('after_rollback', _discard_changes)):
+            if not event.contains(db.session, name, listener):
+                event.listen(db.session, name, listener)
+
+    def invalidate(self, water_point_ids=None):
+        """
+        Reload the given points, or everything when no ids are given, on the
+        next read or shortly after in the background
+        """
+        with self._lock:
+            if water_point_ids is None:
+                self._reload_all = True
+            else:
+                self._stale.update(water_point_ids)
+        self._wakeup.set()
+        self._ensure_worker()
+
+    def region_of(self, water_point_id):
+        state = self._points.get(water_point_id)
+        return state.point['region'] if state is not None else None
+
+    def apply_readings(self, rows):
+        """Record telemetry rows (dicts with water_point_id, sensor_type, timestamp, value)"""
+        touched = {}
+        with self._lock:
+            for row in rows:
+                state = self._points.get(row['water_point_id'])
+                if state is not None:
+                    touched.setdefault(state, set()).add(row['sensor_type'])
+                    state.record(row['sensor_type'], row['value'], _epoch(row['timestamp']))
+
+        # One delta per water point, not per reading
+        now = time.time()
+        for state, sensor_types in touched.items():
+            water_point_id = state.point['id']
+            sensor_data = state.sensors(now)
+            broadcaster.publish('sensor', {
+                'water_point_id': water_point_id,
+                'sensors': {sensor_type: sensor_data[sensor_type] for sensor_type in sensor_types}
+            }, state.point['region'], water_point_id)
+            self._publish_status(state, sensor_data)
+
+    def snapshot(self, water_point_id=None):
+        """All PointStates ordered by id, or the one for water_point_id (None if unknown)"""
+        self.sync()
+        if water_point_id is not None:
+            return self._points.get(water_point_id)
+        points = self._points
+        return [points[key] for key in sorted(points)]
+
+    def clusters(self, zoom, south, west, north, east):
+        """Map clusters in the box at zoom; a cluster of one carries its water point"""
+        self.sync()
+        result = []
+        with self._lock:
+            for cluster, member in self.cluster_index.clusters(zoom, south, west, north, east):
+                if cluster is not None and cluster.count > 1:
+                    result.append(cluster.to_dict())
+                    continue
+
+                state = self._points.get(member[0] if member else cluster.id_sum)
+                if state is None:
+                    continue
+                point = state.point
+                result.append({
+                    'latitude': point['latitude'],
+                    'longitude': point['longitude'],
+                    'count': 1,
+                    'statuses': {point['status']: 1},
+                    'avg_quality_score': point['qualityScore'],
+                    'water_point': {key: point[key] for key in ('id', 'name', 'type', 'region', 'status')}
+                })
+        return result
+
+    def warm(self):
+        """Rebuild the whole store from the database"""
+        with self._lock:
+            points = self._load_points(None, self._points)
+            if self._last_reading_id:
+                self._apply_new_readings(points)
+            else:
+                self._apply_latest_readings(points)
+            self._points = points
+            self.cluster_index.sync({water_point_id: state.point for water_point_id, state in points.items()})
+            self._reload_all = False
+            self._stale = set()
+            self._refreshed_at = time.monotonic()
+        for state in points.values():
+            self._publish_status(state)
+
+    def sync(self):
+        """Apply pending invalidations and the periodic full reload"""
+        expired = self.refresh_interval and time.monotonic() - self._refreshed_at > self.refresh_interval
+        if self._reload_all or expired:
+            self.warm()
+            return
+        if not self._stale:
+            return
+
+        with self._lock:
+            ids, self._stale = self._stale, set()
+            loaded = self._load_points(ids, self._points)
+            for water_point_id in ids:
+                if water_point_id in loaded:
+                    self._points[water_point_id] = loaded[water_point_id]
+                    self.cluster_index.update(water_point_id, loaded[water_point_id].point)
+                else:
+                    self._points.pop(water_point_id, None)
+                    self.cluster_index.update(water_point_id, None)
+        for state in loaded.values():
+            self._publish_status(state)
+
+    def _publish_status(self, state, sensor_data=None):
+        water_point_id = state.point['id']
+        status = state.overall_status(sensor_data)
+        previous = self._statuses.get(water_point_id)
+        self._statuses[water_point_id] = status
+        if previous is not None and previous != status:
+            broadcaster.publish('status', {
+                'water_point_id': water_point_id,
+                'status': state.point['status'],
+                'overall_status': status,
+                'previous': previous
+            }, state.point['region'], water_point_id)
+
+    def _ensure_worker(self):
+        if self.app is None or self.sync_only:
+            return
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._run, name='latest-state', daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        # Reloads stale points promptly so status changes reach SSE clients
+        # even when nothing polls the REST endpoints
+        while True:
+            self._wakeup.wait(self.refresh_interval or None)
+            self._wakeup.clear()
+            try:
+                with self.app.app_context():
+                    self.sync()
+            except Exception as e:
+                self.app.logger.error(f"Latest state refresh failed: {str(e)}")
+
+    def _load_points(self, ids, previous):
+        query = WaterPoint.query
+        if ids is not None:
+            query = query.filter(WaterPoint.id.in_(ids))
+        ids = list(ids) if ids is not None else None
+
+        checks = recent_by_point(QualityCheck, QualityCheck.checked_at, RECENT_CHECKS, ids)
+        tasks = recent_by_point(MaintenanceTask, MaintenanceTask.created_at, RECENT_TASKS, ids)
+        alerts = active_alerts_by_point(ids)
+
+        points = {}
+        for water_point in query.order_by(WaterPoint.id).all():
+            state = PointState(water_point.to_dict())
+            old = previous.get(water_point.id)
+            if old is not None:
+                # Sensor values only arrive through telemetry; carry them over
+                state.values = old.values
+                state.read_at = old.read_at
+
+            point_checks = checks.get(water_point.id, [])
+            state.quality_checks = [check.to_dict() for check in point_checks]
+            state.maintenance = [task.to_dict() for task in tasks.get(water_point.id, [])]
+            state.alerts = [alert.to_dict() for alert in alerts.get(water_point.id, [])]
+
+            if point_checks:
+                latest = point_checks[0]
+                for sensor_type, field in QUALITY_FIELDS.items():
+                    value = getattr(latest, field)
+                    if value is not None:
+                        state.record(sensor_type, value, _epoch(latest.checked_at))
+            points[water_point.id] = state
+        return points
+
+    def _apply_latest_readings(self, points):
+        """Newest reading per (water point, sensor), read through the composite index"""
+        newest = db.session.query(
+            SensorReading.water_point_id,
+            SensorReading.sensor_type,
+            db.func.max(SensorReading.timestamp).label('timestamp')
+        ).group_by(SensorReading.water_point_id, SensorReading.sensor_type).subquery()
+
+        rows = db.session.query(
+            SensorReading.water_point_id, SensorReading.sensor_type,
+            SensorReading.timestamp, SensorReading.value
+        ).join(newest, db.and_(
+            SensorReading.water_point_id == newest.c.water_point_id,
+            SensorReading.sensor_type == newest.c.sensor_type,
+            SensorReading.timestamp == newest.c.timestamp
+        )).all()
+
+        for row in rows:
+            state = points.get(row.water_point_id)
+            if state is not None:
+                state.record(row.sensor_type, row.value, _epoch(row.timestamp))
+        self._last_reading_id = db.session.query(db.func.max(SensorReading.id)).scalar() or 0
+
+    def _apply_new_readings(self, points):
+        """Readings stored since the last refresh, e.g. by other worker processes"""
+        rows = db.session.query(
+            SensorReading.id, SensorReading.water_point_id, SensorReading.sensor_type,
+            SensorReading.timestamp, SensorReading.value
+        ).filter(SensorReading.id > self._last_reading_id).order_by(SensorReading.id).all()
+
+        for row in rows:
+            state = points.get(row.water_point_id)
+            if state is not None:
+                state.record(row.sensor_type, row.value, _epoch(row.timestamp))
+        if rows:
+            self._last_reading_id = rows[-1].id
+
+
+latest_state = LatestStateStore()
+
+
+def _track_changes(session, flush_context):
+    touched = session.info.setdefault('latest_state_ids', set())
+    for instance in chain(session.new, session.dirty, session.deleted):
+        if isinstance(instance, WaterPoint):
+            touched.add(instance.id)
+        elif isinstance(instance, (Alert, QualityCheck, MaintenanceTask)) and instance.water_point_id:
+            touched.add(instance.water_point_id)
+
+    # Serialised now: attributes are expired and unloadable after the commit
+    events = session.info.setdefault('latest_state_events', [])
+    for instance in session.new:
+        if isinstance(instance, Alert):
+            events.append(('alert', instance.to_dict(), instance.water_point_id))
+        elif isinstance(instance, QualityCheck):
+            events.append(('quality_check', instance.to_dict(), instance.water_point_id))
+    for instance in session.dirty:
+        if isinstance(instance, Alert) and session.is_modified(instance):
+            events.append(('alert_update', instance.to_dict(), instance.water_point_id))
+
+
+def _invalidate_committed(session):
+    for event_type, data, water_point_id in session.info.pop('latest_state_events', []):
+        broadcaster.publish(event_type, data, latest_state.region_of(water_point_id), water_point_id)
+
+    touched = session.info.pop('latest_state_ids', None)
+    if touched:
+        latest_state.invalidate(touched)
+
+
+def _discard_changes(session):
+    session.info.pop('latest_state_ids', None)
+    session.info.pop('latest_state_events', None)
@@ -0,0 +1,38 @@
+from collections import defaultdict
+
+from models import db, Alert
+
+
+def recent_by_point(model, order_column, limit, water_point_ids=None):
+    """Return {water_point_id: [row, ...]} with the newest limit rows per point in one query"""
+    ranked = db.session.query(
+        model.id.label('id'),
+        db.func.row_number().over(
+            partition_by=model.water_point_id,
+            order_by=(order_column.desc(), model.id.desc())
+        ).label('rn')
+    )
+    if water_point_ids is not None:
+        ranked = ranked.filter(model.water_point_id.in_(water_point_ids))
+    ranked = ranked.subquery()
+
+    rows = model.query.join(
+        ranked, model.id == ranked.c.id
+    ).filter(ranked.c.rn <= limit).order_by(model.water_point_id, ranked.c.rn).all()
+
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[row.water_point_id].append(row)
+    return grouped
+
+
+def active_alerts_by_point(water_point_ids=None):
+    """Return {water_point_id: [Alert, ...]} for all active alerts in one query"""
+    query = Alert.query.filter(Alert.status == 'active')
+    if water_point_ids is not None:
+        query = query.filter(Alert.water_point_id.in_(water_point_ids))
+
+    grouped = defaultdict(list)
+    for alert in query.order_by(Alert.created_at.desc()).all():
+        grouped[alert.water_point_id].append(alert)
+    return grouped
@@ -0,0 +1,143 @@
+import base64
+import json
+from datetime import datetime
+
+from flask import request
+
+from models import db
+
+# Hard cap on page size for every paginated endpoint
+MAX_PER_PAGE = 100
+
+# Estimated totals count at most this many rows
+ESTIMATE_CAP = 10000
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(values):
+    """Encode sort key values into an opaque cursor token"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, columns):
+    """Decode a cursor token back into typed sort key values for columns"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+    except ValueError:
+        raise InvalidCursor('Malformed cursor')
+
+    if not isinstance(payload, list) or len(payload) != len(columns):
+        raise InvalidCursor('Cursor does not match the sort order')
+
+    return [_cursor_value(column, value) for column, value in zip(columns, payload)]
+
+
+def _cursor_value(column, value):
+    """value converted to column's Python type; anything that doesn't fit is a forged cursor"""
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+
+    # Sort columns are never NULL, and bool is an int subclass JSON keeps apart
+    if value is None or (isinstance(value, bool) and python_type is not bool):
+        raise InvalidCursor('Malformed cursor')
+    if python_type is datetime:
+        try:
+            return datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise InvalidCursor('Malformed cursor')
+    if python_type is float and isinstance(value, int):
+        return float(value)
+    if not isinstance(value, python_type):
+        raise InvalidCursor('Malformed cursor')
+    return value
+
+
+def clamp_per_page(per_page):
+    return max(1, min(per_page, MAX_PER_PAGE))
+
+
+def count_total(query, mode):
+    """
+    Total row count for a query according to mode:
+    'exact' counts every row, 'estimate' stops counting at ESTIMATE_CAP,
+    anything else skips the count.
+    """
+    if mode == 'exact':
+        return query.order_by(None).count(), False
+    if mode == 'estimate':
+        capped = query.order_by(None).limit(ESTIMATE_CAP).subquery()
+        total = db.session.query(db.func.count()).select_from(capped).scalar()
+        return total, total >= ESTIMATE_CAP
+    return None, False
+
+
+def keyset_page(query, order_columns, cursor=None, per_page=10, descending=True):
+    """
+    Fetch one page ordered by order_columns, starting after cursor.
+
+    order_columns must end with a unique column (normally the primary key) and
+    must not be nullable. Returns (items, next_cursor).
+    """
+    if cursor:
+        values = decode_cursor(cursor, order_columns)
+        row_key = db.tuple_(*order_columns)
+        after = db.tuple_(*values)
+        query = query.filter(row_key < after if descending else row_key > after)
+
+    ordering = [column.desc() if descending else column.asc() for column in order_columns]
+    rows = query.order_by(*ordering).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in order_columns])
+    return rows, next_cursor
+
+
+def paginate(query, items_key, order_columns, default_per_page=10, descending=True):
+    """
+    Paginate query from the request arguments and build the response body.
+
+    Offset mode (page/per_page) is the default and keeps the existing response
+    shape. Passing ``cursor`` (empty for the first page) or
+    ``pagination=cursor`` switches to keyset mode, which returns
+    ``next_cursor`` and only counts rows when ``total=exact|estimate``.
+    """
+    per_page = clamp_per_page(request.args.get('per_page', default_per_page, type=int))
+    total_mode = request.args.get('total')
+
+    if 'cursor' in request.args or request.args.get('pagination') == 'cursor':
+        items, next_cursor = keyset_page(
+            query, order_columns, request.args.get('cursor'), per_page, descending
+        )
+        body = {
+            items_key: [item.to_dict() for item in items],
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
+            'per_page': per_page
+        }
+        if total_mode in ('exact', 'estimate'):
+            body['total'], body['total_is_estimate'] = count_total(query, total_mode)
+        return body
+
+    page = request.args.get('page', 1, type=int)
+    ordering = [column.desc() if descending else column.asc() for column in order_columns]
+    result = query.order_by(*ordering).paginate(
+        page=page, per_page=per_page, max_per_page=MAX_PER_PAGE,
+        error_out=False, count=total_mode != 'none'
+    )
+    return {
+        items_key: [item.to_dict() for item in result.items],
+        'total': result.total,
+        'pages': result.pages,
+        'current_page': page,
+        'per_page': per_page
+    }
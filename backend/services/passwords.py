@@ -0,0 +1,104 @@
+import atexit
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when PASSWORD_HASH_MAX_QUEUE hash jobs are already running or waiting"""
+
+
+class PasswordHasher:
+    """
+    Hashes and checks passwords on a pool of PASSWORD_HASH_WORKERS threads.
+
+    hashlib's scrypt and pbkdf2 release the GIL, so the pool hashes on every
+    core while request threads wait for their result, and a registration
+    drive cannot run more hashes at once than there are workers. When
+    PASSWORD_HASH_MAX_QUEUE jobs are already queued, hash() and check() raise
+    PasswordHashingBusy so the route can answer 503 instead of queueing.
+
+    New hashes use PASSWORD_HASH_METHOD (any werkzeug method string).
+    verify() re-hashes passwords stored with other parameters, so changing
+    the method upgrades accounts as they log in.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.method = 'scrypt'
+        self.workers = 1
+        self.max_queue = 64
+        self.sync = True
+        self._prefix = None
+        self._slots = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self.rejected = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.method = app.config.get('PASSWORD_HASH_METHOD', 'scrypt')
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS') or os.cpu_count() or 1
+        self.max_queue = app.config.get('PASSWORD_HASH_MAX_QUEUE', 64)
+        self.sync = app.config.get('PASSWORD_HASH_SYNC', False)
+        self._prefix = None
+        self._slots = threading.BoundedSemaphore(self.max_queue)
+        app.extensions['password_hasher'] = self
+        atexit.register(self.shutdown)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def check(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def verify(self, password_hash, password):
+        """
+        (matches, new_hash). new_hash is password hashed with the current
+        method when it matched a hash made with other parameters, else None.
+        """
+        if not self.check(password_hash, password):
+            return False, None
+        if self.needs_rehash(password_hash):
+            return True, self.hash(password)
+        return True, None
+
+    def needs_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != self.prefix
+
+    @property
+    def prefix(self):
+        """Method and parameters werkzeug writes in front of new hashes, e.g. scrypt:32768:8:1"""
+        if self._prefix is None:
+            self._prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return self._prefix
+
+    def _run(self, function, *args):
+        if self.sync or self._slots is None:
+            return function(*args)
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PasswordHashingBusy('Too many logins in progress, please try again')
+        try:
+            return self._pool().submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+    def _pool(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix='password-hasher')
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,135 @@
+from datetime import datetime
+
+import numpy as np
+
+from models import db, QualityCheck, SystemSetting, WaterPoint
+from services.bulk import bulk_update_by_ids, bulk_update_rows
+from services.live_state import latest_state
+from services.settings import settings_store
+
+RESCORE_CHUNK_SIZE = 50000
+
+# System setting holding when a rescore last changed stored scores
+RESCORED_AT_KEY = 'quality_rescored_at'
+
+
+def quality_scores(ph, turbidity, chlorine, e_coli):
+    """
+    Overall scores (0-100) for sequences of readings, using the limits and
+    penalties in system settings. Missing (None) and zero readings are not
+    penalised.
+    """
+    setting = settings_store.number
+    ph, turbidity, chlorine = (np.asarray(values, dtype=np.float64) for values in (ph, turbidity, chlorine))
+
+    # NaN compares false, so missing readings drop out of every test
+    scores = np.full(ph.shape, 100.0)
+    scores -= setting('quality_ph_penalty') * (
+        (ph != 0) & ((ph < setting('quality_ph_min')) | (ph > setting('quality_ph_max'))))
+    scores -= setting('quality_turbidity_penalty') * (turbidity > setting('quality_turbidity_max'))
+    scores -= setting('quality_chlorine_penalty') * (
+        (chlorine != 0) & ((chlorine < setting('quality_chlorine_min')) | (chlorine > setting('quality_chlorine_max'))))
+    scores -= setting('quality_ecoli_penalty') * np.asarray(e_coli, dtype=bool)
+    return np.maximum(scores, 0)
+
+
+def _fetch_array(statement):
+    """Rows of statement as a float array, None as NaN, straight from the DBAPI cursor"""
+    sql = str(statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.execute(sql)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    return np.array(rows, dtype=np.float64)
+
+
+def rescore_quality_checks(chunk_size=RESCORE_CHUNK_SIZE):
+    """
+    Re-apply the current scoring settings to every QualityCheck, then refresh
+    the water points' scores. Checks are read in id order, chunk_size at a
+    time, into one array and scored at once. Only rows whose score or is_safe
+    changed are written. There are only a handful of distinct scores, so each
+    chunk takes one UPDATE ... WHERE id IN (...) per score. Each chunk is
+    committed. When any score changed, the time is stored under
+    RESCORED_AT_KEY so reports built from the old scores aren't reused.
+    Returns (checks read, checks updated, water points updated).
+    """
+    safe_score = settings_store.number('quality_safe_score')
+    table = QualityCheck.__table__
+    query = db.select(table.c.id, table.c.ph_level, table.c.turbidity, table.c.chlorine_level,
+                      table.c.e_coli_presence, table.c.overall_score, table.c.is_safe).order_by(table.c.id)
+
+    last_id = 0
+    read = updated = 0
+    while True:
+        rows = _fetch_array(query.where(table.c.id > last_id).limit(chunk_size))
+        if not len(rows):
+            break
+
+        ids = rows[:, 0].astype(np.int64)
+        scores = quality_scores(rows[:, 1], rows[:, 2], rows[:, 3], rows[:, 4] > 0)
+        old_scores, old_safe = rows[:, 5], rows[:, 6]
+        changed = (scores != old_scores) | ((scores >= safe_score) != (old_safe > 0)) | np.isnan(old_safe)
+
+        for score in np.unique(scores[changed]).tolist():
+            bulk_update_by_ids(QualityCheck, ids[changed & (scores == score)].tolist(),
+                               {'overall_score': score, 'is_safe': score >= safe_score})
+        db.session.commit()
+
+        read += len(rows)
+        updated += int(changed.sum())
+        last_id = int(ids[-1])
+
+    if updated:
+        _mark_rescored()
+    return read, updated, refresh_water_point_scores()
+
+
+def _mark_rescored():
+    setting = SystemSetting.query.filter_by(key=RESCORED_AT_KEY).first()
+    if not setting:
+        setting = SystemSetting(key=RESCORED_AT_KEY, category='quality',
+                                description='When quality check scores were last recalculated')
+        db.session.add(setting)
+    setting.value = datetime.utcnow().isoformat()
+    # Other processes pick the marker up on their next settings poll
+    settings_store.bump()
+    db.session.commit()
+    settings_store.expire()
+
+
+def rescored_at():
+    """When a rescore last changed quality check scores, or None"""
+    value = settings_store.get(RESCORED_AT_KEY)
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def refresh_water_point_scores():
+    """
+    Set each water point's quality_score to the overall_score of its latest
+    quality check, for points that have checks. Returns how many changed.
+    """
+    # One seek per point on ix_quality_checks_water_point_id_checked_at
+    latest = db.select(QualityCheck.overall_score).where(
+        QualityCheck.water_point_id == WaterPoint.id
+    ).order_by(QualityCheck.checked_at.desc(), QualityCheck.id.desc()).limit(1).scalar_subquery()
+    has_checks = db.exists().where(QualityCheck.water_point_id == WaterPoint.id)
+    rows = [
+        (water_point_id, score) for water_point_id, current, score in
+        db.session.execute(db.select(WaterPoint.id, WaterPoint.quality_score, latest).where(has_checks)).all()
+        if current != score
+    ]
+    if not rows:
+        return 0
+
+    bulk_update_rows(WaterPoint, [{'id': water_point_id, 'quality_score': score} for water_point_id, score in rows],
+                     extra_values={'updated_at': datetime.utcnow()})
+    db.session.commit()
+    # Core UPDATEs skip the session events live_state listens to
+    latest_state.invalidate([water_point_id for water_point_id, _ in rows])
+    return len(rows)
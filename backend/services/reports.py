@@ -0,0 +1,198 @@
+import json
+from datetime import datetime
+
+from models import db, WaterPoint, MaintenanceTask, QualityCheck, WaterUsage, Report
+from services.aggregates import aggregate, count_if, sum_if
+from services.quality import rescored_at
+
+
+def _in_period(column, start, end):
+    conditions = []
+    if start:
+        conditions.append(column >= start)
+    if end:
+        conditions.append(column < end)
+    return conditions
+
+
+def _percentage(part, whole):
+    return round(part / whole * 100, 1) if whole else 0.0
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
+
+
+def water_quality_report(start, end):
+    """Check totals, safe percentage and average score, overall and per region"""
+    period = _in_period(QualityCheck.checked_at, start, end)
+    summary = aggregate(
+        QualityCheck, period,
+        total_checks=db.func.count(QualityCheck.id),
+        safe_checks=count_if(QualityCheck.is_safe.is_(True)),
+        average_score=db.func.avg(QualityCheck.overall_score)
+    )
+
+    rows = db.session.query(
+        WaterPoint.region,
+        db.func.count(QualityCheck.id).label('total_checks'),
+        count_if(QualityCheck.is_safe.is_(True)).label('safe_checks'),
+        db.func.avg(QualityCheck.overall_score).label('average_score')
+    ).join(WaterPoint, QualityCheck.water_point_id == WaterPoint.id).filter(
+        *period
+    ).group_by(WaterPoint.region).order_by(WaterPoint.region).all()
+
+    return {
+        'summary': {
+            'total_checks': summary['total_checks'],
+            'safe_checks': summary['safe_checks'],
+            'safe_percentage': _percentage(summary['safe_checks'], summary['total_checks']),
+            'average_score': _round(summary['average_score'])
+        },
+        'details': [{
+            'region': row.region,
+            'total_checks': row.total_checks,
+            'safe_percentage': _percentage(row.safe_checks, row.total_checks),
+            'average_score': _round(row.average_score)
+        } for row in rows]
+    }
+
+
+def maintenance_report(start, end):
+    """Task counts by status and cost for tasks scheduled in the period"""
+    period = _in_period(MaintenanceTask.scheduled_date, start, end)
+    summary = aggregate(
+        MaintenanceTask, period,
+        total_tasks=db.func.count(MaintenanceTask.id),
+        completed=count_if(MaintenanceTask.status == 'completed'),
+        in_progress=count_if(MaintenanceTask.status == 'in_progress'),
+        pending=count_if(MaintenanceTask.status == 'pending'),
+        cancelled=count_if(MaintenanceTask.status == 'cancelled'),
+        total_cost=db.func.coalesce(db.func.sum(MaintenanceTask.cost), 0),
+        completed_cost=sum_if(MaintenanceTask.status == 'completed', MaintenanceTask.cost)
+    )
+
+    rows = db.session.query(
+        MaintenanceTask.priority,
+        db.func.count(MaintenanceTask.id).label('total_tasks'),
+        count_if(MaintenanceTask.status == 'completed').label('completed'),
+        db.func.coalesce(db.func.sum(MaintenanceTask.cost), 0).label('total_cost')
+    ).filter(*period).group_by(MaintenanceTask.priority).order_by(MaintenanceTask.priority).all()
+
+    summary['total_cost'] = _round(float(summary['total_cost']))
+    summary['completed_cost'] = _round(float(summary['completed_cost']))
+    summary['completion_rate'] = _percentage(summary['completed'], summary['total_tasks'])
+
+    return {
+        'summary': summary,
+        'details': [{
+            'priority': row.priority,
+            'total_tasks': row.total_tasks,
+            'completed': row.completed,
+            'total_cost': _round(float(row.total_cost))
+        } for row in rows]
+    }
+
+
+def usage_report(start, end):
+    """Total, average daily and peak daily usage, with one row per day"""
+    period = _in_period(WaterUsage.timestamp, start, end)
+    day = db.func.date(WaterUsage.timestamp)
+
+    rows = db.session.query(
+        day.label('day'),
+        db.func.sum(WaterUsage.amount).label('usage'),
+        db.func.sum(WaterUsage.cost).label('cost')
+    ).filter(*period).group_by(day).order_by(day).all()
+
+    total_usage = sum(row.usage or 0 for row in rows)
+    total_cost = sum(row.cost or 0 for row in rows)
+    peak = max(rows, key=lambda row: row.usage or 0, default=None)
+
+    # Days without readings still count towards the average for a bounded period
+    if start and end:
+        days = max((end - start).days, 1)
+    else:
+        days = len(rows)
+
+    return {
+        'summary': {
+            'total_usage': _round(total_usage),
+            'total_cost': _round(total_cost),
+            'average_daily': _round(total_usage / days) if days else 0,
+            'peak_usage': _round(peak.usage) if peak else 0,
+            'peak_date': str(peak.day) if peak else None,
+            'days': days
+        },
+        'details': [{
+            'date': str(row.day),
+            'usage': _round(row.usage),
+            'cost': _round(row.cost)
+        } for row in rows]
+    }
+
+
+def general_report(start, end):
+    """Summaries of every other report type"""
+    return {
+        'summary': {
+            report_type: builder(start, end)['summary']
+            for report_type, builder in REPORT_BUILDERS.items()
+            if report_type != 'general'
+        },
+        'details': []
+    }
+
+
+REPORT_BUILDERS = {
+    'water_quality': water_quality_report,
+    'maintenance': maintenance_report,
+    'usage': usage_report,
+    'general': general_report
+}
+
+
+def build_report(report_type, start=None, end=None):
+    return REPORT_BUILDERS[report_type](start, end)
+
+
+# Report types built from QualityCheck scores, which a rescore rewrites
+SCORED_REPORT_TYPES = ('water_quality', 'general')
+
+
+def is_closed_period(end):
+    return end is not None and end <= datetime.utcnow()
+
+
+def cached_report(report_type, start, end):
+    """
+    Most recent stored report for a closed period, or None.
+
+    Only reports generated after the period ended are reused, so a report
+    run while the period was still open is never served as final. Reports
+    built from quality scores must also postdate the last rescore.
+    """
+    if not is_closed_period(end):
+        return None
+
+    conditions = [
+        Report.type == report_type,
+        Report.period_start.is_(None) if start is None else Report.period_start == start,
+        Report.period_end == end,
+        Report.created_at >= end
+    ]
+    if report_type in SCORED_REPORT_TYPES:
+        rescored = rescored_at()
+        if rescored:
+            conditions.append(Report.created_at >= rescored)
+
+    candidates = Report.query.filter(*conditions).order_by(Report.created_at.desc()).limit(5)
+
+    for report in candidates:
+        try:
+            data = json.loads(report.data or '')
+        except ValueError:
+            continue
+        if isinstance(data, dict) and 'summary' in data:
+            return report
+    return None
@@ -0,0 +1,97 @@
+from functools import lru_cache
+
+import numpy as np
+
+from services.geo import haversine_km, haversine_matrix
+
+
+@lru_cache(maxsize=16)
+def distance_matrix(coordinates):
+    """
+    Haversine distances in km between every pair of (lat, lon) in the tuple
+    coordinates. Cached, so re-planning the same stops costs nothing; the
+    returned array is read-only.
+    """
+    points = np.array(coordinates, dtype=np.float64).reshape(-1, 2)
+    matrix = haversine_matrix(points[:, 0], points[:, 1], points[:, 0], points[:, 1])
+    matrix.setflags(write=False)
+    return matrix
+
+
+def route_length(order, matrix):
+    order = np.asarray(order)
+    return float(matrix[order[:-1], order[1:]].sum())
+
+
+def nearest_neighbour(matrix, start=0):
+    """Visit order starting at start, always driving to the closest unvisited stop"""
+    size = len(matrix)
+    visited = np.zeros(size, dtype=bool)
+    order = [start]
+    visited[start] = True
+    current = start
+    for _ in range(size - 1):
+        distances = np.where(visited, np.inf, matrix[current])
+        current = int(distances.argmin())
+        visited[current] = True
+        order.append(current)
+    return order
+
+
+def two_opt(order, matrix, fixed_end=False):
+    """
+    Improve a path by reversing segments while that shortens it. The first
+    stop never moves, and the last one neither when fixed_end. Gains for all
+    segment ends are computed at once per segment start.
+    """
+    order = np.array(order)
+    last = len(order) - (2 if fixed_end else 1)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, last):
+            a, b = order[i - 1], order[i]
+            ends = order[i + 1:last + 1]
+            # Replace edges (a, b) and (c, d) with (a, c) and (b, d)
+            gain = matrix[a, b] - matrix[a, ends]
+            # With an open end, reversing up to the last stop has no (c, d) edge
+            after = order[i + 2:last + 2]
+            gain[:len(after)] += matrix[ends[:len(after)], after] - matrix[b, after]
+            best = int(gain.argmax())
+            if gain[best] > 1e-9:
+                j = i + 1 + best
+                order[i:j + 1] = order[i:j + 1][::-1].copy()
+                improved = True
+    return order.tolist()
+
+
+def plan_route(start, stops, return_to_start=False):
+    """
+    Order stops ((lat, lon) pairs) for a trip from start. Returns (order,
+    legs) where order indexes stops and legs[k] is the km driven to reach the
+    k-th stop in order, plus the drive back when return_to_start.
+    """
+    if not stops:
+        return [], []
+
+    nodes = [start] + list(stops)
+    if return_to_start:
+        nodes.append(start)
+    matrix = distance_matrix(tuple(coordinate for node in nodes for coordinate in node))
+
+    if return_to_start:
+        # The closing depot node goes last whatever nearest neighbour picks
+        order = nearest_neighbour(matrix[:-1, :-1]) + [len(nodes) - 1]
+    else:
+        order = nearest_neighbour(matrix)
+    order = two_opt(order, matrix, fixed_end=return_to_start)
+
+    legs = [float(matrix[order[k], order[k + 1]]) for k in range(len(order) - 1)]
+    visits = [node - 1 for node in order[1:len(order) - (1 if return_to_start else 0)]]
+    return visits, legs
+
+
+def plan_legs(start, stops, return_to_start=False):
+    """km of each leg when stops are visited in the given order"""
+    path = [start] + list(stops) + ([start] if return_to_start and stops else [])
+    return [haversine_km(*path[k], *path[k + 1]) for k in range(len(path) - 1)]
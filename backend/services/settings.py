@@ -0,0 +1,124 @@
+import threading
+import time
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, SystemSetting, SettingsVersion
+
+# Thresholds read through settings_store.number(); a system_settings row
+# with the same key overrides the default
+DEFAULTS = {
+    'quality_ph_min': 6.5,
+    'quality_ph_max': 8.5,
+    'quality_turbidity_max': 5,
+    'quality_chlorine_min': 0.2,
+    'quality_chlorine_max': 4,
+    'quality_ph_penalty': 20,
+    'quality_turbidity_penalty': 15,
+    'quality_chlorine_penalty': 10,
+    'quality_ecoli_penalty': 30,
+    'quality_safe_score': 70,
+    'health_overdue_task_penalty': 10,
+    'health_critical_alert_penalty': 20,
+    'health_availability_excellent': 95,
+    'health_availability_good': 85,
+    'health_score_excellent': 90,
+    'health_score_good': 70,
+}
+
+
+class SettingsStore:
+    """
+    The system_settings table held in memory.
+
+    Reads are dict lookups. At most every SETTINGS_POLL_INTERVAL seconds a
+    read also fetches the settings_version row by primary key, and the table
+    is reloaded only when that number moved. Routes that change settings
+    call bump() in the same transaction, so every worker process sees the
+    change within the interval, and expire() after the commit so this one
+    sees it on the next read.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.poll_interval = 5
+        self.version = None
+        self._rows = []
+        self._values = {}
+        self._numbers = {}
+        self._checked_at = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.poll_interval = app.config.get('SETTINGS_POLL_INTERVAL', 5)
+        # Load from this app's database on the first read
+        self.version = None
+        self._checked_at = None
+        app.extensions['settings_store'] = self
+
+    def get(self, key, default=None):
+        """Stored string value of key"""
+        self._refresh()
+        return self._values.get(key, default)
+
+    def number(self, key):
+        """key as a float, falling back to DEFAULTS when it is unset or not a number"""
+        self._refresh()
+        numbers = self._numbers
+        if key not in numbers:
+            try:
+                numbers[key] = float(self._values[key])
+            except (KeyError, TypeError, ValueError):
+                numbers[key] = float(DEFAULTS[key])
+        return numbers[key]
+
+    def values(self):
+        """{key: value} of every stored setting"""
+        self._refresh()
+        return dict(self._values)
+
+    def rows(self):
+        """SystemSetting.to_dict() of every stored setting"""
+        self._refresh()
+        return list(self._rows)
+
+    def _refresh(self):
+        if not self._stale():
+            return
+        with self._lock:
+            if not self._stale():
+                return
+            version = db.session.query(SettingsVersion.version).filter(SettingsVersion.id == 1).scalar() or 0
+            # Read before the rows, so a change in between is picked up on the next poll
+            if version != self.version:
+                self._load(version)
+            self._checked_at = time.monotonic()
+
+    def _stale(self):
+        checked_at = self._checked_at
+        return checked_at is None or time.monotonic() - checked_at >= self.poll_interval
+
+    def _load(self, version):
+        settings = SystemSetting.query.order_by(SystemSetting.id).all()
+        self._rows = [setting.to_dict() for setting in settings]
+        self._values = {setting.key: setting.value for setting in settings}
+        self._numbers = {}
+        self.version = version
+
+    def bump(self):
+        """Add a settings_version increment to the session; the caller commits"""
+        dialect = postgresql if db.session.get_bind().dialect.name == 'postgresql' else sqlite
+        table = SettingsVersion.__table__
+        statement = dialect.insert(table).values(id=1, version=1)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=['id'], set_={'version': table.c.version + 1}))
+
+    def expire(self):
+        """Poll the version on the next read"""
+        self._checked_at = None
+
+
+settings_store = SettingsStore()
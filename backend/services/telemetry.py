@@ -0,0 +1,107 @@
+import math
+from datetime import datetime
+
+from models import db, WaterPoint, SensorReading
+from services.buffered import BufferedWriter
+from services.bulk import existing_ids
+from services.export import parse_date
+
+SENSOR_TYPES = ('flow', 'ph', 'pressure', 'turbidity', 'chlorine', 'temperature')
+
+
+class TelemetryBackpressure(Exception):
+    """Raised when the ingest buffer cannot take another batch"""
+
+
+def validate_readings(readings):
+    """
+    Check a list of raw reading dicts. Returns (rows, errors) where rows are
+    ready for insertion and errors are 'Reading N: message' strings.
+    """
+    rows = []
+    errors = []
+    candidates = []
+
+    for index, reading in enumerate(readings):
+        if not isinstance(reading, dict):
+            errors.append((index, 'must be an object'))
+            continue
+
+        sensor_type = reading.get('sensor_type')
+        value = reading.get('value')
+        water_point_id = reading.get('water_point_id')
+
+        if sensor_type not in SENSOR_TYPES:
+            errors.append((index, f'sensor_type must be one of {", ".join(SENSOR_TYPES)}'))
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            errors.append((index, 'value must be a finite number'))
+            continue
+        if isinstance(water_point_id, bool) or not isinstance(water_point_id, int):
+            errors.append((index, 'water_point_id must be an integer'))
+            continue
+        try:
+            timestamp = parse_date(reading.get('timestamp')) or datetime.utcnow()
+        except (AttributeError, TypeError, ValueError):
+            errors.append((index, 'invalid timestamp'))
+            continue
+
+        candidates.append((index, {
+            'water_point_id': water_point_id,
+            'sensor_type': sensor_type,
+            'timestamp': timestamp,
+            'value': float(value)
+        }))
+
+    # One lookup per distinct water point instead of one per reading
+    known = existing_ids(WaterPoint, {row['water_point_id'] for _, row in candidates})
+    for index, row in candidates:
+        if row['water_point_id'] in known:
+            rows.append(row)
+        else:
+            errors.append((index, f"water point {row['water_point_id']} not found"))
+
+    return rows, [f'Reading {index}: {message}' for index, message in sorted(errors)]
+
+
+class TelemetryBuffer(BufferedWriter):
+    """
+    Buffers SensorReading rows in memory and writes them with bulk INSERTs.
+
+    A background thread flushes once TELEMETRY_BATCH_SIZE readings are pending
+    or every TELEMETRY_FLUSH_INTERVAL seconds. When TELEMETRY_MAX_PENDING
+    readings are already waiting, add() raises TelemetryBackpressure so
+    gateways back off instead of growing the buffer without bound.
+    """
+
+    def __init__(self, app=None):
+        super().__init__(SensorReading, 'telemetry-writer', 'TELEMETRY', batch_size=5000, flush_interval=1.0,
+                         max_pending=100000, app=app)
+
+    def init_app(self, app):
+        super().init_app(app)
+        app.extensions['telemetry_buffer'] = self
+
+    def add(self, rows):
+        """Queue validated reading rows, or write them now with TELEMETRY_SYNC"""
+        if not rows:
+            return 0
+
+        if self.sync:
+            self.insert(rows)
+            db.session.commit()
+            return len(rows)
+
+        with self._lock:
+            if len(self._pending) + len(rows) > self.max_pending:
+                raise TelemetryBackpressure('Telemetry buffer is full')
+            self._pending.extend(rows)
+            depth = len(self._pending)
+
+        if depth >= self.batch_size:
+            self._wakeup.set()
+        self._ensure_worker()
+        return len(rows)
+
+
+telemetry_buffer = TelemetryBuffer()
@@ -0,0 +1,119 @@
+from datetime import datetime, time
+
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, WaterUsage, DailyUsage, DailyUsageUser
+
+
+def _upsert(connection, table):
+    dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+    return dialect.insert(table)
+
+
+def apply_usage(connection, rows):
+    """
+    Add WaterUsage rows (dicts with water_point_id, user_id, amount, cost and
+    timestamp) to the daily rollup on connection.
+
+    The ORM does this automatically on flush; call it directly alongside any
+    Core bulk INSERT into water_usage.
+    """
+    totals = {}
+    users = set()
+    for row in rows:
+        key = (row['water_point_id'], (row['timestamp'] or datetime.utcnow()).date())
+        liters, cost, events = totals.get(key, (0, 0, 0))
+        totals[key] = (liters + row['amount'], cost + row['cost'], events + 1)
+        users.add(key + (row['user_id'],))
+
+    if not totals:
+        return
+
+    table = DailyUsage.__table__
+    statement = _upsert(connection, table)
+    statement = statement.on_conflict_do_update(
+        index_elements=['water_point_id', 'day'],
+        set_={
+            'total_liters': table.c.total_liters + statement.excluded.total_liters,
+            'total_cost': table.c.total_cost + statement.excluded.total_cost,
+            'event_count': table.c.event_count + statement.excluded.event_count
+        }
+    )
+    connection.execute(statement, [
+        {'water_point_id': water_point_id, 'day': day, 'total_liters': liters,
+         'total_cost': cost, 'event_count': events, 'distinct_users': 0}
+        for (water_point_id, day), (liters, cost, events) in totals.items()
+    ])
+
+    users_table = DailyUsageUser.__table__
+    connection.execute(
+        _upsert(connection, users_table).on_conflict_do_nothing(),
+        [{'water_point_id': water_point_id, 'day': day, 'user_id': user_id}
+         for water_point_id, day, user_id in users]
+    )
+
+    # Recount only the (water point, day) pairs touched by this batch
+    user_count = db.select(db.func.count()).where(
+        users_table.c.water_point_id == table.c.water_point_id,
+        users_table.c.day == table.c.day
+    ).scalar_subquery()
+    connection.execute(
+        table.update().where(
+            table.c.water_point_id == db.bindparam('_water_point_id'),
+            table.c.day == db.bindparam('_day')
+        ).values(distinct_users=user_count),
+        [{'_water_point_id': water_point_id, '_day': day} for water_point_id, day in totals]
+    )
+
+
+def _rollup_new_usage(session, flush_context):
+    rows = [
+        {'water_point_id': usage.water_point_id, 'user_id': usage.user_id,
+         'amount': usage.amount, 'cost': usage.cost, 'timestamp': usage.timestamp}
+        for usage in session.new if isinstance(usage, WaterUsage)
+    ]
+    if rows:
+        apply_usage(session.connection(), rows)
+
+
+def init_app(app):
+    """Keep daily_usage in step with WaterUsage rows added through the ORM session"""
+    if not event.contains(db.session, 'after_flush', _rollup_new_usage):
+        event.listen(db.session, 'after_flush', _rollup_new_usage)
+
+
+def rebuild_daily_usage(since=None):
+    """
+    Recompute the rollup from water_usage, for every day or from since (a date)
+    onwards. Returns the number of rollup rows written.
+    """
+    usage = WaterUsage.__table__
+    day = db.func.date(usage.c.timestamp)
+    filters = [usage.c.timestamp.isnot(None)]
+
+    if since:
+        filters.append(usage.c.timestamp >= datetime.combine(since, time.min))
+        db.session.execute(db.delete(DailyUsage).where(DailyUsage.day >= since))
+        db.session.execute(db.delete(DailyUsageUser).where(DailyUsageUser.day >= since))
+    else:
+        db.session.execute(db.delete(DailyUsage))
+        db.session.execute(db.delete(DailyUsageUser))
+
+    result = db.session.execute(DailyUsage.__table__.insert().from_select(
+        ['water_point_id', 'day', 'total_liters', 'total_cost', 'event_count', 'distinct_users'],
+        db.select(
+            usage.c.water_point_id,
+            day,
+            db.func.sum(usage.c.amount),
+            db.func.sum(usage.c.cost),
+            db.func.count(),
+            db.func.count(db.distinct(usage.c.user_id))
+        ).where(*filters).group_by(usage.c.water_point_id, day)
+    ))
+    db.session.execute(DailyUsageUser.__table__.insert().from_select(
+        ['water_point_id', 'day', 'user_id'],
+        db.select(usage.c.water_point_id, day, usage.c.user_id).where(*filters).distinct()
+    ))
+    db.session.commit()
+    return result.rowcount
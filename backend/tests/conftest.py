@@ -0,0 +1,77 @@
+import os
+import sys
+from itertools import count
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from models import db, User  # noqa: E402
+
+_serial = count(1)
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def file_app(tmp_path, monkeypatch):
+    """App on an SQLite file, for code that uses the database from other threads"""
+    from config import TestingConfig
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'test.db'}")
+    app = create_app('testing')
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    """Factory for committed users; every one gets password secret123"""
+    def make(role='admin', **fields):
+        number = next(_serial)
+        user = User(email=f'{role}{number}@example.com', full_name=f'Test {role}', phone_number='0712345678',
+                    location='Garissa', community='Township', role=role, national_id=f'ID{number}',
+                    emergency_contact='Contact', emergency_phone='0700000000', **fields)
+        user.set_password('secret123')
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make
+
+
+@pytest.fixture
+def auth_headers(app):
+    """Authorization headers for a user, with the claims /api/auth/login puts in tokens"""
+    from services.auth import issue_access_token
+
+    def headers(user):
+        with app.test_request_context():
+            token = issue_access_token(user.id, user.role, user.is_active, user.token_version)
+        return {'Authorization': f'Bearer {token}'}
+    return headers
+
+
+@pytest.fixture
+def statements(app):
+    """List that collects every SQL statement executed while the test runs"""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(db.engine, 'before_cursor_execute', record)
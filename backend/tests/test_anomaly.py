@@ -0,0 +1,128 @@
+import re
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from models import db, Alert, WaterPoint
+from services.anomaly import AnomalyDetector
+
+# Flow's standard deviation floor: 1% of its 20-80 L/min normal range
+FLOW_MIN_STD = 0.6
+
+AVERAGE = re.compile(r'recent average of (-?[\d.]+) L/min \(± ([\d.]+),')
+
+
+@pytest.fixture
+def detector(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'ANOMALY_WINDOW', 1000)
+    monkeypatch.setitem(app.config, 'ANOMALY_Z_THRESHOLD', 3.0)
+    monkeypatch.setitem(app.config, 'ANOMALY_MIN_SAMPLES', 5)
+    monkeypatch.setitem(app.config, 'ANOMALY_ALERT_COOLDOWN', 0)
+    return AnomalyDetector(app)
+
+
+def reading(value, sensor_type='flow', water_point_id=1):
+    return {'water_point_id': water_point_id, 'sensor_type': sensor_type, 'value': value,
+            'timestamp': datetime(2026, 10, 1, 12, 0)}
+
+
+def test_outliers_match_a_hand_computed_rolling_z_score(detector):
+    values = [50, 52, 49, 51, 50, 48, 53, 50, 70, 51, 49, 30, 50, 52, 50.4, 68]
+
+    flagged = []
+    for index, value in enumerate(values):
+        alerts = detector.observe([reading(value)])
+        if alerts:
+            flagged.append(index)
+            expected, spread = map(float, AVERAGE.search(alerts[0]['description']).groups())
+            history = np.array(values[:index])
+            # The description rounds to two decimals
+            assert expected == pytest.approx(history.mean(), abs=0.006)
+            assert spread == pytest.approx(max(history.std(), FLOW_MIN_STD), abs=0.006)
+
+    # z against every earlier reading: mean and population standard deviation
+    hand = []
+    for index in range(5, len(values)):
+        history = np.array(values[:index])
+        z = abs(values[index] - history.mean()) / max(history.std(), FLOW_MIN_STD)
+        if z > 3.0:
+            hand.append(index)
+    assert hand == [8, 11]
+    assert flagged == hand
+
+
+def test_batches_give_the_same_statistics_as_single_readings(app, detector):
+    values = [41.0, 45.5, 39.0, 44.0, 40.5, 43.0, 42.0, 38.5]
+    single = AnomalyDetector(app)
+    for value in values:
+        single.observe([reading(value)])
+    detector.observe([reading(value) for value in values])
+
+    probe = [reading(90.0)]
+    assert detector.observe(probe)[0]['description'] == single.observe(probe)[0]['description']
+
+
+def test_steady_sensor_uses_the_standard_deviation_floor(detector):
+    detector.observe([reading(50.0) for _ in range(10)])
+
+    # 1.5 L/min off a perfectly flat history is 2.5 floors away, not infinitely many
+    assert detector.observe([reading(51.5)]) == []
+    alerts = detector.observe([reading(52.5)])
+    assert AVERAGE.search(alerts[0]['description']).groups() == ('50.14', '0.60')
+
+
+def test_no_outliers_before_min_samples(detector):
+    assert detector.observe([reading(value) for value in (50, 50, 50, 50)]) == []
+    assert detector.observe([reading(70)]) == []
+
+
+def test_statistics_are_kept_per_water_point_and_sensor(detector):
+    detector.observe([reading(50, water_point_id=1) for _ in range(10)] +
+                     [reading(7.0, 'ph', water_point_id=1) for _ in range(10)] +
+                     [reading(70, water_point_id=2) for _ in range(10)])
+
+    assert detector.observe([reading(70, water_point_id=2)]) == []
+    assert detector.observe([reading(7.0, 'ph')]) == []
+    assert len(detector.observe([reading(70, water_point_id=1)])) == 1
+
+
+def test_window_makes_old_readings_decay(app, detector, monkeypatch):
+    monkeypatch.setitem(app.config, 'ANOMALY_WINDOW', 10)
+    detector = AnomalyDetector(app)
+    for value in [30.0] * 200 + [60.0] * 200:
+        detector.observe([reading(value)])
+
+    # Each reading past the window weighs 1/11, so the mean is 60 - 30 * (10 / 11) ** 201
+    assert detector.observe([reading(60.0)]) == []
+    alerts = detector.observe([reading(30.0)])
+    assert float(AVERAGE.search(alerts[0]['description']).group(1)) == pytest.approx(60.0, abs=0.01)
+
+
+def test_threshold_breaches_alert_from_the_first_reading(detector):
+    alerts = detector.observe([reading(100.0), reading(2.0, 'ph', water_point_id=2)])
+
+    assert [(alert['title'], alert['type'], alert['priority']) for alert in alerts] == [
+        ('High Flow reading at water point 1', 'infrastructure', 'high'),
+        ('Low pH reading at water point 2', 'quality', 'critical'),
+    ]
+
+
+def test_cooldown_limits_alerts_per_sensor_and_kind(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'ANOMALY_ALERT_COOLDOWN', 1800)
+    detector = AnomalyDetector(app)
+
+    assert len(detector.observe([reading(100.0)])) == 1
+    assert detector.observe([reading(100.0)]) == []
+    assert len(detector.observe([reading(100.0, water_point_id=2)])) == 1
+
+
+def test_process_raises_coalesced_alerts(detector):
+    db.session.add(WaterPoint(name='Borehole 1', type='borehole', region='Garissa', location='Township',
+                              latitude=-0.45, longitude=39.65))
+    db.session.commit()
+
+    assert detector.process([reading(100.0), reading(10.0)]) == 1
+    alert = Alert.query.one()
+    assert alert.occurrences == 2
+    assert alert.water_point_id == 1
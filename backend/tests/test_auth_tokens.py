@@ -0,0 +1,144 @@
+from flask_jwt_extended import create_access_token
+
+from models import db, Admin
+from services.identity import identity_cache
+
+STATS = '/api/dashboard/stats'
+ADMIN_OVERVIEW = '/api/admin/dashboard/overview'
+
+
+def bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def admin_account_token(client):
+    response = client.post('/api/users/admin/login',
+                           json={'email': 'admin@watermanagement.com', 'password': 'admin123'})
+    assert response.status_code == 200
+    return response.get_json()['token']
+
+
+def legacy_token(app, user_id):
+    """Token as issued before role, active and version claims were added"""
+    with app.test_request_context():
+        return create_access_token(identity=str(user_id))
+
+
+def test_token_works_until_update_user_changes_the_role(client, make_user, auth_headers):
+    admin = make_user('admin')
+    user = make_user('community_member')
+    old = auth_headers(user)
+    assert client.get(STATS, headers=old).status_code == 200
+
+    response = client.put(f'/api/admin/user-management/{user.id}', json={'role': 'technician'},
+                          headers=auth_headers(admin))
+    assert response.status_code == 200
+
+    assert client.get(STATS, headers=old).status_code == 401
+    db.session.refresh(user)
+    assert user.token_version == 1
+    assert client.get(STATS, headers=auth_headers(user)).status_code == 200
+
+
+def test_update_user_deactivation_revokes_tokens(client, make_user, auth_headers):
+    admin = make_user('admin')
+    user = make_user('community_member')
+    old = auth_headers(user)
+
+    client.put(f'/api/admin/user-management/{user.id}', json={'is_active': False}, headers=auth_headers(admin))
+
+    assert client.get(STATS, headers=old).status_code == 401
+    # A token carrying the new version is still refused while the account is inactive
+    db.session.refresh(user)
+    assert client.get(STATS, headers=auth_headers(user)).status_code == 401
+
+
+def test_update_user_without_role_or_active_keeps_tokens(client, make_user, auth_headers):
+    admin = make_user('admin')
+    user = make_user('community_member')
+    old = auth_headers(user)
+
+    client.put(f'/api/admin/user-management/{user.id}', json={}, headers=auth_headers(admin))
+
+    assert client.get(STATS, headers=old).status_code == 200
+
+
+def test_toggle_user_active_revokes_tokens(client, make_user, auth_headers):
+    user = make_user('community_member')
+    old = auth_headers(user)
+    admin = bearer(admin_account_token(client))
+
+    response = client.put(f'/api/users/admin/users/{user.id}/toggle-active', headers=admin)
+    assert response.status_code == 200
+
+    assert client.get(STATS, headers=old).status_code == 401
+    assert client.get('/api/users/profile', headers=old).status_code == 401
+
+    # Reactivating bumps the version again, so the old token stays revoked
+    client.put(f'/api/users/admin/users/{user.id}/toggle-active', headers=admin)
+    assert client.get(STATS, headers=old).status_code == 401
+    db.session.refresh(user)
+    assert user.token_version == 2
+    assert client.get(STATS, headers=auth_headers(user)).status_code == 200
+
+
+def test_token_without_version_claim_uses_the_account_row(app, client, make_user):
+    user = make_user('community_member')
+    token = bearer(legacy_token(app, user.id))
+    assert client.get(STATS, headers=token).status_code == 200
+    assert client.get(ADMIN_OVERVIEW, headers=token).status_code == 403
+
+    user.role = 'admin'
+    db.session.commit()
+    identity_cache.invalidate(user.id)
+
+    # The role is read from the account, not from claims the token lacks
+    assert client.get(ADMIN_OVERVIEW, headers=token).status_code == 200
+
+
+def test_token_without_version_claim_is_not_revoked_by_version_bump(app, client, make_user, auth_headers):
+    admin = make_user('admin')
+    user = make_user('community_member')
+    token = bearer(legacy_token(app, user.id))
+
+    client.put(f'/api/admin/user-management/{user.id}', json={'role': 'technician'}, headers=auth_headers(admin))
+
+    assert client.get(STATS, headers=token).status_code == 200
+
+
+def test_admin_account_token_is_not_a_user_token(client, make_user):
+    # Admin account 1 and user 1 share the token subject
+    user = make_user('community_member')
+    admin = Admin.query.filter_by(email='admin@watermanagement.com').one()
+    assert str(admin.id) == str(user.id)
+
+    token = bearer(admin_account_token(client))
+    response = client.get(STATS, headers=token)
+    assert response.status_code == 401
+    assert response.get_json()['error'] == 'Invalid token'
+    assert client.get(ADMIN_OVERVIEW, headers=token).status_code == 200
+
+
+def test_user_token_is_not_an_admin_token(client, make_user, auth_headers):
+    user = make_user('community_member')
+    target = make_user('technician')
+    headers = auth_headers(user)
+
+    assert client.get(ADMIN_OVERVIEW, headers=headers).status_code == 403
+    assert client.get('/api/users/admin/users', headers=headers).status_code == 403
+    response = client.put(f'/api/users/admin/users/{target.id}/toggle-active', headers=headers)
+    assert response.status_code == 403
+    db.session.refresh(target)
+    assert target.is_active and target.token_version == 0
+
+
+def test_revocation_is_per_account_kind(client, make_user, auth_headers):
+    user = make_user('community_member')
+    admin = Admin.query.filter_by(email='admin@watermanagement.com').one()
+    assert str(admin.id) == str(user.id)
+    admin_token = bearer(admin_account_token(client))
+
+    # Revoking user 1 leaves admin account 1's token alone
+    client.put(f'/api/users/admin/users/{user.id}/toggle-active', headers=admin_token)
+    assert client.get(STATS, headers=auth_headers(user)).status_code == 401
+    assert client.get(ADMIN_OVERVIEW, headers=admin_token).status_code == 200
@@ -0,0 +1,157 @@
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import services.buffered
+from models import db, AuditLog, SensorReading, WaterPoint
+from services.audit import audit_writer
+from services.telemetry import telemetry_buffer, TelemetryBackpressure
+
+
+@pytest.fixture
+def writers(file_app, monkeypatch):
+    """Both writers on the background path, with small batches"""
+    for writer in (audit_writer, telemetry_buffer):
+        monkeypatch.setattr(writer, 'sync', False)
+        monkeypatch.setattr(writer, 'batch_size', 5)
+        monkeypatch.setattr(writer, 'flush_interval', 0.05)
+        monkeypatch.setattr(writer, 'max_pending', 50)
+        writer.flush()
+        writer.dropped_total = 0
+    yield
+    for writer in (audit_writer, telemetry_buffer):
+        writer.flush()
+
+
+@pytest.fixture
+def water_point_id(file_app):
+    water_point = WaterPoint(name='Borehole 1', type='borehole', region='Garissa', location='Township',
+                             latitude=-0.45, longitude=39.65)
+    db.session.add(water_point)
+    db.session.commit()
+    return water_point.id
+
+
+def reading(water_point_id, value, **fields):
+    row = {'water_point_id': water_point_id, 'sensor_type': 'ph', 'timestamp': datetime.utcnow(), 'value': value}
+    row.update(fields)
+    return row
+
+
+def audit(number, **fields):
+    record = {'user_id': 1, 'action': 'UPDATE', 'resource': 'WATER_POINT', 'resource_id': number}
+    record.update(fields)
+    return record
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def stored(model):
+    db.session.remove()
+    return model.query.count()
+
+
+def test_background_thread_writes_audit_records(writers):
+    for number in range(12):
+        audit_writer.record(**audit(number))
+
+    assert audit_writer._worker.name == 'audit-writer'
+    assert wait_for(lambda: stored(AuditLog) == 12)
+    assert audit_writer.queue_depth == 0
+
+
+def test_background_thread_writes_readings(writers, water_point_id):
+    assert telemetry_buffer.add([reading(water_point_id, 7.0 + step / 10) for step in range(8)]) == 8
+
+    assert telemetry_buffer._worker.name == 'telemetry-writer'
+    assert wait_for(lambda: stored(SensorReading) == 8)
+
+
+def test_bad_row_is_dropped_and_the_rest_written(writers, water_point_id, monkeypatch):
+    monkeypatch.setattr(telemetry_buffer, 'flush_interval', 60)
+    monkeypatch.setattr(telemetry_buffer, 'batch_size', 100)
+    rows = [reading(water_point_id, float(step)) for step in range(9)]
+    rows[4]['sensor_type'] = None
+    telemetry_buffer._pending.extend(rows)
+
+    assert telemetry_buffer.flush() == 8
+    assert telemetry_buffer.dropped_total == 1
+    assert telemetry_buffer.queue_depth == 0
+    values = [value for value, in db.session.query(SensorReading.value).order_by(SensorReading.id)]
+    assert values == [0.0, 1.0, 2.0, 3.0, 5.0, 6.0, 7.0, 8.0]
+
+    # The bad row is gone, so later flushes are not held up by it
+    telemetry_buffer._pending.append(reading(water_point_id, 9.0))
+    assert telemetry_buffer.flush() == 1
+
+
+def test_unreachable_database_keeps_rows_queued(writers, monkeypatch):
+    monkeypatch.setattr(audit_writer, 'flush_interval', 60)
+    audit_writer._pending.extend([audit(number) for number in range(3)])
+
+    def locked(rows):
+        raise OperationalError('INSERT', {}, Exception('database is locked'))
+
+    with monkeypatch.context() as patch:
+        patch.setattr(audit_writer, 'insert', locked)
+        assert audit_writer.flush() == 0
+    assert audit_writer.queue_depth == 3
+    assert audit_writer.dropped_total == 0
+
+    assert audit_writer.flush() == 3
+    assert stored(AuditLog) == 3
+
+
+def test_telemetry_refuses_readings_over_max_pending(writers, water_point_id, monkeypatch):
+    monkeypatch.setattr(telemetry_buffer, 'batch_size', 1000)
+    monkeypatch.setattr(telemetry_buffer, 'flush_interval', 60)
+    monkeypatch.setattr(telemetry_buffer, '_ensure_worker', lambda: None)
+    telemetry_buffer.add([reading(water_point_id, 7.0)] * 40)
+
+    with pytest.raises(TelemetryBackpressure):
+        telemetry_buffer.add([reading(water_point_id, 7.0)] * 11)
+    assert telemetry_buffer.queue_depth == 40
+
+
+def test_audit_flushes_inline_at_max_pending(writers, monkeypatch):
+    monkeypatch.setattr(audit_writer, 'batch_size', 1000)
+    monkeypatch.setattr(audit_writer, '_ensure_worker', lambda: None)
+    for number in range(49):
+        audit_writer.record(**audit(number))
+    assert audit_writer.queue_depth == 49
+
+    audit_writer.record(**audit(49))
+    assert audit_writer.queue_depth == 0
+    assert stored(AuditLog) == 50
+
+
+def test_durable_record_is_committed_before_returning(writers, monkeypatch):
+    monkeypatch.setattr(audit_writer, '_ensure_worker', lambda: None)
+    audit_writer.record(durable=True, **audit(1, action='CHANGE_PASSWORD'))
+
+    assert audit_writer.queue_depth == 0
+    assert stored(AuditLog) == 1
+
+
+def test_pending_rows_are_drained_at_shutdown(file_app, monkeypatch):
+    registered = []
+    monkeypatch.setattr(services.buffered.atexit, 'register', registered.append)
+    audit_writer.init_app(file_app)
+    monkeypatch.setattr(audit_writer, 'sync', False)
+    monkeypatch.setattr(audit_writer, '_ensure_worker', lambda: None)
+    for number in range(3):
+        audit_writer.record(**audit(number))
+
+    assert audit_writer.flush in registered
+    for callback in registered:
+        callback()
+    assert stored(AuditLog) == 3
@@ -0,0 +1,114 @@
+import pytest
+
+from models import db, WaterPoint
+from services.bulk import CHUNK_SIZE, bulk_update_by_ids, bulk_update_rows, chunked, existing_ids
+
+URL = '/api/admin/water-points/bulk-update'
+
+
+@pytest.fixture
+def water_point_ids(app):
+    """CHUNK_SIZE * 2 + 10 water points, so updates span three chunks"""
+    db.session.execute(db.insert(WaterPoint), [
+        {'name': f'Point {number}', 'type': 'borehole', 'region': 'Garissa', 'location': 'Township',
+         'latitude': -0.45, 'longitude': 39.65, 'status': 'active'}
+        for number in range(CHUNK_SIZE * 2 + 10)
+    ])
+    db.session.commit()
+    return [row.id for row in db.session.query(WaterPoint.id).order_by(WaterPoint.id)]
+
+
+def statuses():
+    return dict(db.session.query(WaterPoint.id, WaterPoint.status))
+
+
+def test_chunked_slices():
+    assert list(chunked(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(chunked([], 3)) == []
+
+
+def test_existing_ids_across_chunks(water_point_ids, statements):
+    wanted = water_point_ids + [0, -5, 10 ** 6]
+
+    assert existing_ids(WaterPoint, wanted) == set(water_point_ids)
+    assert len(statements) == 3
+
+
+def test_bulk_update_by_ids_updates_every_chunk(water_point_ids, statements):
+    updated = bulk_update_by_ids(WaterPoint, water_point_ids[5:], {'status': 'maintenance'})
+    db.session.commit()
+
+    assert updated == len(water_point_ids) - 5
+    assert len([statement for statement in statements if statement.startswith('UPDATE')]) == 3
+    current = statuses()
+    assert {current[water_point_id] for water_point_id in water_point_ids[:5]} == {'active'}
+    assert {current[water_point_id] for water_point_id in water_point_ids[5:]} == {'maintenance'}
+
+
+def test_bulk_update_rows_groups_rows_by_columns(water_point_ids, statements):
+    rows = ([{'id': water_point_id, 'status': 'inactive'} for water_point_id in water_point_ids[:CHUNK_SIZE + 1]] +
+            [{'id': water_point_ids[-1], 'status': 'maintenance', 'region': 'Dadaab'}])
+
+    updated = bulk_update_rows(WaterPoint, rows)
+    db.session.commit()
+
+    assert updated == CHUNK_SIZE + 2
+    # One executemany per chunk of each column group
+    assert len([statement for statement in statements if statement.startswith('UPDATE')]) == 3
+    current = statuses()
+    assert current[water_point_ids[CHUNK_SIZE]] == 'inactive'
+    assert current[water_point_ids[CHUNK_SIZE + 1]] == 'active'
+    last = db.session.get(WaterPoint, water_point_ids[-1])
+    assert (last.status, last.region) == ('maintenance', 'Dadaab')
+
+
+def test_route_updates_ids_and_reports_missing_ones(client, make_user, auth_headers, water_point_ids):
+    headers = auth_headers(make_user('admin'))
+
+    response = client.post(URL, json={'water_point_ids': water_point_ids + [10 ** 6, water_point_ids[0]],
+                                      'updates': {'status': 'inactive'}}, headers=headers)
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['matched_count'] == body['updated_count'] == len(water_point_ids)
+    assert body['missing_ids'] == [10 ** 6]
+    assert set(statuses().values()) == {'inactive'}
+
+
+def test_route_applies_per_row_values_last_row_winning(client, make_user, auth_headers, water_point_ids):
+    headers = auth_headers(make_user('admin'))
+    first, second = water_point_ids[:2]
+
+    response = client.post(URL, json={'rows': [
+        {'id': first, 'status': 'inactive'},
+        {'id': second, 'region': 'Dadaab'},
+        {'id': first, 'status': 'maintenance'},
+    ]}, headers=headers)
+
+    assert response.status_code == 200
+    assert response.get_json()['updated_count'] == 2
+    assert db.session.get(WaterPoint, first).status == 'maintenance'
+    assert db.session.get(WaterPoint, second).region == 'Dadaab'
+
+
+@pytest.mark.parametrize('payload, error', [
+    ({'water_point_ids': [1], 'updates': {'name': 'x'}}, 'Field name is not allowed for bulk update'),
+    ({'water_point_ids': ['1'], 'updates': {'status': 'x'}}, 'Water point IDs must be integers'),
+    ({'water_point_ids': [], 'updates': {'status': 'x'}}, 'No water point IDs provided'),
+    ({'water_point_ids': [1]}, 'No updates provided'),
+    ({'rows': [{'id': 1}]}, 'No updates provided for water point 1'),
+    ({'rows': [{'id': '1', 'status': 'x'}]}, 'Each row must be an object with an integer id'),
+    ({'rows': [{'id': 1, 'capacity': 5}]}, 'Field capacity is not allowed for bulk update'),
+])
+def test_route_rejects_bad_payloads(client, make_user, auth_headers, payload, error):
+    response = client.post(URL, json=payload, headers=auth_headers(make_user('admin')))
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == error
+
+
+def test_route_requires_an_admin(client, make_user, auth_headers):
+    response = client.post(URL, json={'water_point_ids': [1], 'updates': {'status': 'x'}},
+                           headers=auth_headers(make_user('technician')))
+
+    assert response.status_code == 403
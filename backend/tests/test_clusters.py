@@ -0,0 +1,131 @@
+import math
+import random
+from collections import Counter
+
+import pytest
+
+from models import db, WaterPoint
+from services.clusters import CELL_BITS, ClusterIndex, project
+
+
+def point(lat, lon, status='active', quality_score=80.0):
+    return {'latitude': lat, 'longitude': lon, 'status': status, 'qualityScore': quality_score}
+
+
+def random_points(seed, size):
+    rng = random.Random(seed)
+    return {water_point_id: point(rng.uniform(-3.0, 2.0), rng.uniform(38.0, 42.0),
+                                  rng.choice(['active', 'inactive', 'maintenance']), rng.uniform(0, 100))
+            for water_point_id in range(1, size + 1)}
+
+
+def grid(points, zoom):
+    """Cell -> water point ids, computed straight from the Web Mercator formula"""
+    scale = 2 ** (zoom + CELL_BITS)
+    cells = {}
+    for water_point_id, fields in points.items():
+        lat = math.radians(fields['latitude'])
+        x = (fields['longitude'] + 180) / 360
+        y = (1 - math.log(math.tan(lat) + 1 / math.cos(lat)) / math.pi) / 2
+        cells.setdefault((int(x * scale), int(y * scale)), []).append(water_point_id)
+    return cells
+
+
+def world(index, zoom):
+    return [cluster for cluster, _ in index.clusters(zoom, -85, -180, 85, 180)]
+
+
+def test_project_corners():
+    assert project(0, 0) == (0.5, 0.5)
+    assert project(0, -180) == (0.0, 0.5)
+    assert project(90, 0)[1] == 0.0
+    assert project(-90, 179.99)[1] == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize('zoom', [0, 3, 6, 9, 12, 16])
+def test_clusters_match_the_grid(zoom):
+    points = random_points(1, 300)
+    index = ClusterIndex()
+    index.sync(points)
+
+    expected = sorted((len(ids), round(sum(points[i]['latitude'] for i in ids) / len(ids), 6))
+                      for ids in grid(points, zoom).values())
+    found = sorted((cluster.count, cluster.to_dict()['latitude']) for cluster in world(index, zoom))
+    assert found == expected
+
+
+def test_cluster_totals():
+    points = {1: point(-0.45, 39.65, 'active', 80.0), 2: point(-0.451, 39.651, 'inactive', None),
+              3: point(-0.452, 39.652, 'active', 60.0)}
+    index = ClusterIndex()
+    index.sync(points)
+
+    [cluster] = world(index, 5)
+    assert cluster.to_dict() == {'latitude': -0.451, 'longitude': 39.651, 'count': 3,
+                                 'statuses': {'active': 2, 'inactive': 1}, 'avg_quality_score': 70.0}
+
+
+def test_moving_and_removing_points_touches_their_cells_only():
+    points = random_points(2, 200)
+    index = ClusterIndex()
+    index.sync(points)
+
+    moved = dict(points)
+    moved[5] = point(1.9, 41.9)
+    moved[6] = dict(points[6], status='archived')
+    del moved[7]
+    index.sync(moved)
+
+    assert len(index) == 198
+    live = {key: value for key, value in moved.items() if value['status'] != 'archived'}
+    for zoom in (2, 8, 14):
+        assert sorted(cluster.count for cluster in world(index, zoom)) == \
+            sorted(len(ids) for ids in grid(live, zoom).values())
+        statuses = Counter()
+        for cluster in world(index, zoom):
+            statuses.update(cluster.statuses)
+        assert statuses == Counter(value['status'] for value in live.values())
+
+
+def test_single_point_cluster_carries_its_id():
+    index = ClusterIndex()
+    index.sync({42: point(-0.45, 39.65), 43: point(1.5, 41.5)})
+
+    assert sorted(cluster.id_sum for cluster in world(index, 10) if cluster.count == 1) == [42, 43]
+
+
+def test_box_query_returns_cells_in_view():
+    index = ClusterIndex()
+    index.sync({1: point(-0.45, 39.65), 2: point(1.5, 41.5), 3: point(-16.5, 179.9), 4: point(-16.5, -179.9)})
+
+    assert [cluster.id_sum for cluster, _ in index.clusters(10, -1, 39, 0, 40)] == [1]
+    # A box crossing the antimeridian
+    assert sorted(cluster.id_sum for cluster, _ in index.clusters(10, -17, 179, -16, -179)) == [3, 4]
+
+
+def test_past_max_zoom_points_come_back_one_by_one():
+    index = ClusterIndex(max_zoom=4)
+    index.sync({1: point(-0.45, 39.65), 2: point(-0.45001, 39.65001), 3: point(5.0, 45.0)})
+
+    found = index.clusters(5, -1, 39, 0, 40)
+    assert sorted(member[0] for _, member in found) == [1, 2]
+    assert all(cluster is None for cluster, _ in found)
+
+
+def test_clusters_route(client, make_user, auth_headers):
+    for number, (lat, lon) in enumerate([(-0.45, 39.65), (-0.4501, 39.6501), (1.5, 41.5)]):
+        db.session.add(WaterPoint(name=f'Point {number}', type='borehole', region='Garissa', location='Township',
+                                  latitude=lat, longitude=lon, quality_score=90.0))
+    db.session.commit()
+    headers = auth_headers(make_user('community_member'))
+
+    response = client.get('/api/water-points/clusters?bbox=38,-3,42,2&zoom=8', headers=headers)
+
+    assert response.status_code == 200
+    clusters = sorted(response.get_json()['clusters'], key=lambda cluster: cluster['count'])
+    assert [cluster['count'] for cluster in clusters] == [1, 2]
+    assert clusters[0]['water_point']['name'] == 'Point 2'
+    assert 'water_point' not in clusters[1]
+
+    for query in ('bbox=1,2,3&zoom=4', 'bbox=38,-3,42,2&zoom=23', 'bbox=38,3,42,2&zoom=4'):
+        assert client.get(f'/api/water-points/clusters?{query}', headers=headers).status_code == 400
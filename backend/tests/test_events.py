@@ -0,0 +1,59 @@
+from collections import deque
+
+from services.events import EventBroadcaster
+
+
+def make_broadcaster(history=1000):
+    broadcaster = EventBroadcaster()
+    broadcaster.heartbeat = 0.01
+    broadcaster._history = deque(maxlen=history)
+    return broadcaster
+
+
+def test_event_published_before_first_next_is_delivered():
+    broadcaster = make_broadcaster()
+    stream = broadcaster.stream()
+    event_id = broadcaster.publish('alert', {'id': 1}, 'Garissa', 7)
+
+    assert next(stream) == 'retry: 3000\n\n'
+    assert next(stream).startswith(f'id: {event_id}\nevent: alert\n')
+    stream.close()
+    assert broadcaster.subscribers == 0
+
+
+def test_reconnect_replays_events_after_last_event_id():
+    broadcaster = make_broadcaster()
+    first = broadcaster.publish('sensor', {'n': 1})
+    second = broadcaster.publish('sensor', {'n': 2})
+    third = broadcaster.publish('sensor', {'n': 3})
+
+    stream = broadcaster.stream(last_event_id=first)
+    next(stream)
+    assert next(stream).startswith(f'id: {second}\n')
+    assert next(stream).startswith(f'id: {third}\n')
+    assert next(stream) == ': keepalive\n\n'
+    stream.close()
+
+
+def test_filters_skip_unwanted_events():
+    broadcaster = make_broadcaster()
+    stream = broadcaster.stream(regions={'Dadaab'}, types={'alert'})
+    broadcaster.publish('alert', {}, 'Garissa', 1)
+    broadcaster.publish('sensor', {}, 'Dadaab', 2)
+    wanted = broadcaster.publish('alert', {}, 'Dadaab', 3)
+
+    next(stream)
+    assert next(stream).startswith(f'id: {wanted}\nevent: alert\n')
+    stream.close()
+
+
+def test_client_behind_the_buffer_gets_reset():
+    broadcaster = make_broadcaster(history=2)
+    start = broadcaster.last_event_id
+    for number in range(5):
+        broadcaster.publish('sensor', {'n': number})
+
+    stream = broadcaster.stream(last_event_id=start)
+    next(stream)
+    assert next(stream).startswith(f'id: {broadcaster.last_event_id}\nevent: reset\n')
+    stream.close()
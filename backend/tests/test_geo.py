@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from models import db, WaterPoint
+from services.geo import (EARTH_RADIUS_KM, KM_PER_DEGREE_LAT, bounding_box, haversine_km, haversine_matrix,
+                          nearest)
+
+GARISSA = (-0.4532, 39.6461)
+
+
+@pytest.mark.parametrize('start, end, km, tolerance', [
+    # One degree along a meridian and along the equator
+    ((0.0, 0.0), (1.0, 0.0), 111.195, 0.001),
+    ((0.0, 0.0), (0.0, 1.0), 111.195, 0.001),
+    # Equator to pole, and halfway round the earth
+    ((0.0, 0.0), (90.0, 0.0), 10007.557, 0.001),
+    ((0.0, 0.0), (0.0, 180.0), 20015.114, 0.001),
+    ((1.0, 20.0), (-1.0, -160.0), 20015.114, 0.001),
+    # London to Paris, and LAX to JFK as worked in the Aviation Formulary
+    ((51.5074, -0.1278), (48.8566, 2.3522), 343.6, 0.5),
+    ((33.9425, -118.4081), (40.6398, -73.7789), 3974.0, 5.0),
+])
+def test_haversine_known_distances(start, end, km, tolerance):
+    assert haversine_km(*start, *end) == pytest.approx(km, abs=tolerance)
+    assert haversine_km(*end, *start) == pytest.approx(km, abs=tolerance)
+
+
+def test_haversine_same_point_is_zero():
+    assert haversine_km(*GARISSA, *GARISSA) == 0.0
+
+
+def test_haversine_matrix_matches_pairwise_distances():
+    rng = np.random.default_rng(7)
+    lats_a, lons_a = rng.uniform(-80, 80, 5), rng.uniform(-180, 180, 5)
+    lats_b, lons_b = rng.uniform(-80, 80, 3), rng.uniform(-180, 180, 3)
+
+    matrix = haversine_matrix(lats_a, lons_a, lats_b, lons_b)
+
+    assert matrix.shape == (5, 3)
+    for row in range(5):
+        for column in range(3):
+            assert matrix[row, column] == pytest.approx(
+                haversine_km(lats_a[row], lons_a[row], lats_b[column], lons_b[column]), rel=1e-12)
+
+
+@pytest.mark.parametrize('lat, lon, radius_km', [(-0.45, 39.65, 25), (60.0, 10.0, 300), (-45.0, 179.5, 100)])
+def test_bounding_box_encloses_the_circle(lat, lon, radius_km):
+    south, west, north, east = bounding_box(lat, lon, radius_km)
+
+    assert north - lat == pytest.approx(radius_km / KM_PER_DEGREE_LAT)
+    # Every point on the circle lies inside the box (destination point formula)
+    angle = radius_km / EARTH_RADIUS_KM
+    lat1 = np.radians(lat)
+    for bearing in np.radians(np.arange(0, 360, 5)):
+        lat2 = np.arcsin(np.sin(lat1) * np.cos(angle) + np.cos(lat1) * np.sin(angle) * np.cos(bearing))
+        lon2 = lon + np.degrees(np.arctan2(np.sin(bearing) * np.sin(angle) * np.cos(lat1),
+                                           np.cos(angle) - np.sin(lat1) * np.sin(lat2)))
+        assert haversine_km(lat, lon, np.degrees(lat2), lon2) == pytest.approx(radius_km)
+        assert south - 1e-9 <= np.degrees(lat2) <= north + 1e-9
+        assert west - 1e-9 <= lon2 <= east + 1e-9
+
+
+def test_bounding_box_near_the_pole_spans_every_longitude():
+    assert bounding_box(89.9, 0.0, 50) == (pytest.approx(89.9 - 50 / KM_PER_DEGREE_LAT), -180.0, 90.0, 180.0)
+
+
+def test_nearest_orders_by_distance_within_radius(app):
+    # Due north of Garissa at 5, 11 and 40 km, and one just across the antimeridian
+    for name, km in (('Far', 40), ('Near', 5), ('Middle', 11)):
+        db.session.add(WaterPoint(name=name, type='borehole', region='Garissa', location='Township',
+                                  latitude=GARISSA[0] + km / KM_PER_DEGREE_LAT, longitude=GARISSA[1]))
+    db.session.add(WaterPoint(name='Fiji', type='well', region='Other', location='Other',
+                              latitude=-16.5, longitude=-179.99))
+    db.session.commit()
+
+    found = nearest(WaterPoint.query, *GARISSA, radius_km=20, limit=5)
+    assert [(water_point.name, round(distance)) for water_point, distance in found] == [('Near', 5), ('Middle', 11)]
+    assert [water_point.name for water_point, _ in nearest(WaterPoint.query, *GARISSA, 50, 1)] == ['Near']
+
+    across = nearest(WaterPoint.query, -16.5, 179.99, radius_km=10, limit=5)
+    assert [water_point.name for water_point, _ in across] == ['Fiji']
@@ -0,0 +1,101 @@
+import io
+
+from models import db, WaterPoint
+from services.importer import WaterPointImporter, read_chunks
+
+HEADER = 'name,type,region,location,latitude,longitude,capacity,population_served,notes\n'
+
+
+def run_import(rows, chunk_size=3):
+    importer = WaterPointImporter()
+    for chunk in read_chunks(io.StringIO(HEADER + ''.join(rows)), 'points.csv', chunk_size):
+        importer.import_chunk(chunk)
+    return importer
+
+
+def test_bad_rows_are_reported_and_good_rows_inserted(app):
+    db.session.add(WaterPoint(name='Existing', type='borehole', region='Garissa', location='Township',
+                              latitude=-0.45, longitude=39.65))
+    db.session.commit()
+
+    importer = run_import([
+        'Borehole A,borehole,Garissa,Township,-0.45,39.65,5000,1200,ok\n',
+        'Borehole B,borehole,Garissa,Township,north,39.65,,,\n',
+        ',well,Garissa,Township,-0.45,39.65,,,\n',
+        'Borehole C,borehole,Garissa,Township,95,200,,,\n',
+        'Existing,borehole,Garissa,Township,-0.45,39.65,,,\n',
+        # Repeats the first row across the chunk boundary
+        'Borehole A,borehole,Garissa,Camp,-0.46,39.66,,,\n',
+        'Borehole A,borehole,Dadaab,Camp,0.05,40.3,100,lots,\n',
+        'Borehole D,well,Dadaab,Camp,0.05,,,,\n',
+        'Borehole E,pan,Dadaab,  ,0.06,40.31,,,\n',
+        '  Borehole F  ,pan,Dadaab,Camp,0.07,40.32,,,\n',
+    ])
+
+    assert importer.errors == [
+        'Row 2: latitude must be a number',
+        'Row 3: name is required',
+        'Row 4: latitude must be between -90 and 90; longitude must be between -180 and 180',
+        "Row 5: Water point 'Existing' already exists in Garissa",
+        "Row 6: Water point 'Borehole A' already exists in Garissa",
+        'Row 7: population_served must be a number',
+        'Row 8: longitude is required',
+        'Row 9: location is required',
+    ]
+    assert importer.imported_count == 2
+    assert importer.ignored_columns == {'notes'}
+
+    inserted = {water_point.name: water_point for water_point in
+                WaterPoint.query.filter(WaterPoint.name != 'Existing').all()}
+    assert sorted(inserted) == ['Borehole A', 'Borehole F']
+    assert inserted['Borehole A'].capacity == 5000
+    assert inserted['Borehole A'].population_served == 1200
+    assert inserted['Borehole F'].status == 'active'
+    assert inserted['Borehole F'].current_level == 0
+    assert inserted['Borehole F'].capacity is None
+
+
+def test_repeats_within_one_chunk_keep_the_first_valid_row(app):
+    importer = run_import([
+        'Kiosk,kiosk,Garissa,Township,north,39.65,,,\n',
+        'Kiosk,kiosk,Garissa,Market,-0.45,39.65,,,\n',
+        'Kiosk,kiosk,Garissa,Camp,-0.46,39.66,,,\n',
+    ], chunk_size=10)
+
+    assert importer.errors == [
+        'Row 1: latitude must be a number',
+        "Row 3: Water point 'Kiosk' appears more than once in Garissa",
+    ]
+    assert [water_point.location for water_point in WaterPoint.query.all()] == ['Market']
+
+
+def test_chunk_without_valid_rows_inserts_nothing(app, statements):
+    importer = run_import([',,,,,,,,\n', 'Pan,pan,Garissa,Township,x,y,,,\n'])
+
+    assert importer.imported_count == 0
+    assert len(importer.errors) == 2
+    assert not any(statement.startswith('INSERT') for statement in statements)
+
+
+def test_import_route_rejects_missing_columns(client, make_user, auth_headers):
+    upload = io.BytesIO(b'name,type,region\nKiosk,kiosk,Garissa\n')
+
+    response = client.post('/api/admin/water-points/import', data={'file': (upload, 'points.csv')},
+                           headers=auth_headers(make_user('admin')))
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == "Missing required columns: ['location', 'latitude', 'longitude']"
+
+
+def test_import_route_reports_bad_rows(client, make_user, auth_headers):
+    upload = io.BytesIO((HEADER + 'Kiosk,kiosk,Garissa,Market,-0.45,39.65,,,\n'
+                                  'Pan,pan,Garissa,Township,-0.45,,,,\n').encode())
+
+    response = client.post('/api/admin/water-points/import', data={'file': (upload, 'points.csv')},
+                           headers=auth_headers(make_user('admin')))
+
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body['imported_count'] == 1
+    assert body['errors'] == ['Row 2: longitude is required']
+    assert body['ignored_columns'] == ['notes']
@@ -0,0 +1,127 @@
+import logging
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app import create_app
+from models import db, WaterPoint, Alert, QualityCheck, SensorReading
+from services.events import broadcaster
+from services.live_state import latest_state
+
+
+@pytest.fixture
+def point(app):
+    water_point = WaterPoint(name='Borehole 1', type='borehole', region='Garissa', location='Township',
+                             latitude=-0.45, longitude=39.65, status='active')
+    db.session.add(water_point)
+    db.session.commit()
+    return water_point.id
+
+
+def published_since(event_id):
+    return [event.type for event in broadcaster._history if event.id > event_id]
+
+
+def test_commit_reloads_touched_point(point):
+    assert latest_state.snapshot(point).point['status'] == 'active'
+
+    db.session.get(WaterPoint, point).status = 'maintenance'
+    db.session.add(QualityCheck(water_point_id=point, checked_by='Inspector', ph_level=7.2, overall_score=95,
+                                is_safe=True, checked_at=datetime.utcnow()))
+    db.session.commit()
+
+    state = latest_state.snapshot(point)
+    assert state.point['status'] == 'maintenance'
+    assert len(state.quality_checks) == 1
+    assert state.sensors(0)['ph']['value'] == 7.2
+
+
+def test_new_point_appears_after_commit(point):
+    assert len(latest_state.snapshot()) == 1
+    db.session.add(WaterPoint(name='Borehole 2', type='borehole', region='Dadaab', location='Camp',
+                              latitude=0.05, longitude=40.3))
+    db.session.commit()
+
+    assert [state.point['name'] for state in latest_state.snapshot()] == ['Borehole 1', 'Borehole 2']
+
+
+def test_rollback_leaves_store_and_stream_untouched(point):
+    latest_state.snapshot()
+    last_event = broadcaster.last_event_id
+
+    db.session.get(WaterPoint, point).name = 'Renamed'
+    db.session.add(Alert(type='quality', title='Turbidity', description='High', water_point_id=point,
+                         priority='high', status='active'))
+    db.session.flush()
+    db.session.rollback()
+
+    assert 'latest_state_ids' not in db.session.info
+    assert not latest_state._stale
+    state = latest_state.snapshot(point)
+    assert state.point['name'] == 'Borehole 1'
+    assert state.alerts == []
+    assert published_since(last_event) == []
+
+    # A later commit does not publish the rolled-back alert
+    db.session.add(Alert(type='quality', title='Chlorine', description='Low', water_point_id=point,
+                         priority='medium', status='active'))
+    db.session.commit()
+    assert published_since(last_event).count('alert') == 1
+    assert [alert['title'] for alert in latest_state.snapshot(point).alerts] == ['Chlorine']
+
+
+def test_core_update_needs_explicit_invalidate(point):
+    latest_state.snapshot()
+    db.session.execute(db.update(WaterPoint).where(WaterPoint.id == point).values(status='offline'))
+    db.session.commit()
+
+    # Core statements skip the session's flush events
+    assert latest_state.snapshot(point).point['status'] == 'active'
+    latest_state.invalidate([point])
+    assert latest_state.snapshot(point).point['status'] == 'offline'
+
+
+def test_ingested_readings_are_applied_in_time_order(point):
+    latest_state.snapshot()
+    now = datetime.utcnow()
+    latest_state.apply_readings([
+        {'water_point_id': point, 'sensor_type': 'flow', 'timestamp': now, 'value': 42.0},
+        {'water_point_id': point, 'sensor_type': 'flow', 'timestamp': now - timedelta(minutes=5), 'value': 10.0},
+        {'water_point_id': point + 100, 'sensor_type': 'flow', 'timestamp': now, 'value': 99.0},
+    ])
+
+    assert latest_state.snapshot(point).sensors(0)['flow']['value'] == 42.0
+
+
+def test_bulk_inserted_readings_are_picked_up_on_reload(point):
+    latest_state.snapshot()
+    now = datetime.utcnow()
+    db.session.execute(db.insert(SensorReading), [
+        {'water_point_id': point, 'sensor_type': 'pressure', 'timestamp': now - timedelta(minutes=1), 'value': 2.0},
+        {'water_point_id': point, 'sensor_type': 'pressure', 'timestamp': now, 'value': 3.5},
+    ])
+    db.session.commit()
+    assert latest_state.snapshot(point).sensors(0)['pressure']['value'] is None
+
+    # As the periodic reload does for rows written by other processes
+    latest_state.invalidate()
+    assert latest_state.snapshot(point).sensors(0)['pressure']['value'] == 3.5
+
+
+def test_failed_warm_up_is_logged_and_retried(monkeypatch, caplog):
+    def unavailable():
+        raise OperationalError('SELECT', {}, Exception('no such column: water_points.coverage'))
+
+    monkeypatch.setattr(latest_state, 'warm', unavailable)
+    with caplog.at_level(logging.ERROR):
+        app = create_app('testing')
+    assert 'Monitoring store not loaded at startup' in caplog.text
+    assert 'no such column' in caplog.text
+
+    monkeypatch.undo()
+    with app.app_context():
+        db.session.add(WaterPoint(name='Borehole 1', type='borehole', region='Garissa', location='Township',
+                                  latitude=-0.45, longitude=39.65))
+        db.session.commit()
+        assert [state.point['name'] for state in latest_state.snapshot()] == ['Borehole 1']
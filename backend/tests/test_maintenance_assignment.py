@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, WaterPoint, MaintenanceTask
+
+
+@pytest.fixture
+def setup(make_user, auth_headers):
+    first, second = make_user('technician'), make_user('technician')
+    water_point = WaterPoint(name='Borehole 1', type='borehole', region='Garissa', location='Township',
+                             latitude=-0.45, longitude=39.65)
+    db.session.add(water_point)
+    db.session.flush()
+    scheduled = datetime.utcnow() + timedelta(days=1)
+    db.session.add_all([
+        MaintenanceTask(water_point_id=water_point.id, technician_id=first.id, title=f'Task {number}',
+                        scheduled_date=scheduled, estimated_duration=120) for number in range(6)
+    ])
+    db.session.commit()
+    return {'headers': auth_headers(make_user('supervisor')), 'technicians': (first.id, second.id),
+            'water_point_id': water_point.id}
+
+
+def technician_counts(technician_ids):
+    return [MaintenanceTask.query.filter_by(technician_id=technician_id).count() for technician_id in technician_ids]
+
+
+@pytest.mark.parametrize('dry_run', [True, 'true', '1', 'yes'])
+def test_dry_run_leaves_tasks_alone(client, setup, dry_run):
+    response = client.post('/api/maintenance-tasks/auto-assign', json={'dry_run': dry_run}, headers=setup['headers'])
+
+    assert response.status_code == 200
+    assert response.json['dry_run'] is True
+    assert response.json['reassigned'] > 0
+    assert technician_counts(setup['technicians']) == [6, 0]
+
+
+@pytest.mark.parametrize('dry_run', [False, 'false', '0', 'no', None])
+def test_commit_path_reassigns_tasks(client, setup, dry_run):
+    body = {} if dry_run is None else {'dry_run': dry_run}
+    response = client.post('/api/maintenance-tasks/auto-assign', json=body, headers=setup['headers'])
+
+    assert response.status_code == 200
+    assert response.json['dry_run'] is False
+    assert response.json['reassigned'] == 3
+    assert technician_counts(setup['technicians']) == [3, 3]
+
+
+@pytest.mark.parametrize('dry_run', ['maybe', 1, 0, [], {}])
+def test_invalid_dry_run_is_rejected(client, setup, dry_run):
+    response = client.post('/api/maintenance-tasks/auto-assign', json={'dry_run': dry_run}, headers=setup['headers'])
+
+    assert response.status_code == 400
+    assert technician_counts(setup['technicians']) == [6, 0]
+
+
+@pytest.mark.parametrize('duration, status', [('90', 201), (90, 201), ('abc', 400), (-5, 400)])
+def test_auto_assigned_task_duration_is_parsed(client, setup, duration, status):
+    response = client.post('/api/maintenance-tasks', json={
+        'water_point_id': setup['water_point_id'], 'title': 'Inspect pump',
+        'scheduled_date': '2026-11-02T09:00:00', 'estimated_duration': duration
+    }, headers=setup['headers'])
+
+    assert response.status_code == status
+    if status == 201:
+        assert response.json['task']['estimatedDuration'] == 90
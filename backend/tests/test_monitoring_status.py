@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+from models import db, WaterPoint, QualityCheck, Alert, MaintenanceTask
+from services.live_state import latest_state
+
+
+def add_points(count, technician):
+    points = [WaterPoint(name=f'Point {index}', type='borehole', region='Garissa', location='Township',
+                         latitude=-0.45 + index / 10000, longitude=39.65, status='active') for index in range(count)]
+    db.session.add_all(points)
+    db.session.flush()
+    now = datetime.utcnow()
+    for point in points:
+        db.session.add_all([
+            QualityCheck(water_point_id=point.id, checked_by='Inspector', ph_level=7.0, overall_score=90,
+                         is_safe=True, checked_at=now - timedelta(hours=hours)) for hours in range(3)
+        ])
+        db.session.add(Alert(type='quality', title='Turbidity', description='High turbidity',
+                             water_point_id=point.id, priority='high', status='active'))
+        db.session.add(MaintenanceTask(water_point_id=point.id, technician_id=technician.id, title='Service',
+                                       scheduled_date=now))
+    db.session.commit()
+
+
+def test_status_query_count_does_not_grow_with_points(client, make_user, auth_headers, statements):
+    technician = make_user('technician')
+    headers = auth_headers(make_user('admin'))
+    # Token version table and anything else loaded once per process
+    assert client.get('/api/monitoring/water-points/status', headers=headers).status_code == 200
+
+    counts = []
+    total = 0
+    for target in (10, 100, 500):
+        add_points(target - total, technician)
+        total = target
+        latest_state.invalidate()
+
+        statements.clear()
+        response = client.get('/api/monitoring/water-points/status', headers=headers)
+        assert response.status_code == 200
+        assert len(response.json['water_points']) == total
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1] == counts[2]
+
+
+def test_status_served_from_memory_between_changes(client, make_user, auth_headers, statements):
+    headers = auth_headers(make_user('admin'))
+    add_points(20, make_user('technician'))
+    client.get('/api/monitoring/water-points/status', headers=headers)
+
+    statements.clear()
+    response = client.get('/api/monitoring/water-points/status', headers=headers)
+    assert response.status_code == 200
+    assert statements == []
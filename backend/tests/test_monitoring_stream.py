@@ -0,0 +1,52 @@
+from models import db
+
+
+def stream_token(client, headers):
+    response = client.post('/api/monitoring/stream-token', headers=headers)
+    assert response.status_code == 200
+    return response.json['token']
+
+
+def open_stream(client, query):
+    return client.get(f'/api/monitoring/stream?{query}')
+
+
+def test_stream_opens_with_stream_token(client, make_user, auth_headers):
+    token = stream_token(client, auth_headers(make_user('technician')))
+
+    response = open_stream(client, f'token={token}')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    assert next(response.response) == b'retry: 3000\n\n'
+    response.close()
+
+
+def test_stream_rejects_access_token_in_url(client, make_user, auth_headers):
+    access_token = auth_headers(make_user())['Authorization'].split()[1]
+
+    assert open_stream(client, f'jwt={access_token}').status_code == 401
+    assert open_stream(client, f'token={access_token}').status_code == 401
+
+
+def test_stream_token_is_not_an_access_token(client, make_user, auth_headers):
+    token = stream_token(client, auth_headers(make_user()))
+
+    response = client.get('/api/dashboard/stats', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code in (401, 422)
+
+
+def test_expired_stream_token_is_rejected(app, client, make_user, auth_headers):
+    token = stream_token(client, auth_headers(make_user()))
+    app.config['SSE_TOKEN_MAX_AGE'] = -1
+
+    assert open_stream(client, f'token={token}').status_code == 401
+
+
+def test_stream_token_of_deactivated_user_is_rejected(app, client, make_user, auth_headers):
+    user = make_user()
+    token = stream_token(client, auth_headers(user))
+    user.is_active = False
+    db.session.commit()
+    app.extensions['identity_cache'].invalidate(user.id)
+
+    assert open_stream(client, f'token={token}').status_code == 401
@@ -0,0 +1,71 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+from models import db, WaterPoint, Alert
+from services.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+
+def forge(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 3, 4, 5, 6, 7, 890)
+    token = encode_cursor([created_at, 42])
+
+    assert decode_cursor(token, [Alert.created_at, Alert.id]) == [created_at, 42]
+    assert decode_cursor(encode_cursor([7]), [WaterPoint.id]) == [7]
+
+
+@pytest.mark.parametrize('payload, columns', [
+    (['x'], [WaterPoint.id]),
+    ([None], [WaterPoint.id]),
+    ([True], [WaterPoint.id]),
+    ([1.5], [WaterPoint.id]),
+    ([['nested']], [WaterPoint.id]),
+    ([7], [WaterPoint.name]),
+    (['not a date', 1], [Alert.created_at, Alert.id]),
+    ([12345, 1], [Alert.created_at, Alert.id]),
+    (['2026-03-04T05:06:07', '1'], [Alert.created_at, Alert.id]),
+    ([1, 2], [WaterPoint.id]),
+    ({'id': 1}, [WaterPoint.id]),
+])
+def test_tampered_cursor_is_rejected(payload, columns):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(forge(payload), columns)
+
+
+def test_garbage_cursor_is_rejected():
+    with pytest.raises(InvalidCursor):
+        decode_cursor('%%% not base64 %%%', [WaterPoint.id])
+
+
+@pytest.fixture
+def water_points(app):
+    db.session.add_all([WaterPoint(name=f'Point {number}', type='borehole', region='Garissa', location='Township',
+                                   latitude=-0.45, longitude=39.65) for number in range(25)])
+    db.session.commit()
+
+
+def test_cursor_pages_cover_every_row_once(client, make_user, auth_headers, water_points):
+    headers = auth_headers(make_user())
+    seen = []
+    cursor = ''
+    while True:
+        response = client.get(f'/api/water-points?cursor={cursor}&per_page=10', headers=headers)
+        assert response.status_code == 200
+        seen += [point['id'] for point in response.json['water_points']]
+        cursor = response.json['next_cursor']
+        if not cursor:
+            break
+
+    assert seen == sorted(point.id for point in WaterPoint.query.all())
+
+
+def test_endpoint_rejects_forged_cursor(client, make_user, auth_headers, water_points):
+    response = client.get(f'/api/water-points?cursor={forge(["x"])}', headers=auth_headers(make_user()))
+
+    assert response.status_code == 400
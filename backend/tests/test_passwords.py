@@ -0,0 +1,102 @@
+import threading
+
+import pytest
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from services import passwords
+from services.passwords import PasswordHasher, PasswordHashingBusy, password_hasher
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    """Event that hash jobs wait on before hashing, so the queue can be filled"""
+    release = threading.Event()
+    started = threading.Semaphore(0)
+
+    def slow_hash(password, method):
+        started.release()
+        release.wait(5)
+        return generate_password_hash(password, method)
+
+    monkeypatch.setattr(passwords, 'generate_password_hash', slow_hash)
+    release.started = started
+    yield release
+    release.set()
+
+
+def pooled(app, monkeypatch, workers, max_queue):
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_SYNC', False)
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_WORKERS', workers)
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_MAX_QUEUE', max_queue)
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+    hasher = PasswordHasher()
+    hasher.init_app(app)
+    return hasher
+
+
+def fill(hasher, gate, jobs):
+    """Start jobs hashes on threads; they hold their slot until gate is set"""
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(hasher.hash('secret123'))) for _ in range(jobs)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def test_full_queue_turns_hashes_away(app, monkeypatch, gate):
+    hasher = pooled(app, monkeypatch, workers=2, max_queue=2)
+    threads, results = fill(hasher, gate, 2)
+    assert gate.started.acquire(timeout=5) and gate.started.acquire(timeout=5)
+
+    with pytest.raises(PasswordHashingBusy):
+        hasher.hash('secret123')
+    with pytest.raises(PasswordHashingBusy):
+        hasher.check(generate_password_hash('secret123'), 'secret123')
+    assert hasher.rejected == 2
+
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(results) == 2
+    assert all(check_password_hash(result, 'secret123') for result in results)
+
+    # Slots are handed back once the jobs finish
+    assert check_password_hash(hasher.hash('secret123'), 'secret123')
+
+
+def test_sync_hasher_has_no_queue(app, monkeypatch, gate):
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_MAX_QUEUE', 0)
+    hasher = PasswordHasher(app)
+    gate.set()
+
+    assert check_password_hash(hasher.hash('secret123'), 'secret123')
+    assert hasher.rejected == 0
+
+
+def test_login_answers_503_while_the_queue_is_full(app, client, make_user, monkeypatch, gate):
+    user = make_user('community_member')
+    monkeypatch.setattr(password_hasher, 'sync', False)
+    monkeypatch.setattr(password_hasher, 'workers', 1)
+    monkeypatch.setattr(password_hasher, '_slots', threading.BoundedSemaphore(1))
+    monkeypatch.setattr(password_hasher, '_executor', None)
+    threads, _ = fill(password_hasher, gate, 1)
+    assert gate.started.acquire(timeout=5)
+
+    response = client.post('/api/auth/login', json={'email': user.email, 'password': 'secret123'})
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+    password_hasher.shutdown()
+
+
+def test_verify_upgrades_hashes_made_with_other_parameters(app):
+    hasher = PasswordHasher(app)
+    old = generate_password_hash('secret123', 'pbkdf2:sha256:1000')
+
+    matches, new_hash = hasher.verify(old, 'secret123')
+    assert matches and new_hash.startswith(hasher.prefix + '$')
+    assert hasher.verify(new_hash, 'secret123') == (True, None)
+    assert hasher.verify(old, 'wrong') == (False, None)
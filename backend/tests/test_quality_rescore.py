@@ -0,0 +1,75 @@
+from datetime import datetime
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from models import db, User, WaterPoint, QualityCheck, SystemSetting
+from services.quality import rescore_quality_checks
+from services.settings import settings_store
+
+PERIOD = {'type': 'water_quality', 'period_start': '2026-01-01', 'period_end': '2026-02-01'}
+
+
+@pytest.fixture
+def headers(app):
+    user = User(email='analyst@example.com', full_name='Analyst', phone_number='0712345678', location='Garissa',
+                community='Township', role='admin', national_id='12345678', emergency_contact='Contact',
+                emergency_phone='0700000000')
+    user.set_password('secret123')
+    db.session.add(user)
+    db.session.commit()
+    with app.test_request_context():
+        return {'Authorization': 'Bearer ' + create_access_token(identity=str(user.id))}
+
+
+@pytest.fixture
+def quality_check(app):
+    water_point = WaterPoint(name='Borehole 1', type='borehole', region='Garissa', location='Township',
+                             latitude=-0.45, longitude=39.65)
+    db.session.add(water_point)
+    db.session.commit()
+    # pH 6.0 is out of range: 100 - 20 = 80, safe under the default settings
+    check = QualityCheck(water_point_id=water_point.id, checked_by='Inspector', ph_level=6.0, turbidity=1.0,
+                         chlorine_level=0.5, e_coli_presence=False, overall_score=80, is_safe=True,
+                         checked_at=datetime(2026, 1, 10))
+    db.session.add(check)
+    db.session.commit()
+    return check
+
+
+def set_setting(key, value):
+    db.session.add(SystemSetting(key=key, value=value, category='quality'))
+    settings_store.bump()
+    db.session.commit()
+    settings_store.expire()
+
+
+def generate(client, headers):
+    response = client.post('/api/reports/generate', json=PERIOD, headers=headers)
+    assert response.status_code in (200, 201)
+    return response.json
+
+
+def test_rescore_invalidates_cached_quality_report(client, headers, quality_check):
+    first = generate(client, headers)
+    assert not first['cached']
+    assert first['data']['summary']['safe_checks'] == 1
+    assert first['data']['summary']['average_score'] == 80
+    assert generate(client, headers)['cached']
+
+    set_setting('quality_ph_penalty', '40')
+    read, updated, _ = rescore_quality_checks()
+    assert (read, updated) == (1, 1)
+
+    regenerated = generate(client, headers)
+    assert not regenerated['cached']
+    assert regenerated['data']['summary']['safe_checks'] == 0
+    assert regenerated['data']['summary']['average_score'] == 60
+    assert generate(client, headers)['cached']
+
+
+def test_rescore_without_changes_keeps_cached_report(client, headers, quality_check):
+    generate(client, headers)
+
+    assert rescore_quality_checks()[1] == 0
+    assert generate(client, headers)['cached']
@@ -0,0 +1,75 @@
+from itertools import permutations
+
+import numpy as np
+import pytest
+
+from services.routing import distance_matrix, nearest_neighbour, plan_legs, plan_route, route_length, two_opt
+
+
+def random_matrix(seed, size):
+    rng = np.random.default_rng(seed)
+    points = np.column_stack([rng.uniform(-1.5, 0.5, size), rng.uniform(39.0, 41.0, size)])
+    return distance_matrix(tuple(points.ravel().tolist()))
+
+
+@pytest.mark.parametrize('seed', range(25))
+def test_two_opt_is_never_longer_than_nearest_neighbour(seed):
+    matrix = random_matrix(seed, 4 + seed)
+    greedy = nearest_neighbour(matrix)
+
+    improved = two_opt(greedy, matrix)
+
+    assert improved[0] == 0
+    assert sorted(improved) == list(range(len(matrix)))
+    assert route_length(improved, matrix) <= route_length(greedy, matrix) + 1e-9
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_two_opt_keeps_a_fixed_end(seed):
+    matrix = random_matrix(100 + seed, 8)
+    greedy = nearest_neighbour(matrix[:-1, :-1]) + [7]
+
+    improved = two_opt(greedy, matrix, fixed_end=True)
+
+    assert improved[0] == 0 and improved[-1] == 7
+    assert route_length(improved, matrix) <= route_length(greedy, matrix) + 1e-9
+
+
+def test_two_opt_undoes_a_crossing():
+    # Corners of a square visited crosswise; the optimum walks round the edge
+    points = [(0.0, 0.0), (0.0, 0.1), (0.1, 0.0), (0.1, 0.1)]
+    matrix = distance_matrix(tuple(coordinate for point in points for coordinate in point))
+
+    order = two_opt([0, 3, 1, 2], matrix)
+
+    assert route_length(order, matrix) == pytest.approx(3 * matrix[0, 1], rel=1e-3)
+
+
+def test_plan_route_beats_the_given_order_and_stays_near_the_best():
+    start = (-0.45, 39.65)
+    stops = [(-0.40, 39.70), (-0.60, 39.60), (-0.42, 39.55), (-0.55, 39.75), (-0.48, 39.68)]
+
+    order, legs = plan_route(start, stops)
+
+    best = min(sum(plan_legs(start, [stops[index] for index in candidate]))
+               for candidate in permutations(range(len(stops))))
+    assert sorted(order) == list(range(len(stops)))
+    assert sum(legs) == pytest.approx(sum(plan_legs(start, [stops[index] for index in order])))
+    # 2-opt stops at a local optimum, which is not always the best order
+    assert best - 1e-9 <= sum(legs) <= sum(plan_legs(start, stops))
+    assert sum(legs) <= 1.1 * best
+
+
+def test_plan_route_returning_to_start_ends_at_the_depot():
+    start = (-0.45, 39.65)
+    stops = [(-0.40, 39.70), (-0.60, 39.60), (-0.42, 39.55)]
+
+    order, legs = plan_route(start, stops, return_to_start=True)
+
+    assert sorted(order) == [0, 1, 2]
+    assert len(legs) == 4
+    assert legs == pytest.approx(plan_legs(start, [stops[index] for index in order], return_to_start=True))
+
+
+def test_plan_route_without_stops():
+    assert plan_route((-0.45, 39.65), []) == ([], [])
@@ -0,0 +1,105 @@
+import pytest
+
+from models import db, SystemSetting, SettingsVersion
+from services.settings import settings_store
+
+
+@pytest.fixture
+def store(app, monkeypatch):
+    # Long enough that only expire() or a version bump triggers a reload
+    monkeypatch.setattr(settings_store, 'poll_interval', 3600)
+    return settings_store
+
+
+def save(key, value):
+    setting = SystemSetting.query.filter_by(key=key).first()
+    if setting is None:
+        db.session.add(SystemSetting(key=key, value=value))
+    else:
+        setting.value = value
+
+
+def test_defaults_until_a_setting_is_stored(store):
+    assert store.number('quality_ph_min') == 6.5
+    assert store.get('quality_ph_min') is None
+
+
+def test_bump_and_expire_reload_the_settings(store):
+    assert store.number('quality_ph_min') == 6.5
+
+    save('quality_ph_min', '7')
+    store.bump()
+    db.session.commit()
+    store.expire()
+
+    assert store.number('quality_ph_min') == 7.0
+    assert store.get('quality_ph_min') == '7'
+    assert store.version == 1
+
+
+def test_changes_without_bump_are_not_seen(store):
+    assert store.number('quality_ph_min') == 6.5
+
+    save('quality_ph_min', '7')
+    db.session.commit()
+    store.expire()
+
+    # The version did not move, so the cached table is kept
+    assert store.number('quality_ph_min') == 6.5
+
+
+def test_another_process_bump_is_seen_after_the_poll_interval(store):
+    store.values()
+
+    # As written by another worker process: new row and bumped version
+    save('quality_turbidity_max', '3')
+    store.bump()
+    db.session.commit()
+
+    assert store.number('quality_turbidity_max') == 5.0
+
+    store.poll_interval = 0
+    assert store.number('quality_turbidity_max') == 3.0
+
+
+def test_reads_between_polls_run_no_queries(store, statements):
+    store.values()
+    statements.clear()
+
+    store.get('quality_ph_min')
+    store.number('quality_ph_max')
+    store.rows()
+
+    assert statements == []
+
+
+def test_unparseable_values_fall_back_to_the_default(store):
+    save('quality_safe_score', 'high')
+    store.bump()
+    db.session.commit()
+    store.expire()
+
+    assert store.get('quality_safe_score') == 'high'
+    assert store.number('quality_safe_score') == 70.0
+
+
+def test_bump_counts_every_change(store):
+    for _ in range(3):
+        store.bump()
+        db.session.commit()
+
+    assert db.session.get(SettingsVersion, 1).version == 3
+
+
+def test_settings_routes_invalidate_the_store(store, client, make_user, auth_headers):
+    headers = auth_headers(make_user('admin'))
+    assert store.number('quality_chlorine_max') == 4.0
+
+    response = client.post('/api/admin/system/settings', json={'quality_chlorine_max': 3.5}, headers=headers)
+    assert response.status_code == 200
+    assert store.number('quality_chlorine_max') == 3.5
+
+    response = client.put('/api/settings/quality_chlorine_max', json={'value': '2.5'}, headers=headers)
+    assert response.status_code == 200
+    assert store.number('quality_chlorine_max') == 2.5
+    assert [row['value'] for row in client.get('/api/admin/system/settings', headers=headers).get_json()] == ['2.5']
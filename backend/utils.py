@@ -1,8 +1,8 @@
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask import current_app
+from flask import jsonify
+from flask_jwt_extended.exceptions import JWTExtendedException
 import jwt
-import datetime
-from datetime import timezone
+from services.auth import issue_access_token, decode_access_token, RevokedTokenError
+from services.passwords import password_hasher
 
 class PasswordUtils:
     """Utility class for password operations"""
@@ -10,31 +10,32 @@ class PasswordUtils:
     @staticmethod
     def hash_password(password):
         """Hash a password for storing"""
-        return generate_password_hash(password)
+        return password_hasher.hash(password)
     
     @staticmethod
     def verify_password(hashed_password, password):
         """Verify a stored password against one provided by user"""
-        return check_password_hash(hashed_password, password)
+        return password_hasher.check(hashed_password, password)
+    
+    @staticmethod
+    def verify_and_upgrade(hashed_password, password):
+        """(matches, new_hash); new_hash is set when the stored hash should be replaced"""
+        return password_hasher.verify(hashed_password, password)
+
+def hashing_busy(body):
+    """503 response with body for a request turned away by the full password hashing queue"""
+    response = jsonify(body)
+    response.headers['Retry-After'] = '1'
+    return response, 503
 
 class JWTUtils:
     """Utility class for JWT operations"""
     
     @staticmethod
-    def encode_auth_token(user_id, role='user'):
-        """Generates the Auth Token"""
+    def encode_auth_token(user_id, role='user', is_active=True, version=0, kind='user'):
+        """Generates the Auth Token, with the same claims as /api/auth/login tokens"""
         try:
-            payload = {
-                'exp': datetime.datetime.now(timezone.utc) + current_app.config['JWT_ACCESS_TOKEN_EXPIRES'],
-                'iat': datetime.datetime.now(timezone.utc),
-                'sub': user_id,
-                'role': role
-            }
-            return jwt.encode(
-                payload,
-                current_app.config['JWT_SECRET_KEY'],
-                algorithm='HS256'
-            )
+            return issue_access_token(user_id, role, is_active, version, kind)
         except Exception as e:
             return e
     
@@ -42,15 +43,12 @@ class JWTUtils:
     def decode_auth_token(auth_token):
         """Decodes the auth token"""
         try:
-            payload = jwt.decode(
-                auth_token,
-                current_app.config['JWT_SECRET_KEY'],
-                algorithms=['HS256']
-            )
-            return payload
+            return decode_access_token(auth_token)
         except jwt.ExpiredSignatureError:
             return 'Signature expired. Please log in again.'
-        except jwt.InvalidTokenError:
+        except RevokedTokenError as e:
+            return str(e)
+        except (jwt.InvalidTokenError, JWTExtendedException):
             return 'Invalid token. Please log in again.'
 
 class ValidationUtils:
@@ -47,9 +47,26 @@ import {
   FaFileExport
 } from 'react-icons/fa';
 
+// Counters are aggregates the monitoring stream doesn't carry, so they are
+// reloaded shortly after stream activity, and on a slow timer as a fallback
+const COUNTER_REFRESH_DELAY = 5000;
+const COUNTER_POLL_INTERVAL = 60000;
+const STREAM_RETRY_DELAY = 3000;
+
+// System status card figures from /monitoring/dashboard
+const toSystemStatus = (dashboardData) => ({
+  totalSensors: dashboardData?.system_status?.total_water_points * 6 || 0, // 6 sensors per water point
+  activeSensors: dashboardData?.system_status?.active_water_points * 6 || 0,
+  alertSensors: dashboardData?.alerts_summary?.total || 0,
+  offlineSensors: dashboardData?.system_status?.offline_water_points * 6 || 0,
+  lastUpdate: new Date().toLocaleTimeString(),
+  systemHealth: dashboardData?.system_status?.system_health || 0,
+  networkLatency: dashboardData?.system_status?.network_latency || 0,
+  dataTransmission: dashboardData?.system_status?.data_transmission || 0
+});
+
 const RealTimeMonitoring = () => {
   const [isMonitoring, setIsMonitoring] = useState(true);
-  const [refreshInterval, setRefreshInterval] = useState(5);
   const [viewMode, setViewMode] = useState('grid');
   const [alertsOnly, setAlertsOnly] = useState(false);
   const [loading, setLoading] = useState(false);
@@ -189,16 +206,7 @@ const RealTimeMonitoring = () => {
 
       // Transform data for frontend
       const transformedData = {
-        systemStatus: {
-          totalSensors: dashboardData?.system_status?.total_water_points * 6 || 0, // 6 sensors per water point
-          activeSensors: dashboardData?.system_status?.active_water_points * 6 || 0,
-          alertSensors: dashboardData?.alerts_summary?.total || 0,
-          offlineSensors: dashboardData?.system_status?.offline_water_points * 6 || 0,
-          lastUpdate: new Date().toLocaleTimeString(),
-          systemHealth: dashboardData?.system_status?.system_health || 0,
-          networkLatency: dashboardData?.system_status?.network_latency || 0,
-          dataTransmission: dashboardData?.system_status?.data_transmission || 0
-        },
+        systemStatus: toSystemStatus(dashboardData),
         waterPoints: waterPointsData.map(wp => ({
           id: wp.id,
           name: wp.name,
@@ -224,6 +232,23 @@ const RealTimeMonitoring = () => {
     }
   };
 
+  // Reload the system status, health and notification counters only
+  const refreshCounters = async () => {
+    const [dashboardData, healthData, notificationsData] = await Promise.all([
+      fetchDashboardData(),
+      fetchSystemHealth(),
+      fetchNotifications()
+    ]);
+
+    setMonitoringData(prev => ({
+      ...prev,
+      systemStatus: dashboardData ? toSystemStatus(dashboardData) : prev.systemStatus,
+      dashboardStats: dashboardData || prev.dashboardStats,
+      systemHealth: healthData,
+      notifications: notificationsData
+    }));
+  };
+
   // Acknowledge alert
   const acknowledgeAlert = async (alertId) => {
     try {
@@ -282,18 +307,112 @@ const RealTimeMonitoring = () => {
     }
   };
 
-  // Simulate real-time updates
+  // Load the full picture once, then apply deltas pushed over Server-Sent Events
   useEffect(() => {
     fetchAllMonitoringData();
 
     if (!isMonitoring) return;
 
-    const interval = setInterval(() => {
-      fetchAllMonitoringData();
-    }, refreshInterval * 1000);
+    let source = null;
+    let stopped = false;
+    let lastEventId = null;
+    let counterTimer = null;
+    let retryTimer = null;
+
+    const scheduleCounterRefresh = () => {
+      if (counterTimer) return;
+      counterTimer = setTimeout(() => {
+        counterTimer = null;
+        refreshCounters();
+      }, COUNTER_REFRESH_DELAY);
+    };
+    const counterPoll = setInterval(refreshCounters, COUNTER_POLL_INTERVAL);
+
+    const updateWaterPoint = (id, changes) => {
+      setMonitoringData(prev => ({
+        ...prev,
+        systemStatus: { ...prev.systemStatus, lastUpdate: new Date().toLocaleTimeString() },
+        waterPoints: prev.waterPoints.map(wp => (wp.id === id ? { ...wp, ...changes(wp) } : wp))
+      }));
+    };
 
-    return () => clearInterval(interval);
-  }, [isMonitoring, refreshInterval]);
+    const connect = async () => {
+      // EventSource cannot send an Authorization header, so the stream is
+      // opened with a short-lived stream token in the URL instead of the JWT
+      let token;
+      try {
+        token = (await fetchData('/monitoring/stream-token', { method: 'POST' })).token;
+      } catch (error) {
+        if (!stopped) retryTimer = setTimeout(connect, STREAM_RETRY_DELAY);
+        return;
+      }
+      if (stopped) return;
+
+      const params = new URLSearchParams({ token });
+      if (lastEventId) params.set('last_event_id', lastEventId);
+      const stream = new EventSource(`${API_BASE_URL}/monitoring/stream?${params}`);
+      source = stream;
+
+      const listen = (type, handler) => {
+        stream.addEventListener(type, (event) => {
+          lastEventId = event.lastEventId || lastEventId;
+          handler(JSON.parse(event.data));
+        });
+      };
+
+      listen('sensor', (data) => {
+        updateWaterPoint(data.water_point_id, wp => ({ sensors: { ...wp.sensors, ...data.sensors } }));
+        scheduleCounterRefresh();
+      });
+
+      listen('status', (data) => {
+        updateWaterPoint(data.water_point_id, () => ({ overallStatus: data.overall_status }));
+        scheduleCounterRefresh();
+      });
+
+      listen('alert', (alert) => {
+        setMonitoringData(prev => ({ ...prev, activeAlerts: [alert, ...prev.activeAlerts] }));
+        scheduleCounterRefresh();
+      });
+
+      listen('alert_update', (alert) => {
+        setMonitoringData(prev => ({
+          ...prev,
+          activeAlerts: alert.status === 'active'
+            ? prev.activeAlerts.map(a => (a.id === alert.id ? { ...a, ...alert } : a))
+            : prev.activeAlerts.filter(a => a.id !== alert.id)
+        }));
+        scheduleCounterRefresh();
+      });
+
+      // New quality checks move the health and quality figures
+      listen('quality_check', () => {
+        scheduleCounterRefresh();
+      });
+
+      // Sent when this client missed more events than the server keeps
+      listen('reset', () => {
+        fetchAllMonitoringData();
+      });
+
+      // The browser reconnects by itself with the same URL; once the stream
+      // token has expired that is refused and the source closes for good
+      stream.onerror = () => {
+        if (stream.readyState === EventSource.CLOSED && !stopped) {
+          retryTimer = setTimeout(connect, STREAM_RETRY_DELAY);
+        }
+      };
+    };
+    connect();
+
+    return () => {
+      stopped = true;
+      if (source) source.close();
+      clearTimeout(counterTimer);
+      clearTimeout(retryTimer);
+      clearInterval(counterPoll);
+    };
+  }, [isMonitoring]);
 
   const getStatusColor = (status) => {
     switch (status) {
@@ -650,21 +769,6 @@ const RealTimeMonitoring = () => {
         </div>
         
         <div className="flex items-center space-x-3">
-          <div className="flex items-center space-x-2">
-            <label className="text-sm text-gray-600">Refresh:</label>
-            <select
-              value={refreshInterval}
-              onChange={(e) => setRefreshInterval(Number(e.target.value))}
-              className="px-3 py-1 border border-gray-300 rounded-lg text-sm focus:ring-2 focus:ring-blue-500 focus:border-blue-500"
-            >
-              <option value={1}>1s</option>
-              <option value={5}>5s</option>
-              <option value={10}>10s</option>
-              <option value={30}>30s</option>
-              <option value={60}>1m</option>
-            </select>
-          </div>
-          
           <button
             onClick={() => setAlertsOnly(!alertsOnly)}
             className={`px-4 py-2 rounded-lg transition-colors flex items-center text-sm ${
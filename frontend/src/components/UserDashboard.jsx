@@ -53,6 +53,24 @@ import {
   FaChartBar
 } from 'react-icons/fa';
 
+// Counters are aggregates the monitoring stream doesn't carry, so they are
+// reloaded shortly after stream activity, and on a slow timer as a fallback
+const COUNTER_REFRESH_DELAY = 5000;
+const COUNTER_POLL_INTERVAL = 60000;
+const STREAM_RETRY_DELAY = 3000;
+
+// System status card figures from /monitoring/dashboard
+const toSystemStatus = (dashboardData) => ({
+  totalSensors: dashboardData?.system_status?.total_water_points * 6 || 0,
+  activeSensors: dashboardData?.system_status?.active_water_points * 6 || 0,
+  alertSensors: dashboardData?.alerts_summary?.total || 0,
+  offlineSensors: dashboardData?.system_status?.offline_water_points * 6 || 0,
+  lastUpdate: new Date().toLocaleTimeString(),
+  systemHealth: dashboardData?.system_status?.system_health || 0,
+  networkLatency: dashboardData?.system_status?.network_latency || 0,
+  dataTransmission: dashboardData?.system_status?.data_transmission || 0
+});
+
 // API service functions - Updated with reports endpoints
 const apiService = {
   baseURL: '/api',
@@ -224,6 +242,16 @@ const apiService = {
     return this.request('/monitoring/notifications');
   },
 
+  // Server-Sent Events stream of monitoring deltas. EventSource cannot send
+  // an Authorization header, so the stream is opened with a short-lived
+  // stream token in the URL instead of the JWT
+  async openMonitoringStream(lastEventId) {
+    const { token } = await this.request('/monitoring/stream-token', { method: 'POST' });
+    const params = new URLSearchParams({ token });
+    if (lastEventId) params.set('last_event_id', lastEventId);
+    return new EventSource(`${this.baseURL}/monitoring/stream?${params}`);
+  },
+
   // Reports endpoints
   async generateReport(reportData) {
     return this.request('/reports/generate', {
@@ -350,7 +378,6 @@ const UserDashboard = () => {
 
   // Real-time monitoring states
   const [isMonitoring, setIsMonitoring] = useState(true);
-  const [refreshInterval, setRefreshInterval] = useState(5);
   const [viewMode, setViewMode] = useState('grid');
   const [alertsOnly, setAlertsOnly] = useState(false);
 
@@ -424,16 +451,7 @@ const UserDashboard = () => {
       ]);
 
       const transformedData = {
-        systemStatus: {
-          totalSensors: dashboardData?.system_status?.total_water_points * 6 || 0,
-          activeSensors: dashboardData?.system_status?.active_water_points * 6 || 0,
-          alertSensors: dashboardData?.alerts_summary?.total || 0,
-          offlineSensors: dashboardData?.system_status?.offline_water_points * 6 || 0,
-          lastUpdate: new Date().toLocaleTimeString(),
-          systemHealth: dashboardData?.system_status?.system_health || 0,
-          networkLatency: dashboardData?.system_status?.network_latency || 0,
-          dataTransmission: dashboardData?.system_status?.data_transmission || 0
-        },
+        systemStatus: toSystemStatus(dashboardData),
         waterPoints: waterPointsData.water_points || [],
         activeAlerts: alertsData.alerts || [],
         systemHealth: healthData,
@@ -449,16 +467,138 @@ const UserDashboard = () => {
     }
   };
 
-  // Real-time monitoring effect
+  // Reload the system status, health and notification counters only
+  const refreshMonitoringCounters = async () => {
+    try {
+      const [dashboardData, healthData, notificationsData] = await Promise.all([
+        apiService.getMonitoringDashboard(),
+        apiService.getSystemHealth(),
+        apiService.getNotifications()
+      ]);
+
+      setDashboardData(prev => ({
+        ...prev,
+        monitoringData: {
+          ...prev.monitoringData,
+          systemStatus: toSystemStatus(dashboardData),
+          systemHealth: healthData,
+          notifications: notificationsData.notifications || []
+        }
+      }));
+    } catch (error) {
+      console.error('Failed to refresh monitoring counters:', error);
+    }
+  };
+
+  // Real-time monitoring effect: apply deltas pushed by the server
   useEffect(() => {
-    if (activeTab === 'monitoring' && isMonitoring) {
-      const interval = setInterval(() => {
+    if (activeTab !== 'monitoring' || !isMonitoring) return;
+
+    let source = null;
+    let stopped = false;
+    let lastEventId = null;
+    let counterTimer = null;
+    let retryTimer = null;
+
+    const scheduleCounterRefresh = () => {
+      if (counterTimer) return;
+      counterTimer = setTimeout(() => {
+        counterTimer = null;
+        refreshMonitoringCounters();
+      }, COUNTER_REFRESH_DELAY);
+    };
+    const counterPoll = setInterval(refreshMonitoringCounters, COUNTER_POLL_INTERVAL);
+
+    const updateMonitoring = (changes) => {
+      setDashboardData(prev => ({
+        ...prev,
+        monitoringData: {
+          ...prev.monitoringData,
+          ...changes(prev.monitoringData),
+          systemStatus: { ...prev.monitoringData.systemStatus, lastUpdate: new Date().toLocaleTimeString() }
+        }
+      }));
+    };
+
+    const updateWaterPoint = (id, changes) => {
+      updateMonitoring(data => ({
+        waterPoints: data.waterPoints.map(wp => (wp.id === id ? { ...wp, ...changes(wp) } : wp))
+      }));
+    };
+
+    const connect = async () => {
+      let stream;
+      try {
+        stream = await apiService.openMonitoringStream(lastEventId);
+      } catch (error) {
+        if (!stopped) retryTimer = setTimeout(connect, STREAM_RETRY_DELAY);
+        return;
+      }
+      if (stopped) {
+        stream.close();
+        return;
+      }
+      source = stream;
+
+      const listen = (type, handler) => {
+        stream.addEventListener(type, (event) => {
+          lastEventId = event.lastEventId || lastEventId;
+          handler(JSON.parse(event.data));
+        });
+      };
+
+      listen('sensor', (data) => {
+        updateWaterPoint(data.water_point_id, wp => ({ sensors: { ...wp.sensors, ...data.sensors } }));
+        scheduleCounterRefresh();
+      });
+
+      listen('status', (data) => {
+        updateWaterPoint(data.water_point_id, () => ({ status: data.status, overall_status: data.overall_status }));
+        scheduleCounterRefresh();
+      });
+
+      listen('alert', (alert) => {
+        updateMonitoring(data => ({ activeAlerts: [alert, ...data.activeAlerts] }));
+        scheduleCounterRefresh();
+      });
+
+      listen('alert_update', (alert) => {
+        updateMonitoring(data => ({
+          activeAlerts: alert.status === 'active'
+            ? data.activeAlerts.map(a => (a.id === alert.id ? { ...a, ...alert } : a))
+            : data.activeAlerts.filter(a => a.id !== alert.id)
+        }));
+        scheduleCounterRefresh();
+      });
+
+      // New quality checks move the health and quality figures
+      listen('quality_check', () => {
+        scheduleCounterRefresh();
+      });
+
+      // Sent when this client missed more events than the server keeps
+      listen('reset', () => {
         loadMonitoringData();
-      }, refreshInterval * 1000);
+      });
 
-      return () => clearInterval(interval);
-    }
-  }, [activeTab, isMonitoring, refreshInterval]);
+      // The browser reconnects by itself with the same URL; once the stream
+      // token has expired that is refused and the source closes for good
+      stream.onerror = () => {
+        if (stream.readyState === EventSource.CLOSED && !stopped) {
+          retryTimer = setTimeout(connect, STREAM_RETRY_DELAY);
+        }
+      };
+    };
+    connect();
+
+    return () => {
+      stopped = true;
+      if (source) source.close();
+      clearTimeout(counterTimer);
+      clearTimeout(retryTimer);
+      clearInterval(counterPoll);
+    };
+  }, [activeTab, isMonitoring]);
 
   // Load tab-specific data when tab changes
   useEffect(() => {
@@ -1071,21 +1211,6 @@ const UserDashboard = () => {
           </div>
           
           <div className="flex items-center space-x-3">
-            <div className="flex items-center space-x-2">
-              <label className="text-sm text-gray-600">Refresh:</label>
-              <select
-                value={refreshInterval}
-                onChange={(e) => setRefreshInterval(Number(e.target.value))}
-                className="px-3 py-1 border border-gray-300 rounded-lg text-sm focus:ring-2 focus:ring-blue-500 focus:border-blue-500"
-              >
-                <option value={1}>1s</option>
-                <option value={5}>5s</option>
-                <option value={10}>10s</option>
-                <option value={30}>30s</option>
-                <option value={60}>1m</option>
-              </select>
-            </div>
-            
             <button
               onClick={() => setAlertsOnly(!alertsOnly)}
               className={`px-4 py-2 rounded-lg transition-colors flex items-center text-sm ${